@@ -4,6 +4,7 @@ from django.db import connection
 from django.core.cache import cache
 from django.utils import timezone
 from django.conf import settings
+from core.cache_manager import CacheStats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,7 +47,8 @@ def health_check(request):
             },
             "cache": {
                 "status": cache_status,
-                "type": "Redis"
+                "type": "Redis",
+                "tiers": CacheStats.get_tier_stats()  # 当前进程的L1/L2命中统计
             }
         },
         "application": {
@@ -6,18 +6,44 @@
 
 import json
 import logging
+import math
+import random
+import time
+import zlib
 from functools import wraps
 from typing import Any, Optional, Union, Callable
 from django.core.cache import cache
 from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.http.response import HttpResponseBase
+from django.template.response import SimpleTemplateResponse
+from django.utils.http import parse_etags
 from django.contrib.auth.models import User
 from django.db.models import Model
 from datetime import timedelta
 
+from core.tiered_cache import tiered_cache
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时回退到标准库json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖
+    msgpack = None
+
 logger = logging.getLogger('cache')
 
 class CacheKeyManager:
-    """缓存键管理器"""
+    """
+    缓存键管理器
+
+    缓存键中嵌入所属命名空间的代际号（如 g1792221677301）。失效时只需对代际计数器
+    执行一次INCR，旧代际的缓存项不再被访问，随TTL或LRU自然淘汰，无需扫描键空间。
+    命名空间：对局（每局一个）、用户（每人一个）、邀请（每人一个）、全局对局列表、用户搜索。
+    """
 
     PREFIX = "gogame"
 
@@ -27,64 +53,125 @@ class CacheKeyManager:
         return f"{cls.PREFIX}:" + ":".join(str(part) for part in parts)
 
     @classmethod
-    def game_list(cls, user_id: Optional[int] = None, status: Optional[str] = None) -> str:
-        """游戏列表缓存键"""
+    def generation(cls, namespace: str, *parts) -> str:
+        """代际计数器键"""
+        return cls.get_key('gen', namespace, *parts)
+
+    @classmethod
+    def generation_tag(cls, *generation_keys: str) -> str:
+        """读取一个或多个代际计数器，生成嵌入缓存键的代际标记"""
+        return 'g' + '-'.join(str(version) for version in get_versions(*generation_keys))
+
+    @classmethod
+    def game_version(cls, game_id: int) -> str:
+        """对局代际计数器键（对局或落子变化时递增，同时用作ETag版本号）"""
+        return cls.generation('game', game_id)
+
+    @classmethod
+    def user_version(cls, user_id: int) -> str:
+        """用户代际计数器键（用户资料或其参与的任一对局变化时递增，同时用作ETag版本号）"""
+        return cls.generation('user', user_id)
+
+    @classmethod
+    def invitations_version(cls, user_id: int) -> str:
+        """用户邀请代际计数器键"""
+        return cls.generation('invitations', user_id)
+
+    @classmethod
+    def game_list_version(cls) -> str:
+        """全局对局列表代际计数器键"""
+        return cls.generation('games_list')
+
+    @classmethod
+    def search_version(cls, server: Optional[str] = None) -> str:
+        """用户搜索代际计数器键（不指定服务区时为全局计数器）"""
+        return cls.generation('search', server) if server else cls.generation('search')
+
+    @classmethod
+    def game_list(cls, user_id: Optional[int] = None, status: Optional[str] = None, page: str = '') -> str:
+        """游戏列表缓存键（page 为分页参数标记，第一页为空）"""
         parts = ['games', 'list']
         if user_id:
             parts.append(f'user_{user_id}')
         if status:
             parts.append(f'status_{status}')
+        if page:
+            parts.append(f'page_{page}')
+        version = cls.user_version(user_id) if user_id else cls.game_list_version()
+        parts.append(cls.generation_tag(version))
         return cls.get_key(*parts)
 
     @classmethod
     def game_detail(cls, game_id: int) -> str:
         """游戏详情缓存键"""
-        return cls.get_key('game', 'detail', game_id)
+        return cls.get_key('game', 'detail', game_id, cls.generation_tag(cls.game_version(game_id)))
 
     @classmethod
-    def game_intersections(cls, game_id: int) -> str:
-        """游戏棋子位置缓存键"""
-        return cls.get_key('game', 'intersections', game_id)
+    def game_intersections(cls, game_id: int, page: str = '') -> str:
+        """游戏棋子位置缓存键（page 为分页参数标记，第一页为空）"""
+        parts = ['game', 'intersections', game_id]
+        if page:
+            parts.append(f'page_{page}')
+        return cls.get_key(*parts, cls.generation_tag(cls.game_version(game_id)))
+
+    @classmethod
+    def user_intersections(cls, user_id: int, page: str = '') -> str:
+        """用户参与的全部对局的棋子位置缓存键（page 为分页参数标记，第一页为空）"""
+        parts = ['user', 'intersections', user_id]
+        if page:
+            parts.append(f'page_{page}')
+        return cls.get_key(*parts, cls.generation_tag(cls.user_version(user_id)))
 
     @classmethod
     def user_profile(cls, user_id: int) -> str:
         """用户资料缓存键"""
-        return cls.get_key('user', 'profile', user_id)
+        return cls.get_key('user', 'profile', user_id, cls.generation_tag(cls.user_version(user_id)))
 
     @classmethod
     def user_server(cls, user_id: int) -> str:
         """用户服务区缓存键"""
-        return cls.get_key('user', 'server', user_id)
+        return cls.get_key('user', 'server', user_id, cls.generation_tag(cls.user_version(user_id)))
 
     @classmethod
     def user_stats(cls, user_id: int) -> str:
         """用户统计缓存键"""
-        return cls.get_key('user', 'stats', user_id)
+        return cls.get_key('user', 'stats', user_id, cls.generation_tag(cls.user_version(user_id)))
 
     @classmethod
     def invitations_sent(cls, user_id: int) -> str:
         """发出的邀请缓存键"""
-        return cls.get_key('invitations', 'sent', user_id)
+        return cls.get_key('invitations', 'sent', user_id, cls.generation_tag(cls.invitations_version(user_id)))
 
     @classmethod
     def invitations_received(cls, user_id: int) -> str:
         """收到的邀请缓存键"""
-        return cls.get_key('invitations', 'received', user_id)
+        return cls.get_key('invitations', 'received', user_id, cls.generation_tag(cls.invitations_version(user_id)))
 
     @classmethod
     def search_users(cls, server: str, query: str) -> str:
         """用户搜索缓存键"""
-        return cls.get_key('search', 'users', server, query.lower())
+        tag = cls.generation_tag(cls.search_version(), cls.search_version(server))
+        return cls.get_key('search', 'users', server, query.lower(), tag)
 
     @classmethod
     def latest_move(cls, game_id: int) -> str:
         """最新落子缓存键"""
-        return cls.get_key('game', 'latest_move', game_id)
+        return cls.get_key('game', 'latest_move', game_id, cls.generation_tag(cls.game_version(game_id)))
 
     @classmethod
     def player_color(cls, game_id: int, user_id: int) -> str:
         """玩家角色缓存键"""
-        return cls.get_key('game', 'player_color', game_id, user_id)
+        return cls.get_key('game', 'player_color', game_id, user_id, cls.generation_tag(cls.game_version(game_id)))
+
+    @classmethod
+    def game_state(cls, game_id: int) -> str:
+        """对局实时状态缓存键（二进制位棋盘，显式删除，不使用代际号）"""
+        return cls.get_key('game', 'state', game_id)
+
+    @classmethod
+    def socket_ticket(cls, ticket: str) -> str:
+        """对局推送一次性连接票据键（兑换时删除，不使用代际号）"""
+        return cls.get_key('ws', 'ticket', ticket)
 
 class CacheTimeouts:
     """缓存超时时间配置（秒）"""
@@ -95,6 +182,8 @@ class CacheTimeouts:
     GAME_INTERSECTIONS = 15 * 60  # 15分钟
     LATEST_MOVE = 10 * 60  # 10分钟
     PLAYER_COLOR = 30 * 60  # 30分钟
+    GAME_STATE = 2 * 60 * 60  # 2小时，对局实时状态可随时从数据库重建
+    SOCKET_TICKET = 30  # 30秒，签发后立即用于WebSocket握手
 
     # 用户相关
     USER_PROFILE = 30 * 60  # 30分钟
@@ -105,47 +194,236 @@ class CacheTimeouts:
     INVITATIONS = 10 * 60  # 10分钟
     SEARCH_USERS = 5 * 60  # 5分钟
 
-def cache_result(key_func: Callable, timeout: int = None, serialize: bool = True):
+class CacheCodec:
+    """
+    缓存值编解码器
+
+    帧格式：[编码版本 1字节][序列化格式 1字节][标志 1字节][数据]。
+    数据超过压缩阈值时才做zlib压缩，小值（如 {"color": "white"}）直接保存。
+    解码按帧内记录的格式进行，切换序列化格式时新旧数据可以共存；
+    遇到不认识的编码版本视为未命中，由调用方重算。兼容性只覆盖带本帧头的值，
+    不经本编解码器写入的键不在此列（见 settings.CACHES 的 VERSION）。
+    """
+
+    VERSION = 1
+    FLAG_COMPRESSED = 0x01
+    FORMATS = {'json': 0, 'orjson': 1, 'msgpack': 2}
+
+    def __init__(self, format_name: str = 'orjson', compress_min_bytes: int = 1024, compress_level: int = 6):
+        available = self.available_formats()
+        if format_name not in available:
+            logger.warning(f"Cache serializer '{format_name}' is not available, falling back to json")
+            format_name = 'json'
+        self.format_name = format_name
+        self.format_id = self.FORMATS[format_name]
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+
+    @staticmethod
+    def available_formats() -> list:
+        """当前环境可用的序列化格式"""
+        formats = ['json']
+        if orjson is not None:
+            formats.append('orjson')
+        if msgpack is not None:
+            formats.append('msgpack')
+        return formats
+
+    @staticmethod
+    def _dumps(format_id: int, obj: Any) -> bytes:
+        if format_id == 1:
+            return orjson.dumps(obj, default=str)
+        if format_id == 2:
+            return msgpack.packb(obj, use_bin_type=True, default=str)
+        return json.dumps(obj, default=str, ensure_ascii=False, separators=(',', ':')).encode()
+
+    @staticmethod
+    def _loads(format_id: int, data: bytes) -> Any:
+        if format_id == 1:
+            return orjson.loads(data)
+        if format_id == 2:
+            return msgpack.unpackb(data, raw=False)
+        return json.loads(data)
+
+    def encode(self, obj: Any) -> bytes:
+        """编码为带版本头的字节串"""
+        data = self._dumps(self.format_id, obj)
+        flags = 0
+        if len(data) >= self.compress_min_bytes:
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                data = compressed
+                flags |= self.FLAG_COMPRESSED
+        return bytes((self.VERSION, self.format_id, flags)) + data
+
+    def decode(self, frame: Any) -> Any:
+        """解码字节串，版本或格式不认识时抛出ValueError"""
+        if not isinstance(frame, (bytes, bytearray, memoryview)) or len(frame) < 3:
+            raise ValueError("Not an encoded cache value")
+        frame = bytes(frame)
+        version, format_id, flags = frame[0], frame[1], frame[2]
+        if version != self.VERSION:
+            raise ValueError(f"Unsupported cache codec version {version}")
+        if (format_id == 1 and orjson is None) or (format_id == 2 and msgpack is None) or format_id > 2:
+            raise ValueError(f"Cache serializer format {format_id} is not available")
+        data = frame[3:]
+        if flags & self.FLAG_COMPRESSED:
+            data = zlib.decompress(data)
+        return self._loads(format_id, data)
+
+
+cache_codec = CacheCodec(
+    format_name=getattr(settings, 'CACHE_SERIALIZER', 'orjson'),
+    compress_min_bytes=getattr(settings, 'CACHE_COMPRESS_MIN_BYTES', 1024),
+)
+
+def _find_request(args) -> Optional[Any]:
+    """从视图参数中找出请求对象（方法视图为第二个参数，函数视图为第一个参数）"""
+    for arg in args[:2]:
+        if hasattr(arg, 'user') and hasattr(arg, 'method'):
+            return arg
+    return None
+
+# 缓存击穿保护参数
+XFETCH_BETA = 1.0  # XFetch提前刷新系数，越大越早刷新
+STALE_GRACE = 30  # 逻辑过期后旧值继续保留的秒数，供刷新期间其他请求使用
+LOCK_TIMEOUT = 10  # 重算锁的最长持有时间（秒），防止进程崩溃后锁无法释放
+
+def _should_refresh(entry: dict) -> bool:
+    """XFetch概率提前过期：越接近过期、重算越慢，越可能由当前请求提前刷新"""
+    jitter = entry['delta'] * XFETCH_BETA * -math.log(1.0 - random.random())
+    return time.time() + jitter >= entry['expiry']
+
+def _acquire_lock(lock_key: str) -> bool:
+    """单飞锁：SET NX，只有一个进程能拿到"""
+    return bool(cache.add(lock_key, 1, LOCK_TIMEOUT))
+
+def _store_result(cache_key: str, result: Any, timeout: int, serialize: bool, started_at: float, done: Callable) -> None:
+    """
+    写入缓存条目 {'value', 'delta', 'expiry'}：响应对象保存渲染后的字节、状态码和内容类型，
+    其他返回值按原方式保存。delta为重算耗时，供XFetch使用；写入完成或放弃写入后调用done。
+    """
+    def store(value):
+        try:
+            now = time.time()
+            entry = {'value': value, 'delta': now - started_at, 'expiry': now + timeout}
+            tiered_cache.set(cache_key, entry, timeout + STALE_GRACE, codec=cache_codec if serialize else None)
+            logger.debug(f"Cached result for key: {cache_key}, timeout: {timeout}s")
+        except Exception as e:
+            logger.error(f"Failed to cache result for key {cache_key}: {e}")
+        finally:
+            done()
+
+    if not isinstance(result, HttpResponseBase):
+        store(result)
+        return
+
+    # 只缓存成功的完整响应，错误响应和流式响应不缓存
+    if result.status_code != 200 or result.streaming:
+        done()
+        return
+
+    def store_response(response):
+        try:
+            # 以文本保存响应内容，便于JSON类序列化格式编码
+            content = response.content.decode(response.charset)
+        except UnicodeDecodeError:
+            done()
+            return
+        store({
+            'status': response.status_code,
+            'content_type': response['Content-Type'],
+            'content': content,
+        })
+
+    if isinstance(result, SimpleTemplateResponse) and not result.is_rendered:
+        # DRF的Response在视图返回后才渲染，渲染完成后再写入缓存
+        result.add_post_render_callback(store_response)
+    else:
+        store_response(result)
+
+def _restore_result(entry: dict) -> Any:
+    """把缓存条目还原为响应对象或原返回值"""
+    cached = entry['value']
+    if isinstance(cached, dict) and 'content_type' in cached and 'content' in cached:
+        return HttpResponse(cached['content'], status=cached['status'], content_type=cached['content_type'])
+    return cached
+
+def cache_result(key_func: Callable, timeout: int = None, serialize: bool = True, vary_on_user: bool = False):
     """
     缓存结果装饰器
 
+    装饰视图时缓存渲染后的响应（内容字节、状态码、内容类型），命中时直接重放为 HttpResponse，
+    不再执行查询和序列化；只缓存200响应，缓存键自动区分协商出的渲染格式。
+    装饰普通函数时缓存其返回值。缓存键嵌入代际号、内容不变，因此经过进程内L1缓存。
+
+    防止缓存击穿：
+    - 单飞：重算前用 SET NX 加锁，同一时刻只有一个进程重算；
+      其他请求有旧值时直接返回旧值，没有旧值时自行重算但不写缓存（不睡眠等待，
+      等待会占住工作线程，ASGI下还会阻塞该worker唯一的同步执行线程）。
+    - XFetch：根据重算耗时在过期前按概率提前刷新，避免大量请求在同一时刻同时过期。
+
+    注意：命中缓存时视图内的对象级权限检查（get_object）不会执行，
+    响应内容或访问权限依赖当前用户时必须设置 vary_on_user=True。
+
     Args:
-        key_func: 生成缓存键的函数
+        key_func: 生成缓存键的函数，参数与被装饰函数相同
         timeout: 缓存超时时间（秒）
-        serialize: 是否序列化结果
+        serialize: 是否使用 cache_codec 编码缓存条目（False时交由缓存后端pickle）
+        vary_on_user: 是否按当前用户区分缓存
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
             # 生成缓存键
             cache_key = key_func(*args, **kwargs)
+            request = _find_request(args)
+            if request is not None:
+                if vary_on_user:
+                    cache_key = f"{cache_key}:u{request.user.id}"
+                renderer = getattr(request, 'accepted_renderer', None)
+                if renderer is not None:
+                    cache_key = f"{cache_key}:{renderer.format}"
+            lock_key = f"{cache_key}:lock"
+
+            if timeout is None:
+                final_timeout = getattr(CacheTimeouts, func.__name__.upper(), 300)
+            else:
+                final_timeout = timeout
 
             # 尝试从缓存获取
-            result = cache.get(cache_key)
-            if result is not None:
-                logger.debug(f"Cache hit for key: {cache_key}")
-                if serialize:
-                    try:
-                        result = json.loads(result)
-                    except (json.JSONDecodeError, TypeError):
-                        pass
-                return result
-
-            # 缓存未命中，执行函数
-            logger.debug(f"Cache miss for key: {cache_key}")
-            result = func(*args, **kwargs)
-
-            # 存储到缓存
+            codec = cache_codec if serialize else None
+            entry = tiered_cache.get(cache_key, codec=codec)
+            if entry is not None:
+                if not _should_refresh(entry):
+                    logger.debug(f"Cache hit for key: {cache_key}")
+                    return _restore_result(entry)
+                if not _acquire_lock(lock_key):
+                    # 其他进程正在刷新，先返回旧值
+                    logger.debug(f"Serving stale value while refreshing key: {cache_key}")
+                    return _restore_result(entry)
+                logger.debug(f"Early refresh for key: {cache_key}")
+            elif not _acquire_lock(lock_key):
+                # 其他进程正在重算且没有旧值：直接重算并返回，由持锁进程写入缓存
+                logger.debug(f"Cache miss while another worker refreshes key: {cache_key}")
+                return func(*args, **kwargs)
+            else:
+                logger.debug(f"Cache miss for key: {cache_key}")
+
+            def release_lock():
+                cache.delete(lock_key)
+
+            # 执行函数并写入缓存，写入完成后释放锁
+            started_at = time.time()
             try:
-                if timeout is None:
-                    final_timeout = getattr(CacheTimeouts, func.__name__.upper(), 300)
-                else:
-                    final_timeout = timeout
-
-                cache_value = json.dumps(result, default=str) if serialize else result
-                cache.set(cache_key, cache_value, final_timeout)
-                logger.debug(f"Cached result for key: {cache_key}, timeout: {final_timeout}s")
+                result = func(*args, **kwargs)
+            except Exception:
+                release_lock()
+                raise
+            try:
+                _store_result(cache_key, result, final_timeout, serialize, started_at, release_lock)
             except Exception as e:
+                release_lock()
                 logger.error(f"Failed to cache result for key {cache_key}: {e}")
 
             return result
@@ -153,82 +431,103 @@ def cache_result(key_func: Callable, timeout: int = None, serialize: bool = True
         return wrapper
     return decorator
 
-def invalidate_cache_pattern(pattern: str) -> int:
+def _initial_version() -> int:
+    """版本号初始值：取当前毫秒时间戳，计数器被淘汰重建后不会与旧ETag重复"""
+    return int(time.time() * 1000)
+
+def get_version(key: str) -> int:
+    """读取版本号计数器，不存在时初始化"""
+    return get_versions(key)[0]
+
+def get_versions(*keys: str) -> list:
+    """一次读取多个版本号计数器，不存在的计数器以初始值创建（不过期）"""
+    versions = tiered_cache.get_many(keys)
+    missing = [key for key in keys if versions.get(key) is None]
+    if missing:
+        for key in missing:
+            tiered_cache.add(key, _initial_version(), None)
+        versions.update(tiered_cache.get_many(missing))
+    return [versions.get(key) or _initial_version() for key in keys]
+
+def bump_version(key: str) -> None:
+    """递增版本号计数器，使基于它的ETag全部失效"""
+    try:
+        tiered_cache.incr(key)
+    except ValueError:
+        # 计数器不存在，直接以新的初始值创建
+        cache.set(key, _initial_version(), None)
+        tiered_cache.invalidate(key)
+
+def etag_matches(request, etag: str) -> bool:
+    """请求的 If-None-Match（可为多个ETag的列表或 *）是否与 etag 匹配"""
+    # nginx压缩响应时会把ETag改为弱ETag，比较时忽略 W/ 前缀
+    client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in client_etags or etag in [tag.removeprefix('W/') for tag in client_etags]
+
+def conditional_get(etag_func: Callable):
     """
-    根据模式失效缓存
+    条件GET装饰器
 
-    Args:
-        pattern: 缓存键模式（支持通配符）
+    先由 etag_func 计算ETag（应只读取缓存），与请求的 If-None-Match 匹配时直接返回304，
+    不执行查询和序列化；否则执行视图并在200响应上附带ETag。etag_func 返回None时不做处理。
+    响应标记为 private, no-cache，浏览器会自动携带 If-None-Match 重新验证，前端无需改动。
 
-    Returns:
-        失效的缓存键数量
+    Args:
+        etag_func: 生成ETag的函数，参数与视图方法相同
     """
-    try:
-        if hasattr(cache, 'delete_pattern'):
-            # Redis支持模式删除
-            count = cache.delete_pattern(f"{CacheKeyManager.PREFIX}:{pattern}")
-            logger.info(f"Invalidated {count} cache keys matching pattern: {pattern}")
-            return count
-        else:
-            # 其他缓存后端，遍历所有键
-            # 注意：这种方法效率较低，仅适用于本地开发
-            logger.warning("Cache backend does not support pattern deletion")
-            return 0
-    except Exception as e:
-        logger.error(f"Failed to invalidate cache pattern {pattern}: {e}")
-        return 0
-
-def invalidate_game_cache(game_id: int, user_id: int = None):
-    """失效游戏相关的缓存"""
-    patterns = [
-        f"games:list:*",  # 游戏列表
-        f"game:detail:{game_id}",  # 游戏详情
-        f"game:intersections:{game_id}",  # 棋子位置
-        f"game:latest_move:{game_id}",  # 最新落子
-        f"game:player_color:{game_id}:*",  # 玩家角色
-    ]
-
-    if user_id:
-        patterns.extend([
-            f"user:stats:{user_id}",  # 用户统计
-            f"games:list:user_{user_id}:*",  # 用户的游戏列表
-        ])
-
-    total_invalidated = 0
-    for pattern in patterns:
-        total_invalidated += invalidate_cache_pattern(pattern)
-
-    logger.info(f"Invalidated {total_invalidated} game-related cache entries for game {game_id}")
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            etag = etag_func(self, request, *args, **kwargs)
+            if etag is None:
+                return func(self, request, *args, **kwargs)
+
+            if etag_matches(request, etag):
+                response = HttpResponseNotModified()
+                response['ETag'] = etag
+                response['Cache-Control'] = 'private, no-cache'
+                return response
+
+            response = func(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                # 浏览器缓存响应，但每次使用前都带上 If-None-Match 重新验证
+                response['ETag'] = etag
+                response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return wrapper
+    return decorator
+
+def invalidate_game_cache(game_id: int, *user_ids: int):
+    """失效对局相关的缓存（详情、落子、最新落子、玩家角色），并失效参与者的对局列表"""
+    bump_version(CacheKeyManager.game_version(game_id))
+    for user_id in user_ids:
+        if user_id:
+            bump_version(CacheKeyManager.user_version(user_id))
+
+    logger.debug(f"Bumped cache generation for game {game_id} (users: {user_ids})")
+
+def invalidate_game_list_cache():
+    """失效不区分用户的全局对局列表缓存"""
+    bump_version(CacheKeyManager.game_list_version())
 
 def invalidate_user_cache(user_id: int):
-    """失效用户相关的缓存"""
-    patterns = [
-        f"user:profile:{user_id}",  # 用户资料
-        f"user:server:{user_id}",  # 用户服务区
-        f"user:stats:{user_id}",  # 用户统计
-        f"invitations:sent:{user_id}",  # 发出的邀请
-        f"invitations:received:{user_id}",  # 收到的邀请
-        f"games:list:user_{user_id}:*",  # 用户的游戏列表
-    ]
-
-    total_invalidated = 0
-    for pattern in patterns:
-        total_invalidated += invalidate_cache_pattern(pattern)
-
-    logger.info(f"Invalidated {total_invalidated} user-related cache entries for user {user_id}")
+    """失效用户相关的缓存（资料、服务区、统计、对局列表、邀请）"""
+    bump_version(CacheKeyManager.user_version(user_id))
+    bump_version(CacheKeyManager.invitations_version(user_id))
+
+    logger.debug(f"Bumped cache generation for user {user_id}")
 
 def invalidate_invitation_cache(inviter_id: int, invitee_id: int):
     """失效邀请相关的缓存"""
-    patterns = [
-        f"invitations:sent:{inviter_id}",  # 发出的邀请
-        f"invitations:received:{invitee_id}",  # 收到的邀请
-    ]
+    bump_version(CacheKeyManager.invitations_version(inviter_id))
+    bump_version(CacheKeyManager.invitations_version(invitee_id))
 
-    total_invalidated = 0
-    for pattern in patterns:
-        total_invalidated += invalidate_cache_pattern(pattern)
+    logger.debug(f"Bumped invitation cache generation for users {inviter_id}, {invitee_id}")
 
-    logger.info(f"Invalidated {total_invalidated} invitation-related cache entries")
+def invalidate_search_cache(server: Optional[str] = None):
+    """失效用户搜索缓存，不指定服务区时失效全部服务区"""
+    bump_version(CacheKeyManager.search_version(server))
 
 class CacheStats:
     """缓存统计"""
@@ -251,6 +550,11 @@ class CacheStats:
             logger.error(f"Failed to get Redis info: {e}")
             return {}
 
+    @staticmethod
+    def get_tier_stats() -> dict:
+        """两级缓存（进程内L1 / Redis L2）的命中/未命中统计，仅统计当前进程"""
+        return tiered_cache.stats()
+
     @staticmethod
     def get_hit_rate() -> float:
         """计算缓存命中率"""
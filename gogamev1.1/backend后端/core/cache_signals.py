@@ -5,42 +5,69 @@
 """
 
 import logging
+import threading
+
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 
 from core.cache_manager import (
     invalidate_game_cache,
+    invalidate_game_list_cache,
     invalidate_user_cache,
     invalidate_invitation_cache,
-    CacheKeyManager,
-    invalidate_cache_pattern
+    invalidate_search_cache,
 )
 from datab.models import Game, Intersection
+from datab.keyframes import drop_keyframes
+from datab.live_state import drop_live_state, rebuild_game_summary
 from invitation.models import UserServer, Invitation
 
 logger = logging.getLogger('cache.signals')
 
 # 游戏相关的信号处理
 
+def _invalidate_game_on_commit(game_id, user_ids=(), game_list=False):
+    """
+    事务提交后再递增对局缓存版本号（不在事务中时立即执行）
+
+    提交前递增的话，这期间的读请求拿到新版本号却仍读到旧数据，会把旧内容缓存在新版本的键
+    （及ETag）下，直到下一次写入前一直返回过期内容或304。
+    """
+    def invalidate():
+        try:
+            invalidate_game_cache(game_id, *user_ids)
+            if game_list:
+                invalidate_game_list_cache()
+        except Exception as e:
+            logger.error(f"Failed to invalidate cache for game {game_id}: {e}")
+
+    transaction.on_commit(invalidate)
+
 @receiver(post_save, sender=Game)
 def game_post_save(sender, instance, created, **kwargs):
     """游戏保存后失效相关缓存"""
     try:
-        # 失效游戏相关的缓存
-        invalidate_game_cache(instance.id)
-
-        # 失效玩家相关的缓存
-        invalidate_user_cache(instance.player1_id)
-        invalidate_user_cache(instance.player2_id)
-
-        # 失效游戏列表缓存
-        invalidate_cache_pattern("games:list:*")
+        # 失效游戏及双方玩家的对局列表缓存，以及全局游戏列表缓存
+        _invalidate_game_on_commit(instance.id, (instance.player1_id, instance.player2_id), game_list=True)
+        drop_live_state(instance.id)
 
         logger.info(f"Invalidated cache for game {instance.id} (created={created})")
     except Exception as e:
         logger.error(f"Failed to invalidate cache for game {instance.id}: {e}")
 
+@receiver(post_delete, sender=Game)
+def game_post_delete(sender, instance, **kwargs):
+    """游戏删除后失效相关缓存"""
+    try:
+        _invalidate_game_on_commit(instance.id, (instance.player1_id, instance.player2_id), game_list=True)
+        drop_live_state(instance.id)
+
+        logger.info(f"Invalidated cache for deleted game {instance.id}")
+    except Exception as e:
+        logger.error(f"Failed to invalidate cache for deleted game {instance.id}: {e}")
+
 @receiver(pre_save, sender=Game)
 def game_pre_save(sender, instance, **kwargs):
     """游戏保存前检查是否有状态变化"""
@@ -54,7 +81,7 @@ def game_pre_save(sender, instance, **kwargs):
 
             if old_completed != new_completed:
                 # 游戏完成状态变化，额外失效游戏列表
-                invalidate_cache_pattern("games:list:*")
+                invalidate_game_list_cache()
                 logger.info(f"Game {instance.id} completion status changed: {old_completed} -> {new_completed}")
     except Game.DoesNotExist:
         pass  # 新创建的游戏
@@ -63,22 +90,54 @@ def game_pre_save(sender, instance, **kwargs):
 
 # 落子相关的信号处理
 
+def _game_player_ids(game_id):
+    """查询对局双方的用户ID，用于递增双方的对局列表版本号"""
+    return Game.objects.filter(pk=game_id).values_list('player1_id', 'player2_id').first() or ()
+
+# 本线程待重算摘要的对局：{game_id: (已删除的关键帧起始手数, 提交回调)}
+_pending_summaries = threading.local()
+
+def _schedule_summary_rebuild(game_id, from_move):
+    """
+    落子行被删除或修改：在同一事务中删除第 from_move 手及之后的复盘关键帧，
+    事务提交后重算对局摘要；同一事务删除多行（如批量删除）时每局只重算一次
+    """
+    pending = _pending_summaries.__dict__.setdefault('games', {})
+    # 回调仍在当前连接的待提交列表中才算已安排；事务回滚后留下的记录不算
+    registered = {id(func) for _, func, _ in transaction.get_connection().run_on_commit}
+    for stale in [key for key, (_, func) in pending.items() if id(func) not in registered]:
+        del pending[stale]
+
+    scheduled = pending.get(game_id)
+    if scheduled is None or from_move < scheduled[0]:
+        # 这些关键帧之后的局面已改变；不删除的话重新走到该手时写入关键帧会违反唯一约束
+        drop_keyframes(game_id, from_move)
+    if scheduled is not None:
+        pending[game_id] = (min(from_move, scheduled[0]), scheduled[1])
+        return
+
+    def rebuild():
+        pending.pop(game_id, None)
+        rebuild_game_summary(game_id)
+        invalidate_game_cache(game_id, *_game_player_ids(game_id))
+
+    pending[game_id] = (from_move, rebuild)
+    transaction.on_commit(rebuild)
+
 @receiver(post_save, sender=Intersection)
 def intersection_post_save(sender, instance, created, **kwargs):
-    """落子保存后失效相关缓存"""
+    """落子保存后失效相关缓存；修改已有落子时重算对局摘要"""
     try:
         game_id = instance.game_id
 
-        # 失效游戏相关缓存
-        invalidate_game_cache(game_id)
-
-        # 失效落子位置缓存
-        cache_key = CacheKeyManager.game_intersections(game_id)
-        invalidate_cache_pattern(f"game:intersections:{game_id}")
-
-        # 失效最新落子缓存
-        cache_key = CacheKeyManager.latest_move(game_id)
-        invalidate_cache_pattern(f"game:latest_move:{game_id}")
+        # 失效游戏相关缓存（详情、落子位置、最新落子）及双方玩家的对局列表；
+        # 落子路径通过 instance._player_ids 传入双方ID，其他途径才查询对局
+        player_ids = getattr(instance, '_player_ids', None) or _game_player_ids(game_id)
+        _invalidate_game_on_commit(game_id, player_ids)
+        drop_live_state(game_id)
+        if not created:
+            # 修改前的手数未知（手数本身可能被修改），该局的关键帧全部删除，复盘时按需补建
+            _schedule_summary_rebuild(game_id, 1)
 
         logger.info(f"Invalidated cache for intersection in game {game_id} (created={created})")
     except Exception as e:
@@ -86,18 +145,14 @@ def intersection_post_save(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=Intersection)
 def intersection_post_delete(sender, instance, **kwargs):
-    """落子删除后失效相关缓存"""
+    """落子删除后失效相关缓存，删除该手及之后的关键帧并重算对局摘要（对局被删除时重算什么也不做）"""
     try:
         game_id = instance.game_id
 
-        # 失效游戏相关缓存
-        invalidate_game_cache(game_id)
-
-        # 失效落子位置缓存
-        invalidate_cache_pattern(f"game:intersections:{game_id}")
-
-        # 失效最新落子缓存
-        invalidate_cache_pattern(f"game:latest_move:{game_id}")
+        # 失效游戏相关缓存（详情、落子位置、最新落子）及双方玩家的对局列表
+        _invalidate_game_on_commit(game_id, _game_player_ids(game_id))
+        drop_live_state(game_id)
+        _schedule_summary_rebuild(game_id, instance.move_number)
 
         logger.info(f"Invalidated cache for deleted intersection in game {game_id}")
     except Exception as e:
@@ -115,7 +170,7 @@ def user_post_save(sender, instance, created, **kwargs):
         invalidate_user_cache(user_id)
 
         # 失效搜索用户缓存
-        invalidate_cache_pattern("search:users:*")
+        invalidate_search_cache()
 
         logger.info(f"Invalidated cache for user {user_id} (created={created})")
     except Exception as e:
@@ -130,12 +185,10 @@ def user_server_post_save(sender, instance, created, **kwargs):
         user_id = instance.user_id
 
         # 失效用户服务区缓存
-        cache_key = CacheKeyManager.user_server(user_id)
-        cache_key_pattern = f"user:server:{user_id}"
-        invalidate_cache_pattern(cache_key_pattern)
+        invalidate_user_cache(user_id)
 
         # 失效搜索用户缓存
-        invalidate_cache_pattern(f"search:users:{instance.server}:*")
+        invalidate_search_cache(instance.server)
 
         logger.info(f"Invalidated cache for user server {user_id} (created={created})")
     except Exception as e:
@@ -148,10 +201,10 @@ def user_server_post_delete(sender, instance, **kwargs):
         user_id = instance.user_id
 
         # 失效用户服务区缓存
-        invalidate_cache_pattern(f"user:server:{user_id}")
+        invalidate_user_cache(user_id)
 
         # 失效搜索用户缓存
-        invalidate_cache_pattern(f"search:users:{instance.server}:*")
+        invalidate_search_cache(instance.server)
 
         logger.info(f"Invalidated cache for deleted user server {user_id}")
     except Exception as e:
@@ -190,13 +243,19 @@ def invitation_post_delete(sender, instance, **kwargs):
 # 批量操作缓存失效辅助函数
 
 def invalidate_bulk_game_cache(game_ids):
-    """批量失效游戏缓存"""
+    """批量失效游戏缓存，并递增双方玩家的对局列表版本号（一次查询取出所有对局的玩家）"""
     try:
+        players = {
+            game_id: (player1_id, player2_id)
+            for game_id, player1_id, player2_id in Game.objects.filter(pk__in=game_ids).values_list(
+                'id', 'player1_id', 'player2_id'
+            )
+        }
         for game_id in game_ids:
-            invalidate_game_cache(game_id)
+            invalidate_game_cache(game_id, *players.get(game_id, ()))
 
         # 同时失效游戏列表缓存
-        invalidate_cache_pattern("games:list:*")
+        invalidate_game_list_cache()
 
         logger.info(f"Invalidated cache for {len(game_ids)} games")
     except Exception as e:
@@ -209,7 +268,7 @@ def invalidate_bulk_user_cache(user_ids):
             invalidate_user_cache(user_id)
 
         # 同时失效搜索用户缓存
-        invalidate_cache_pattern("search:users:*")
+        invalidate_search_cache()
 
         logger.info(f"Invalidated cache for {len(user_ids)} users")
     except Exception as e:
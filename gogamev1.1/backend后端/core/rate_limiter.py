@@ -0,0 +1,282 @@
+"""
+限流引擎
+
+每次检查在Redis上以一个Lua脚本原子完成（一次往返），支持两种策略：
+- SlidingWindowPolicy：滑动窗口日志，任意连续 window 秒内最多 limit 次，可同时约束多个窗口
+- TokenBucketPolicy：令牌桶，容量 capacity，每秒补充 refill_rate 个令牌
+
+默认缓存不是Redis或Redis不可用时退回进程内限流（仅对当前进程有效）。
+"""
+
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger('cache')
+
+KEY_PREFIX = 'gogame:ratelimit'
+REDIS_RETRY_INTERVAL = 5  # Redis出错后暂停使用的秒数，期间直接走进程内限流
+
+# KEYS: 各窗口的有序集合键；ARGV: limit1, window_ms1, limit2, window_ms2, ..., member
+SLIDING_WINDOW_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local member = ARGV[#ARGV]
+local allowed = 1
+local counts = {}
+local waits = {}
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    local wait = 0
+    if count >= limit then
+        allowed = 0
+        local entry = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+        wait = tonumber(entry[2]) + window - now
+    end
+    counts[i] = count
+    waits[i] = wait
+end
+local result = {allowed}
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[2 * i])
+    if allowed == 1 then
+        redis.call('ZADD', key, now, member)
+        redis.call('PEXPIRE', key, window)
+        counts[i] = counts[i] + 1
+    end
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local reset = window
+    if oldest[2] then
+        reset = tonumber(oldest[2]) + window - now
+    end
+    result[#result + 1] = counts[i]
+    result[#result + 1] = waits[i]
+    result[#result + 1] = reset
+end
+return result
+"""
+
+# KEYS: 令牌桶哈希键；ARGV: capacity, refill_rate(每秒), cost
+TOKEN_BUCKET_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2]) / 1000
+local cost = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = math.ceil((cost - tokens) / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate) + 1000)
+return {allowed, math.floor(tokens), wait, math.ceil((capacity - tokens) / rate)}
+"""
+
+
+class RateLimitResult:
+    """一次限流检查的结果，时间单位为秒"""
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset: float, retry_after: float = 0):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = max(0, remaining)
+        self.reset = max(0.0, reset)
+        self.retry_after = max(0.0, retry_after)
+
+    def headers(self) -> dict:
+        """响应头：X-RateLimit-*（reset为距重置的秒数），被拒绝时附带 Retry-After"""
+        headers = {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.remaining),
+            'X-RateLimit-Reset': str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+class SlidingWindowPolicy:
+    """滑动窗口策略，windows 为 (limit, window_seconds) 列表，所有窗口都有余量时才放行并同时计数"""
+
+    script = SLIDING_WINDOW_SCRIPT
+
+    def __init__(self, *windows):
+        if not windows:
+            raise ValueError('SlidingWindowPolicy requires at least one (limit, window) pair')
+        self.windows = [(int(limit), float(window)) for limit, window in windows]
+
+    def _keys(self, key):
+        return [f'{KEY_PREFIX}:sw:{key}:{int(window)}' for _, window in self.windows]
+
+    def check_redis(self, script, connection, key) -> RateLimitResult:
+        args = []
+        for limit, window in self.windows:
+            args.extend([limit, int(window * 1000)])
+        args.append(uuid.uuid4().hex)
+        raw = script(keys=self._keys(key), args=args, client=connection)
+        allowed = bool(raw[0])
+        states = [
+            (count, wait / 1000, reset / 1000)
+            for count, wait, reset in zip(raw[1::3], raw[2::3], raw[3::3])
+        ]
+        return self._result(allowed, states)
+
+    def check_local(self, store, key) -> RateLimitResult:
+        now = time.monotonic()
+        with store.lock:
+            logs = []
+            for (limit, window), window_key in zip(self.windows, self._keys(key)):
+                log = store.entry(window_key, deque, now + window)
+                while log and log[0] <= now - window:
+                    log.popleft()
+                logs.append(log)
+
+            allowed = True
+            waits = []
+            for (limit, window), log in zip(self.windows, logs):
+                if len(log) >= limit:
+                    allowed = False
+                    waits.append(log[len(log) - limit] + window - now)
+                else:
+                    waits.append(0)
+            if allowed:
+                for log in logs:
+                    log.append(now)
+
+            states = [
+                (len(log), wait, (log[0] + window - now) if log else window)
+                for (_, window), log, wait in zip(self.windows, logs, waits)
+            ]
+        return self._result(allowed, states)
+
+    def _result(self, allowed, states) -> RateLimitResult:
+        """按剩余次数最少的窗口报告；被拒绝时等待时间取各窗口中最长的"""
+        remaining = [limit - count for (limit, _), (count, _, _) in zip(self.windows, states)]
+        index = min(range(len(states)), key=lambda i: remaining[i])
+        return RateLimitResult(
+            allowed=allowed,
+            limit=self.windows[index][0],
+            remaining=remaining[index],
+            reset=states[index][2],
+            retry_after=max(wait for _, wait, _ in states),
+        )
+
+
+class TokenBucketPolicy:
+    """令牌桶策略，允许 capacity 次突发，之后每秒恢复 refill_rate 次"""
+
+    script = TOKEN_BUCKET_SCRIPT
+
+    def __init__(self, capacity: int, refill_rate: float, cost: int = 1):
+        self.capacity = int(capacity)
+        self.refill_rate = float(refill_rate)
+        self.cost = int(cost)
+
+    def _key(self, key):
+        return f'{KEY_PREFIX}:tb:{key}'
+
+    def check_redis(self, script, connection, key) -> RateLimitResult:
+        allowed, tokens, wait, reset = script(
+            keys=[self._key(key)], args=[self.capacity, self.refill_rate, self.cost], client=connection
+        )
+        return RateLimitResult(bool(allowed), self.capacity, int(tokens), reset / 1000, wait / 1000)
+
+    def check_local(self, store, key) -> RateLimitResult:
+        now = time.monotonic()
+        refill_time = self.capacity / self.refill_rate
+        with store.lock:
+            state = store.entry(self._key(key), lambda: [float(self.capacity), now], now + refill_time)
+            tokens = min(self.capacity, state[0] + (now - state[1]) * self.refill_rate)
+            allowed = tokens >= self.cost
+            wait = 0 if allowed else (self.cost - tokens) / self.refill_rate
+            if allowed:
+                tokens -= self.cost
+            state[0], state[1] = tokens, now
+        return RateLimitResult(
+            allowed, self.capacity, int(tokens), (self.capacity - tokens) / self.refill_rate, wait
+        )
+
+
+class LocalRateLimitStore:
+    """进程内限流状态，条目带过期时间，数量超过上限时清理过期条目"""
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self._data = {}  # 键 -> [过期时间, 状态]
+
+    def entry(self, key, factory, expires_at):
+        """返回键对应的可变状态（不存在或已过期时用factory新建），调用方需持有lock"""
+        now = time.monotonic()
+        item = self._data.get(key)
+        if item is None or item[0] < now:
+            if len(self._data) >= self.max_keys:
+                self._purge(now)
+            item = self._data[key] = [expires_at, factory()]
+        else:
+            item[0] = max(item[0], expires_at)
+        return item[1]
+
+    def _purge(self, now):
+        for key in [k for k, (expires_at, _) in self._data.items() if expires_at < now]:
+            del self._data[key]
+
+    def clear(self):
+        with self.lock:
+            self._data.clear()
+
+
+class RateLimiter:
+    """限流器：优先在Redis上原子检查，不可用时退回进程内限流"""
+
+    def __init__(self):
+        self.local = LocalRateLimitStore()
+        self._scripts = {}
+        self._redis_down_until = 0.0
+
+    def check(self, key: str, policy) -> RateLimitResult:
+        """按策略检查并计数一次请求"""
+        connection = self._connection()
+        if connection is not None:
+            try:
+                return policy.check_redis(self._script(connection, policy), connection, key)
+            except Exception as e:
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+                logger.warning(f"Redis rate limiting unavailable, falling back to in-process limiter: {e}")
+        return policy.check_local(self.local, key)
+
+    def _connection(self):
+        """默认缓存为django_redis且最近未出错时返回原生Redis连接"""
+        if time.monotonic() < self._redis_down_until:
+            return None
+        if not settings.CACHES.get('default', {}).get('BACKEND', '').startswith('django_redis.'):
+            return None
+        from django_redis import get_redis_connection
+
+        return get_redis_connection('default')
+
+    def _script(self, connection, policy):
+        """注册Lua脚本（之后以EVALSHA调用，脚本缓存丢失时自动重新加载）"""
+        script = self._scripts.get(policy.script)
+        if script is None:
+            script = self._scripts[policy.script] = connection.register_script(policy.script)
+        return script
+
+
+rate_limiter = RateLimiter()
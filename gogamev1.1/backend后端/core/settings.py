@@ -165,10 +165,15 @@ if os.getenv('REDIS_URL') or (os.getenv('REDIS_HOST') and os.getenv('REDIS_HOST'
                     "max_connections": 50,
                     "retry_on_timeout": True,
                 },
-                "COMPRESSOR": "django_redis.compressors.zlib.ZlibCompressor",
+                # 不在后端统一压缩：cache_result 的缓存值由 core.cache_manager.CacheCodec
+                # 编码并只在超过 CACHE_COMPRESS_MIN_BYTES 时压缩
                 "IGNORE_EXCEPTIONS": True,  # Fallback to database if Redis is down
             },
             "KEY_PREFIX": "gogame",
+            # 去掉 ZlibCompressor 后，旧版本进程直接写入的值（实时局面、版本计数器等
+            # 不经 CacheCodec 的键）新进程无法读取；提升键版本让新进程从空键空间开始，
+            # 旧键随过期或淘汰清除。新旧进程不共享缓存失效，升级需整体替换而非滚动部署
+            "VERSION": 2,
             "TIMEOUT": 300,  # Default timeout: 5 minutes
         },
         # Separate cache for sessions
@@ -199,6 +204,14 @@ else:
         }
     }
 
+# Per-process L1 cache in front of the default cache (see core/tiered_cache.py)
+CACHE_L1_MAX_ENTRIES = int(os.getenv('CACHE_L1_MAX_ENTRIES', '2048'))
+CACHE_L1_TTL = float(os.getenv('CACHE_L1_TTL', '5'))  # seconds
+
+# Cached value encoding (see core.cache_manager.CacheCodec): orjson | msgpack | json
+CACHE_SERIALIZER = os.getenv('CACHE_SERIALIZER', 'orjson')
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv('CACHE_COMPRESS_MIN_BYTES', '1024'))
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -280,6 +293,14 @@ else:
         "http://127.0.0.1",
     ]
 
+# 允许前端读取限流响应头
+CORS_EXPOSE_HEADERS = [
+    "Retry-After",
+    "X-RateLimit-Limit",
+    "X-RateLimit-Remaining",
+    "X-RateLimit-Reset",
+]
+
 
 
 # core/settings.py (文件末尾)
@@ -0,0 +1,221 @@
+"""
+两级缓存模块
+
+L1为进程内LRU缓存（容量有限、TTL较短），L2为Django默认缓存（Redis）。
+读取先查L1，未命中再查L2并回填L1，省去热点键的网络往返和zlib解压。
+
+只有内容不会原地改变的键才应经过两级缓存：嵌入代际号的缓存键（见 CacheKeyManager）
+一经写入不再变化；代际计数器本身递增时，通过Redis发布/订阅广播失效消息，
+所有进程删除各自的L1副本。对局实时状态、限流计数等频繁原地修改的键仍直接使用L2。
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('cache')
+
+INVALIDATION_CHANNEL = 'gogame:cache-invalidate'  # L1失效广播频道
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """线程安全的进程内LRU缓存，条目超过TTL后视为不存在"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # 键 -> (过期时间, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """读取条目，不存在或已过期时返回 _MISSING"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """写入条目，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        """删除条目"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """清空全部条目"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache:
+    """L1进程内LRU + L2 Django缓存的两级缓存，记录各层命中/未命中次数"""
+
+    def __init__(self, backend, max_entries: int, ttl: float):
+        self.backend = backend
+        self.local = LocalLRUCache(max_entries, ttl)
+        self._counters = {'l1_hits': 0, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0}
+        self._counter_lock = threading.Lock()
+        self._subscriber = None
+        self._subscriber_lock = threading.Lock()
+
+    # 读写
+
+    def get(self, key, default=None, codec=None):
+        """读取：L1 -> L2，L2命中时回填L1（L1保存解码后的对象，命中时无需再解码）"""
+        self._ensure_subscriber()
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self._count(l1_hits=1)
+            return value
+
+        value = self.backend.get(key, _MISSING)
+        if value is not _MISSING and codec is not None:
+            try:
+                value = codec.decode(value)
+            except ValueError as e:
+                # 旧格式或不兼容版本写入的数据，按未命中处理
+                logger.debug(f"Discarding undecodable cache value for key {key}: {e}")
+                value = _MISSING
+        if value is _MISSING:
+            self._count(l1_misses=1, l2_misses=1)
+            return default
+        self._count(l1_misses=1, l2_hits=1)
+        self.local.set(key, value)
+        return value
+
+    def get_many(self, keys) -> dict:
+        """批量读取：L1未命中的键合并为一次L2请求"""
+        self._ensure_subscriber()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(key)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if missing:
+            fetched = self.backend.get_many(missing)
+            for key, value in fetched.items():
+                self.local.set(key, value)
+            found.update(fetched)
+            self._count(l2_hits=len(fetched), l2_misses=len(missing) - len(fetched))
+        self._count(l1_hits=len(keys) - len(missing), l1_misses=len(missing))
+        return found
+
+    def set(self, key, value, timeout=None, codec=None):
+        """写入两级缓存，指定codec时L2保存编码后的字节串"""
+        self.backend.set(key, codec.encode(value) if codec is not None else value, timeout)
+        self.local.set(key, value)
+
+    def add(self, key, value, timeout=None) -> bool:
+        """仅在L2不存在该键时写入，L1副本以L2为准重新读取"""
+        added = self.backend.add(key, value, timeout)
+        self.local.delete(key)
+        return added
+
+    def incr(self, key, delta: int = 1) -> int:
+        """在L2上原子递增，并广播删除所有进程的L1副本"""
+        value = self.backend.incr(key, delta)
+        self.invalidate(key)
+        return value
+
+    def invalidate(self, *keys):
+        """删除本进程的L1副本，并通知其他进程删除"""
+        for key in keys:
+            self.local.delete(key)
+        connection = _redis_connection()
+        if connection is None:
+            return
+        try:
+            for key in keys:
+                connection.publish(INVALIDATION_CHANNEL, key)
+        except Exception as e:
+            logger.warning(f"Failed to broadcast L1 invalidation: {e}")
+
+    # 统计
+
+    def _count(self, **deltas):
+        with self._counter_lock:
+            for name, delta in deltas.items():
+                self._counters[name] += delta
+
+    def stats(self) -> dict:
+        """各层命中/未命中次数、命中率及L1条目数"""
+        with self._counter_lock:
+            counters = dict(self._counters)
+        for tier in ('l1', 'l2'):
+            total = counters[f'{tier}_hits'] + counters[f'{tier}_misses']
+            counters[f'{tier}_hit_rate'] = round(counters[f'{tier}_hits'] / total * 100, 2) if total else 0.0
+        counters['l1_entries'] = len(self.local)
+        return counters
+
+    # 失效广播订阅
+
+    def _ensure_subscriber(self):
+        """按需启动本进程的失效广播订阅线程（仅Redis后端）"""
+        if self._subscriber is not None and self._subscriber.is_alive():
+            return
+        if _redis_connection() is None:
+            return
+        with self._subscriber_lock:
+            if self._subscriber is not None and self._subscriber.is_alive():
+                return
+            self._subscriber = threading.Thread(
+                target=self._listen, name='l1-cache-invalidation', daemon=True
+            )
+            self._subscriber.start()
+
+    def _listen(self):
+        """订阅失效广播并删除对应的L1条目，断线重连后清空L1（期间的广播可能已丢失）"""
+        delay = 1
+        while True:
+            try:
+                pubsub = _redis_connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                self.local.clear()
+                delay = 1
+                for message in pubsub.listen():
+                    key = message['data']
+                    self.local.delete(key.decode() if isinstance(key, bytes) else key)
+            except Exception as e:
+                logger.warning(f"L1 invalidation subscription lost: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+
+def _redis_connection():
+    """默认缓存为django_redis时返回原生Redis连接，否则返回None"""
+    if not settings.CACHES.get('default', {}).get('BACKEND', '').startswith('django_redis.'):
+        return None
+    from django_redis import get_redis_connection
+
+    return get_redis_connection('default')
+
+
+tiered_cache = TieredCache(
+    cache,
+    max_entries=getattr(settings, 'CACHE_L1_MAX_ENTRIES', 2048),
+    ttl=getattr(settings, 'CACHE_L1_TTL', 5),
+)
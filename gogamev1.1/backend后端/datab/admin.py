@@ -46,4 +46,14 @@ class IntersectionAdmin(admin.ModelAdmin):
     )
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('game')
\ No newline at end of file
+        return super().get_queryset(request).select_related('game')
+
+    # 落子只能经规则引擎追加，后台只读，避免与对局摘要、局面哈希不一致
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
\ No newline at end of file
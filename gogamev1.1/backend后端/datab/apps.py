@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class DatabConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "datab"
+
+    def ready(self):
+        """注册玩家对局计数和对局参与者索引的信号处理"""
+        import datab.game_stats  # noqa: F401
+        import datab.participants  # noqa: F401
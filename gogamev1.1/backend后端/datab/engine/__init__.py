@@ -0,0 +1,36 @@
+"""
+服务端围棋规则引擎
+
+纯Python实现，不依赖Django，可在视图、管理命令和进程池中直接使用。
+"""
+
+from .bitboard import BOARD_SIZE, NUM_POINTS
+from .board import BLACK, WHITE, COLORS, Board, IllegalMove, MoveResult, opponent
+from .scoring import Score, dead_stone_mask, score_board, score_position, score_replay
+from .snapshot import KEYFRAME_INTERVAL, is_keyframe, keyframe_snapshots, pack_snapshot, unpack_snapshot
+from .zobrist import pack_hashes, unpack_hash_list, unpack_hashes
+
+__all__ = [
+	'BOARD_SIZE',
+	'NUM_POINTS',
+	'BLACK',
+	'WHITE',
+	'COLORS',
+	'Board',
+	'IllegalMove',
+	'KEYFRAME_INTERVAL',
+	'MoveResult',
+	'Score',
+	'dead_stone_mask',
+	'is_keyframe',
+	'keyframe_snapshots',
+	'opponent',
+	'pack_hashes',
+	'pack_snapshot',
+	'score_board',
+	'score_position',
+	'score_replay',
+	'unpack_hash_list',
+	'unpack_hashes',
+	'unpack_snapshot',
+]
@@ -0,0 +1,69 @@
+"""
+位棋盘工具模块
+
+把19x19棋盘打包为Python整数：第 row*19+col 位表示 (row, col) 交叉点（0起始）。
+所有邻接、填充运算都以整数位运算完成，不逐点遍历。
+"""
+
+BOARD_SIZE = 19
+NUM_POINTS = BOARD_SIZE * BOARD_SIZE
+
+# 整个棋盘的掩码
+BOARD_MASK = (1 << NUM_POINTS) - 1
+
+
+def _column_mask(col):
+	"""生成某一列全部交叉点的掩码"""
+	mask = 0
+	for row in range(BOARD_SIZE):
+		mask |= 1 << (row * BOARD_SIZE + col)
+	return mask
+
+
+# 左右边界列掩码，用于阻止横向移位时跨行
+NOT_LEFT_COL = BOARD_MASK & ~_column_mask(0)
+NOT_RIGHT_COL = BOARD_MASK & ~_column_mask(BOARD_SIZE - 1)
+
+
+def point_index(row, col):
+	"""(row, col) 转换为位序号（0起始坐标）"""
+	return row * BOARD_SIZE + col
+
+
+def point_coords(index):
+	"""位序号转换为 (row, col)（0起始坐标）"""
+	return divmod(index, BOARD_SIZE)
+
+
+def neighbors(bits):
+	"""返回与bits相邻（上下左右）的所有交叉点，不含bits本身"""
+	adjacent = (
+		((bits & NOT_RIGHT_COL) << 1)
+		| ((bits & NOT_LEFT_COL) >> 1)
+		| (bits << BOARD_SIZE)
+		| (bits >> BOARD_SIZE)
+	)
+	return adjacent & BOARD_MASK & ~bits
+
+
+def flood_fill(seed, within):
+	"""从seed出发，在within范围内做连通填充，返回连通块掩码"""
+	region = seed & within
+	while True:
+		grown = (region | neighbors(region)) & within
+		if grown == region:
+			return region
+		region = grown
+
+
+def iter_points(bits):
+	"""按位序号升序遍历bits中的所有交叉点"""
+	while bits:
+		low = bits & -bits
+		yield low.bit_length() - 1
+		bits ^= low
+
+
+def popcount(bits):
+	"""统计bits中置位的交叉点数量"""
+	return bits.bit_count()
@@ -0,0 +1,245 @@
+"""
+围棋规则引擎 - 棋盘状态
+
+以位棋盘保存黑白棋子，使用并查集跟踪棋串，并在每一手中增量维护各棋串的气。
+局面的Zobrist哈希同样增量维护；设置history后按局面超级劫规则拒绝同形再现。
+坐标均为0起始的 (row, col)，与数据库中1起始的坐标相差1，由调用方负责转换。
+"""
+
+from collections import namedtuple
+
+from .bitboard import (
+	BOARD_MASK,
+	BOARD_SIZE,
+	NUM_POINTS,
+	flood_fill,
+	iter_points,
+	neighbors,
+	point_coords,
+	point_index,
+)
+from .zobrist import EMPTY_HASH, position_hash, zobrist_table
+
+BLACK = 'black'
+WHITE = 'white'
+COLORS = (BLACK, WHITE)
+
+
+def opponent(color):
+	"""返回对手颜色"""
+	return WHITE if color == BLACK else BLACK
+
+
+# 落子结果：落子点、颜色、被提棋子坐标列表、落子后的手数
+MoveResult = namedtuple('MoveResult', ['row', 'col', 'color', 'captured', 'move_number'])
+
+
+class IllegalMove(Exception):
+	"""非法落子异常，reason为机器可读的原因代码"""
+
+	def __init__(self, reason, message):
+		super().__init__(message)
+		self.reason = reason
+		self.message = message
+
+
+class Board:
+	"""19路棋盘状态，支持提子、劫和自杀判断"""
+
+	def __init__(self):
+		self.stones = {BLACK: 0, WHITE: 0}  # 各颜色的位棋盘
+		self.captures = {BLACK: 0, WHITE: 0}  # 各颜色累计提子数
+		self.to_move = BLACK  # 当前行棋方
+		self.move_number = 0  # 已下手数
+		self.ko_point = None  # 劫点位序号，None表示无劫
+		self.hash = EMPTY_HASH  # 当前局面的Zobrist哈希
+		self.history = None  # 历史局面哈希集合，None表示不做超级劫检查
+		self._parent = list(range(NUM_POINTS))  # 并查集父节点
+		self._group_stones = {}  # 棋串根节点 -> 棋串棋子掩码
+		self._group_libs = {}  # 棋串根节点 -> 棋串气的掩码
+
+	@classmethod
+	def replay(cls, moves, history=None):
+		"""按顺序重放 (row, col, color) 序列构建棋盘，遇到非法落子时抛出IllegalMove
+
+		传入history（集合）时，重放过程中会检查并记录每个局面的哈希。
+		"""
+		board = cls()
+		board.history = history
+		for row, col, color in moves:
+			board.play(row, col, color)
+		return board
+
+	@classmethod
+	def from_position(cls, black, white, to_move=BLACK, move_number=0, captures=None, ko_point=None):
+		"""由位棋盘等局面信息直接构建棋盘，棋串与气根据棋子分布重新计算"""
+		board = cls()
+		board.stones = {BLACK: black, WHITE: white}
+		board.to_move = to_move
+		board.move_number = move_number
+		board.captures = dict(captures) if captures else {BLACK: 0, WHITE: 0}
+		board.ko_point = ko_point
+		board.hash = position_hash(black, white)
+		board._rebuild_groups()
+		return board
+
+	# 查询
+
+	@property
+	def occupied(self):
+		"""所有已有棋子的交叉点"""
+		return self.stones[BLACK] | self.stones[WHITE]
+
+	def color_at(self, row, col):
+		"""返回 (row, col) 上的棋子颜色，空点返回None"""
+		bit = 1 << point_index(row, col)
+		if self.stones[BLACK] & bit:
+			return BLACK
+		if self.stones[WHITE] & bit:
+			return WHITE
+		return None
+
+	def liberties(self, row, col):
+		"""返回 (row, col) 所在棋串的气数，空点返回0"""
+		index = point_index(row, col)
+		if not (self.occupied >> index) & 1:
+			return 0
+		return self._group_libs[self._find(index)].bit_count()
+
+	def is_legal(self, row, col, color=None):
+		"""判断落子是否合法（不修改棋盘）"""
+		try:
+			self._check(row, col, color or self.to_move)
+		except IllegalMove:
+			return False
+		return True
+
+	# 落子
+
+	def play(self, row, col, color=None):
+		"""在 (row, col) 落子并结算提子，返回MoveResult；非法时抛出IllegalMove且棋盘不变"""
+		color = color or self.to_move
+		index, friend_roots, enemy_roots, captured_roots, new_hash = self._check(row, col, color)
+		bit = 1 << index
+		enemy = opponent(color)
+
+		# 放置棋子并与相邻己方棋串合并
+		self.stones[color] |= bit
+		root = self._merge(index, friend_roots)
+
+		# 相邻敌方棋串失去这口气
+		for enemy_root in enemy_roots:
+			self._group_libs[enemy_root] &= ~bit
+
+		# 提子
+		captured_mask = 0
+		for enemy_root in captured_roots:
+			captured_mask |= self._group_stones.pop(enemy_root)
+			del self._group_libs[enemy_root]
+		if captured_mask:
+			self.stones[enemy] &= ~captured_mask
+			for point in iter_points(captured_mask):
+				self._parent[point] = point
+			# 被提位置成为相邻己方棋串的气
+			restored_roots = {self._find(p) for p in iter_points(neighbors(captured_mask) & self.stones[color])}
+			for friend_root in restored_roots:
+				self._group_libs[friend_root] |= neighbors(self._group_stones[friend_root]) & captured_mask
+
+		# 单提一子且落子棋串只有一子一气（即被提位置）时形成劫
+		captured_count = captured_mask.bit_count()
+		if captured_count == 1 and self._group_stones[root] == bit and self._group_libs[root] == captured_mask:
+			self.ko_point = captured_mask.bit_length() - 1
+		else:
+			self.ko_point = None
+
+		self.captures[color] += captured_count
+		self.move_number += 1
+		self.to_move = enemy
+		self.hash = new_hash
+		if self.history is not None:
+			self.history.add(new_hash)
+
+		captured = [point_coords(p) for p in iter_points(captured_mask)]
+		return MoveResult(row, col, color, captured, self.move_number)
+
+	# 内部实现
+
+	def _check(self, row, col, color):
+		"""校验落子，返回 (位序号, 相邻己方棋串, 相邻敌方棋串, 将被提的敌方棋串, 落子后的局面哈希)"""
+		if not (0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE):
+			raise IllegalMove('out_of_bounds', f"位置 ({row + 1}, {col + 1}) 超出棋盘范围。")
+		if color != self.to_move:
+			raise IllegalMove('wrong_turn', f"轮次错误：当前应由{self.to_move}方落子。")
+
+		index = point_index(row, col)
+		bit = 1 << index
+		if self.occupied & bit:
+			raise IllegalMove('occupied', f"位置 ({row + 1}, {col + 1}) 已有棋子。")
+		if index == self.ko_point:
+			raise IllegalMove('ko', "此处为劫，不能立刻回提！")
+
+		adjacent = neighbors(bit)
+		friend_roots = {self._find(p) for p in iter_points(adjacent & self.stones[color])}
+		enemy_roots = {self._find(p) for p in iter_points(adjacent & self.stones[opponent(color)])}
+		captured_roots = [r for r in enemy_roots if self._group_libs[r] == bit]
+
+		if not captured_roots:
+			# 不提子时，新棋串的气 = 落子点的空邻点 + 相邻己方棋串的气 - 落子点
+			new_libs = adjacent & ~self.occupied
+			for friend_root in friend_roots:
+				new_libs |= self._group_libs[friend_root]
+			if not (new_libs & ~bit):
+				raise IllegalMove('suicide', "禁止着手！此处落子会导致自杀。")
+
+		# 增量计算落子后的局面哈希：加入新子，移除被提的棋子
+		new_hash = self.hash ^ zobrist_table(color)[index]
+		enemy_table = zobrist_table(opponent(color))
+		for enemy_root in captured_roots:
+			for point in iter_points(self._group_stones[enemy_root]):
+				new_hash ^= enemy_table[point]
+		if self.history is not None and new_hash in self.history:
+			raise IllegalMove('superko', "禁止全局同形再现（超级劫）。")
+
+		return index, friend_roots, enemy_roots, captured_roots, new_hash
+
+	def _rebuild_groups(self):
+		"""用连通填充重新划分所有棋串并计算气"""
+		empty = BOARD_MASK & ~self.occupied
+		for color in COLORS:
+			remaining = self.stones[color]
+			while remaining:
+				seed = remaining & -remaining
+				root = seed.bit_length() - 1
+				group = flood_fill(seed, self.stones[color])
+				for point in iter_points(group):
+					self._parent[point] = root
+				self._group_stones[root] = group
+				self._group_libs[root] = neighbors(group) & empty
+				remaining &= ~group
+
+	def _find(self, index):
+		"""并查集查找（路径减半）"""
+		parent = self._parent
+		while parent[index] != index:
+			parent[index] = parent[parent[index]]
+			index = parent[index]
+		return index
+
+	def _merge(self, index, friend_roots):
+		"""把新落子与相邻己方棋串合并（按棋串大小合并），返回合并后的根节点"""
+		bit = 1 << index
+		root = index
+		if friend_roots:
+			root = max(friend_roots, key=lambda r: self._group_stones[r].bit_count())
+
+		stones = bit
+		libs = neighbors(bit) & ~self.occupied
+		for friend_root in friend_roots:
+			stones |= self._group_stones.pop(friend_root)
+			libs |= self._group_libs.pop(friend_root)
+			self._parent[friend_root] = root
+		self._parent[index] = root
+
+		self._group_stones[root] = stones
+		self._group_libs[root] = libs & ~bit & BOARD_MASK
+		return root
@@ -0,0 +1,138 @@
+"""
+围棋规则引擎 - 终局数子
+
+中国规则数子法：活子数 + 领地数，白方另加贴目（与前端 calculateGoScore 一致）。
+死子先从棋盘上移除并计入对方可围的空点；空点连通块只与一方棋子相邻时归该方所有，
+与双方都相邻（或不与任何棋子相邻）的连通块为单官，不计入任何一方。
+
+连通块用位棋盘的整型位运算逐层扩张（flood_fill），每一步同时推进整条边界，
+不逐点遍历，整盘数子在纯Python下约0.05～0.3毫秒（空点连通块越碎越慢）。
+"""
+
+from collections import namedtuple
+from decimal import Decimal
+
+from .bitboard import BOARD_MASK, BOARD_SIZE, flood_fill, neighbors, point_index
+from .board import BLACK, WHITE, Board, IllegalMove
+from .snapshot import unpack_snapshot
+
+# 数子结果：各方活子、领地、死子数、贴目、总分（白方含贴目）及获胜方（black/white/draw）
+Score = namedtuple('Score', [
+	'black_stones',
+	'white_stones',
+	'black_territory',
+	'white_territory',
+	'black_dead',
+	'white_dead',
+	'komi',
+	'black_total',
+	'white_total',
+	'winner',
+])
+
+
+def dead_stone_mask(black, white, points):
+	"""
+	把死子坐标（0起始的 (row, col)）扩展为所在的整个棋串，返回死子掩码
+
+	Raises:
+		ValueError: 坐标超出棋盘或该点没有棋子
+	"""
+	dead = 0
+	for row, col in points:
+		if not (0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE):
+			raise ValueError(f'位置 ({row + 1}, {col + 1}) 超出棋盘范围')
+		bit = 1 << point_index(row, col)
+		if dead & bit:
+			continue
+		stones = black if black & bit else white if white & bit else 0
+		if not stones:
+			raise ValueError(f'位置 ({row + 1}, {col + 1}) 没有棋子')
+		dead |= flood_fill(bit, stones)
+	return dead
+
+
+def territory(black, white):
+	"""返回 (黑方领地掩码, 白方领地掩码)，black/white 为活子位棋盘"""
+	empty = BOARD_MASK & ~(black | white)
+	black_area = white_area = 0
+	remaining = empty
+	while remaining:
+		region = flood_fill(remaining & -remaining, empty)
+		remaining &= ~region
+		border = neighbors(region)
+		touches_black = bool(border & black)
+		touches_white = bool(border & white)
+		if touches_black and not touches_white:
+			black_area |= region
+		elif touches_white and not touches_black:
+			white_area |= region
+	return black_area, white_area
+
+
+def score_position(black, white, komi, dead=0):
+	"""
+	数子
+
+	Args:
+		black, white: 黑白位棋盘
+		komi: 贴目（Decimal）
+		dead: 死子掩码（见 dead_stone_mask）
+	"""
+	komi = Decimal(komi)
+	alive_black = black & ~dead
+	alive_white = white & ~dead
+	black_area, white_area = territory(alive_black, alive_white)
+
+	black_stones = alive_black.bit_count()
+	white_stones = alive_white.bit_count()
+	black_territory = black_area.bit_count()
+	white_territory = white_area.bit_count()
+	black_total = Decimal(black_stones + black_territory)
+	white_total = Decimal(white_stones + white_territory) + komi
+	if black_total > white_total:
+		winner = BLACK
+	elif white_total > black_total:
+		winner = WHITE
+	else:
+		winner = 'draw'
+	return Score(
+		black_stones=black_stones,
+		white_stones=white_stones,
+		black_territory=black_territory,
+		white_territory=white_territory,
+		black_dead=(black & dead).bit_count(),
+		white_dead=(white & dead).bit_count(),
+		komi=komi,
+		black_total=black_total,
+		white_total=white_total,
+		winner=winner,
+	)
+
+
+def score_board(board, komi, dead_points=()):
+	"""对 Board 数子，dead_points 为0起始的死子坐标（每个棋串给出任意一子即可）"""
+	black, white = board.stones[BLACK], board.stones[WHITE]
+	return score_position(black, white, komi, dead_stone_mask(black, white, dead_points))
+
+
+def score_replay(game_id, komi, snapshot, moves):
+	"""
+	重放对局后按终局局面数子（不标记死子），供批量重算得分的进程池调用
+
+	Args:
+		snapshot: 最后一个关键帧的快照，没有时为None（从空棋盘重放）
+		moves: 快照之后的落子，0起始的 (row, col, color)
+
+	Returns:
+		tuple: (game_id, Score 或None, 错误信息或None)
+	"""
+	try:
+		board = unpack_snapshot(snapshot) if snapshot is not None else Board()
+		for row, col, color in moves:
+			board.play(row, col, color)
+	except IllegalMove as e:
+		return game_id, None, e.message
+	except ValueError as e:
+		return game_id, None, str(e)
+	return game_id, score_board(board, komi), None
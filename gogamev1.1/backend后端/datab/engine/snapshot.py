@@ -0,0 +1,73 @@
+"""
+围棋规则引擎 - 局面快照
+
+局面（黑白位棋盘、手数、行棋方、提子数、劫点）的紧凑二进制表示，
+用于复盘关键帧：每 KEYFRAME_INTERVAL 手保存一次快照，重放任意一手时
+从最近的快照开始最多再下 KEYFRAME_INTERVAL-1 手。快照不含历史局面哈希，
+还原出的棋盘不做超级劫检查（复盘只重放已校验过的棋谱）。
+"""
+
+import struct
+
+from .bitboard import NUM_POINTS
+from .board import BLACK, WHITE, Board
+
+KEYFRAME_INTERVAL = 16  # 关键帧间隔（手数）
+
+SNAPSHOT_VERSION = 1
+_BITBOARD_BYTES = (NUM_POINTS + 7) // 8  # 361位 -> 46字节
+# 头部：版本、手数、黑提子、白提子、劫点、行棋方
+_HEADER = struct.Struct('<BHHHHB')
+_NO_KO = 0xFFFF
+
+
+def pack_snapshot(board):
+	"""把棋盘局面打包为快照（头部 + 黑白位棋盘，共100字节）"""
+	header = _HEADER.pack(
+		SNAPSHOT_VERSION,
+		board.move_number,
+		board.captures[BLACK],
+		board.captures[WHITE],
+		_NO_KO if board.ko_point is None else board.ko_point,
+		0 if board.to_move == BLACK else 1,
+	)
+	return b''.join([
+		header,
+		board.stones[BLACK].to_bytes(_BITBOARD_BYTES, 'little'),
+		board.stones[WHITE].to_bytes(_BITBOARD_BYTES, 'little'),
+	])
+
+
+def unpack_snapshot(data):
+	"""由快照还原棋盘，格式不正确时抛出ValueError"""
+	data = bytes(data)
+	if len(data) != _HEADER.size + 2 * _BITBOARD_BYTES or data[0] != SNAPSHOT_VERSION:
+		raise ValueError('Unsupported board snapshot')
+	_, move_number, captures_black, captures_white, ko_point, to_move = _HEADER.unpack_from(data)
+	offset = _HEADER.size
+	black = int.from_bytes(data[offset:offset + _BITBOARD_BYTES], 'little')
+	white = int.from_bytes(data[offset + _BITBOARD_BYTES:], 'little')
+	return Board.from_position(
+		black,
+		white,
+		to_move=BLACK if to_move == 0 else WHITE,
+		move_number=move_number,
+		captures={BLACK: captures_black, WHITE: captures_white},
+		ko_point=None if ko_point == _NO_KO else ko_point,
+	)
+
+
+def is_keyframe(move_number, interval=KEYFRAME_INTERVAL):
+	"""该手之后是否应保存关键帧"""
+	return move_number > 0 and move_number % interval == 0
+
+
+def keyframe_snapshots(moves, interval=KEYFRAME_INTERVAL):
+	"""重放 (row, col, color) 序列（0起始坐标），返回 [(手数, 快照)]；遇到非法落子时抛出IllegalMove"""
+	board = Board()
+	snapshots = []
+	for row, col, color in moves:
+		board.play(row, col, color)
+		if is_keyframe(board.move_number, interval):
+			snapshots.append((board.move_number, pack_snapshot(board)))
+	return snapshots
@@ -0,0 +1,56 @@
+"""
+Zobrist哈希
+
+每个 (颜色, 交叉点) 对应一个固定的64位随机数，局面哈希为所有棋子对应随机数的异或。
+随机数由固定种子生成，因此不同进程、不同容器计算出的哈希完全一致，可以持久化保存。
+"""
+
+import random
+import struct
+
+from .bitboard import NUM_POINTS, iter_points
+
+_SEED = 0x60BAD5EED
+_HASH_STRUCT = struct.Struct('<Q')
+
+_rng = random.Random(_SEED)
+ZOBRIST_BLACK = tuple(_rng.getrandbits(64) for _ in range(NUM_POINTS))
+ZOBRIST_WHITE = tuple(_rng.getrandbits(64) for _ in range(NUM_POINTS))
+del _rng
+
+# 空棋盘的哈希
+EMPTY_HASH = 0
+
+
+def zobrist_table(color):
+	"""返回指定颜色的Zobrist随机数表"""
+	return ZOBRIST_BLACK if color == 'black' else ZOBRIST_WHITE
+
+
+def position_hash(black, white):
+	"""根据黑白位棋盘从头计算局面哈希"""
+	value = EMPTY_HASH
+	for point in iter_points(black):
+		value ^= ZOBRIST_BLACK[point]
+	for point in iter_points(white):
+		value ^= ZOBRIST_WHITE[point]
+	return value
+
+
+def pack_hashes(hashes):
+	"""把局面哈希序列打包为字节串（每个哈希8字节，小端）"""
+	return b''.join(_HASH_STRUCT.pack(h) for h in hashes)
+
+
+def unpack_hash_list(data):
+	"""把打包的字节串按原顺序还原为局面哈希列表"""
+	if not data:
+		return []
+	return [h for (h,) in _HASH_STRUCT.iter_unpack(bytes(data))]
+
+
+def unpack_hashes(data):
+	"""把打包的字节串还原为局面哈希集合"""
+	if not data:
+		return set()
+	return {h for (h,) in _HASH_STRUCT.iter_unpack(bytes(data))}
@@ -0,0 +1,127 @@
+"""
+玩家对局计数模块
+
+PlayerGameStats 为每个玩家保存对局总数和未终局对局数，创建对局时的数量限制
+只需按主键读取一行。计数由 Game 的 post_save/post_delete 信号维护，
+与对局的写入处于同一事务；若出现偏差，可用 reconcile_game_stats 命令按Game表重新统计。
+"""
+
+import logging
+
+from django.db import models, transaction
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Game, PlayerGameStats
+
+logger = logging.getLogger('datab')
+
+# 未终局：winner为null或空字符串
+ACTIVE_GAME_FILTER = models.Q(winner__isnull=True) | models.Q(winner='')
+
+
+def get_game_counts(user_id):
+	"""返回 (对局总数, 未终局对局数)，没有计数行时视为0"""
+	counts = PlayerGameStats.objects.filter(user_id=user_id).values_list('total_games', 'active_games').first()
+	return counts or (0, 0)
+
+
+def adjust_game_counts(user_ids, total=0, active=0, create_missing=True):
+	"""原子地增减玩家的对局计数（F表达式，不会低于0），create_missing时先补建缺少的计数行"""
+	user_ids = set(user_ids)
+	if not user_ids or not (total or active):
+		return
+	if create_missing:
+		PlayerGameStats.objects.bulk_create(
+			[PlayerGameStats(user_id=user_id) for user_id in user_ids],
+			ignore_conflicts=True
+		)
+	updates = {}
+	if total:
+		updates['total_games'] = Greatest(models.F('total_games') + total, 0)
+	if active:
+		updates['active_games'] = Greatest(models.F('active_games') + active, 0)
+	PlayerGameStats.objects.filter(user_id__in=user_ids).update(**updates)
+
+
+def count_games_by_player(user_ids=None):
+	"""按Game表统计每个玩家的 (对局总数, 未终局对局数)，user_ids为空时统计所有玩家"""
+	counts = {}
+	for field in ('player1', 'player2'):
+		games = Game.objects.all()
+		if user_ids is not None:
+			games = games.filter(**{f'{field}__in': user_ids})
+		rows = games.values(field).annotate(
+			total=models.Count('id'),
+			active=models.Count('id', filter=ACTIVE_GAME_FILTER)
+		).values_list(field, 'total', 'active').order_by()
+		for user_id, total, active in rows:
+			previous_total, previous_active = counts.get(user_id, (0, 0))
+			counts[user_id] = (previous_total + total, previous_active + active)
+	return counts
+
+
+def reconcile_game_counts(user_ids=None, dry_run=False):
+	"""
+	按Game表重新统计并修正计数
+
+	Returns:
+		list: 存在偏差的 (user_id, 原计数, 实际计数)
+	"""
+	actual = count_games_by_player(user_ids)
+	stored = PlayerGameStats.objects.all()
+	if user_ids is not None:
+		stored = stored.filter(user_id__in=user_ids)
+	stored = {row.user_id: row for row in stored}
+
+	drift = []
+	to_update = []
+	to_create = []
+	for user_id in set(actual) | set(stored):
+		counts = actual.get(user_id, (0, 0))
+		row = stored.get(user_id)
+		current = (row.total_games, row.active_games) if row else (0, 0)
+		if current == counts:
+			continue
+		drift.append((user_id, current, counts))
+		if row is None:
+			to_create.append(PlayerGameStats(user_id=user_id, total_games=counts[0], active_games=counts[1]))
+		else:
+			row.total_games, row.active_games = counts
+			to_update.append(row)
+
+	if not dry_run and drift:
+		with transaction.atomic():
+			PlayerGameStats.objects.bulk_create(to_create, ignore_conflicts=True)
+			PlayerGameStats.objects.bulk_update(to_update, ['total_games', 'active_games'], batch_size=500)
+	return drift
+
+
+@receiver(post_save, sender=Game)
+def game_stats_post_save(sender, instance, created, update_fields=None, **kwargs):
+	"""对局创建时双方计数+1，终局状态变化时调整未终局计数"""
+	players = (instance.player1_id, instance.player2_id)
+	if created:
+		adjust_game_counts(players, total=1, active=0 if instance.is_finished else 1)
+	elif update_fields is None or 'winner' in update_fields:
+		loaded_winner = getattr(instance, '_loaded_winner', models.DEFERRED)
+		if loaded_winner is models.DEFERRED:
+			# 加载时未读取winner，无法判断状态变化，由对账命令修正
+			logger.warning(f"Game {instance.id} saved without a loaded winner; game stats may drift")
+		else:
+			was_finished = loaded_winner not in (None, '')
+			if was_finished != instance.is_finished:
+				adjust_game_counts(players, active=1 if was_finished else -1)
+	instance._loaded_winner = instance.__dict__.get('winner', models.DEFERRED)
+
+
+@receiver(post_delete, sender=Game)
+def game_stats_post_delete(sender, instance, **kwargs):
+	"""对局删除时双方计数-1（删除用户级联删除对局时，该用户的计数行可能已被删除，不再补建）"""
+	adjust_game_counts(
+		(instance.player1_id, instance.player2_id),
+		total=-1,
+		active=0 if instance.is_finished else -1,
+		create_missing=False
+	)
@@ -0,0 +1,109 @@
+"""
+复盘关键帧
+
+每 KEYFRAME_INTERVAL 手保存一次局面快照（BoardKeyframe），按手数读取局面时
+先按 (game, move_number) 唯一索引取出最近的关键帧，再用规则引擎最多重放
+KEYFRAME_INTERVAL-1 手，拖动复盘进度时每一步的开销与对局长度无关。
+
+实时对局在落子事务中写入关键帧；导入的对局随对局一起写入；
+更早的对局在第一次按手数读取时重放一次整局补建。
+"""
+
+import logging
+
+from .engine import (
+	KEYFRAME_INTERVAL,
+	Board,
+	is_keyframe,
+	keyframe_snapshots,
+	pack_snapshot,
+	unpack_snapshot,
+)
+from .models import BoardKeyframe
+from .packed_moves import load_moves_after
+
+logger = logging.getLogger('datab')
+
+
+def save_keyframe(game_id, board):
+	"""落子后若到达关键帧手数则保存快照（应在写入落子的事务中调用）"""
+	if is_keyframe(board.move_number):
+		BoardKeyframe.objects.create(game_id=game_id, move_number=board.move_number, snapshot=pack_snapshot(board))
+
+
+def drop_keyframes(game_id, from_move=1):
+	"""删除第 from_move 手及之后的关键帧（这些手被删除或修改后快照不再对应棋谱）"""
+	BoardKeyframe.objects.filter(game_id=game_id, move_number__gte=from_move).delete()
+
+
+def build_keyframes(game_id):
+	"""重放整局补建缺少的关键帧，返回补建后的关键帧数"""
+	moves = load_moves_after(game_id)
+	snapshots = keyframe_snapshots(
+		(move.row - 1, move.col - 1, move.color) for move in moves if move.color != 'empty'
+	)
+	BoardKeyframe.objects.bulk_create(
+		[BoardKeyframe(game_id=game_id, move_number=number, snapshot=snapshot) for number, snapshot in snapshots],
+		ignore_conflicts=True
+	)
+	logger.debug(f"Built {len(snapshots)} keyframes for game {game_id}")
+	return len(snapshots)
+
+
+def _earlier_keyframe(game_id, move_number):
+	"""
+	第 move_number 手的关键帧无法解码（损坏或旧格式）：删除它并改用更早的可用关键帧
+
+	Returns:
+		tuple: (Board, 关键帧手数)，没有可用的关键帧时为 (空棋盘, 0)
+	"""
+	logger.warning(f"Dropping undecodable keyframe {move_number} of game {game_id}")
+	BoardKeyframe.objects.filter(game_id=game_id, move_number=move_number).delete()
+	rows = BoardKeyframe.objects.filter(game_id=game_id, move_number__lt=move_number).order_by(
+		'-move_number'
+	).values_list('move_number', 'snapshot')
+	for number, snapshot in rows:
+		try:
+			return unpack_snapshot(snapshot), number
+		except ValueError:
+			logger.warning(f"Dropping undecodable keyframe {number} of game {game_id}")
+			BoardKeyframe.objects.filter(game_id=game_id, move_number=number).delete()
+	return Board(), 0
+
+
+def position_at(game_id, move_number):
+	"""
+	第 move_number 手之后的局面
+
+	Returns:
+		tuple: (Board, 第 move_number 手的落子 Intersection 或None)
+
+	Raises:
+		IllegalMove: 棋谱无法通过规则校验
+	"""
+	base = move_number - move_number % KEYFRAME_INTERVAL
+	board = Board()
+	if base:
+		snapshot = BoardKeyframe.objects.filter(game_id=game_id, move_number=base).values_list(
+			'snapshot', flat=True
+		).first()
+		if snapshot is None and build_keyframes(game_id) * KEYFRAME_INTERVAL >= base:
+			snapshot = BoardKeyframe.objects.filter(game_id=game_id, move_number=base).values_list(
+				'snapshot', flat=True
+			).first()
+		if snapshot is not None:
+			try:
+				board = unpack_snapshot(snapshot)
+			except ValueError:
+				board, base = _earlier_keyframe(game_id, base)
+		else:
+			base = 0
+
+	# 从关键帧之后重放；正好落在关键帧上时仍读取该手，用于返回最后一手的位置
+	moves = load_moves_after(game_id, after=min(base, move_number - 1) if move_number else 0, until=move_number)
+	last_move = None
+	for move in moves:
+		last_move = move
+		if move.move_number > base and move.color != 'empty':
+			board.play(move.row - 1, move.col - 1, move.color)
+	return board, last_move
@@ -0,0 +1,233 @@
+"""
+对局实时状态缓存模块
+
+每个对局的实时状态（位棋盘、行棋方、手数、提子数、劫点、参与者及历史局面哈希）
+以紧凑二进制形式保存在一个缓存键中。落子校验和棋盘读取只访问该缓存键，
+缓存未命中时才从数据库重放棋谱重建。
+"""
+
+import logging
+import struct
+
+from django.core.cache import cache
+
+from core.cache_manager import CacheKeyManager, CacheTimeouts
+from .engine import BLACK, WHITE, Board, IllegalMove, pack_hashes, unpack_hash_list
+from .engine.bitboard import BOARD_SIZE, NUM_POINTS
+
+logger = logging.getLogger('datab')
+
+# 位棋盘序列化长度（361位 -> 46字节）
+_BITBOARD_BYTES = (NUM_POINTS + 7) // 8
+# 头部：版本、黑方ID、白方ID、手数、黑提子、白提子、劫点、行棋方、是否结束
+_HEADER = struct.Struct('<BQQHHHHBB')
+_NO_KO = 0xFFFF
+
+
+class LiveGameState:
+	"""单个对局的实时状态"""
+
+	VERSION = 1
+
+	def __init__(self, game_id, player1_id, player2_id, board, hashes, finished=False):
+		self.game_id = game_id
+		self.player1_id = player1_id  # 黑棋玩家
+		self.player2_id = player2_id  # 白棋玩家
+		self.board = board
+		self.hashes = hashes  # 按手数顺序的历史局面哈希
+		self.finished = finished
+		self.board.history = set(hashes)
+
+	@classmethod
+	def build(cls, game):
+		"""从数据库重放棋谱构建实时状态"""
+		from .models import Intersection
+
+		if game.packed_moves:
+			# 已压缩的对局（见 packed_moves）
+			moves = [(move.row, move.col, move.color) for move in game.get_moves() if move.color != 'empty']
+		else:
+			moves = list(Intersection.objects.filter(game_id=game.id).exclude(color='empty').order_by(
+				'move_number', 'placed_at'
+			).values_list('row', 'col', 'color'))
+		board = Board.replay((row - 1, col - 1, color) for row, col, color in moves)
+
+		# 优先使用持久化的局面哈希；与手数不一致时（历史数据）按重放结果重算
+		hashes = unpack_hash_list(game.position_hashes)
+		if len(hashes) != board.move_number:
+			hashes = cls._replay_hashes(moves)
+
+		return cls(game.id, game.player1_id, game.player2_id, board, hashes, finished=bool(game.winner))
+
+	@staticmethod
+	def _replay_hashes(moves):
+		"""重放棋谱，返回每一手之后的局面哈希"""
+		board = Board()
+		hashes = []
+		for row, col, color in moves:
+			board.play(row - 1, col - 1, color)
+			hashes.append(board.hash)
+		return hashes
+
+	# 查询
+
+	def color_of(self, user_id):
+		"""返回用户在对局中的颜色，非参与者返回None"""
+		if user_id == self.player1_id:
+			return BLACK
+		if user_id == self.player2_id:
+			return WHITE
+		return None
+
+	@property
+	def latest_color(self):
+		"""最新落子的颜色，没有落子时为None"""
+		if self.board.move_number == 0:
+			return None
+		return WHITE if self.board.to_move == BLACK else BLACK
+
+	def apply(self, row, col, color):
+		"""落子（0起始坐标）并记录局面哈希，非法时抛出IllegalMove"""
+		result = self.board.play(row, col, color)
+		self.hashes.append(self.board.hash)
+		return result
+
+	def packed_hashes(self):
+		"""打包后的历史局面哈希，用于写回 Game.position_hashes"""
+		return pack_hashes(self.hashes)
+
+	def to_dict(self):
+		"""棋盘读取接口的JSON表示（坐标为1起始）"""
+		return board_to_dict(self.board, self.game_id, finished=self.finished)
+
+	# 序列化
+
+	def to_bytes(self):
+		"""序列化为紧凑二进制：头部 + 黑白位棋盘 + 历史局面哈希"""
+		board = self.board
+		header = _HEADER.pack(
+			self.VERSION,
+			self.player1_id,
+			self.player2_id,
+			board.move_number,
+			board.captures[BLACK],
+			board.captures[WHITE],
+			_NO_KO if board.ko_point is None else board.ko_point,
+			0 if board.to_move == BLACK else 1,
+			1 if self.finished else 0,
+		)
+		return b''.join([
+			header,
+			board.stones[BLACK].to_bytes(_BITBOARD_BYTES, 'little'),
+			board.stones[WHITE].to_bytes(_BITBOARD_BYTES, 'little'),
+			self.packed_hashes(),
+		])
+
+	@classmethod
+	def from_bytes(cls, game_id, data):
+		"""从二进制还原实时状态，版本不匹配时返回None"""
+		if not data or data[0] != cls.VERSION:
+			return None
+		(_, player1_id, player2_id, move_number, captures_black, captures_white,
+			ko_point, to_move, finished) = _HEADER.unpack_from(data)
+		offset = _HEADER.size
+		black = int.from_bytes(data[offset:offset + _BITBOARD_BYTES], 'little')
+		offset += _BITBOARD_BYTES
+		white = int.from_bytes(data[offset:offset + _BITBOARD_BYTES], 'little')
+		offset += _BITBOARD_BYTES
+
+		board = Board.from_position(
+			black,
+			white,
+			to_move=BLACK if to_move == 0 else WHITE,
+			move_number=move_number,
+			captures={BLACK: captures_black, WHITE: captures_white},
+			ko_point=None if ko_point == _NO_KO else ko_point,
+		)
+		hashes = unpack_hash_list(data[offset:])
+		return cls(game_id, player1_id, player2_id, board, hashes, finished=bool(finished))
+
+
+def board_to_dict(board, game_id, **extra):
+	"""棋盘的JSON表示（坐标为1起始，每行一个字符串：b黑 w白 .空），extra 放在 board 之前"""
+	rows = []
+	for row in range(BOARD_SIZE):
+		cells = []
+		for col in range(BOARD_SIZE):
+			color = board.color_at(row, col)
+			cells.append('b' if color == BLACK else 'w' if color == WHITE else '.')
+		rows.append(''.join(cells))
+	ko = None
+	if board.ko_point is not None:
+		ko_row, ko_col = divmod(board.ko_point, BOARD_SIZE)
+		ko = [ko_row + 1, ko_col + 1]
+	return {
+		'game': game_id,
+		'move_number': board.move_number,
+		'to_move': board.to_move,
+		'captures': dict(board.captures),
+		'ko_point': ko,
+		**extra,
+		'board': rows,
+	}
+
+
+def get_live_state(game_id):
+	"""获取对局实时状态：优先读取缓存，未命中时从数据库重建并回填，对局不存在时返回None"""
+	from .models import Game
+
+	cache_key = CacheKeyManager.game_state(game_id)
+	state = LiveGameState.from_bytes(game_id, cache.get(cache_key))
+	if state is not None:
+		return state
+
+	try:
+		game = Game.objects.get(id=game_id)
+	except (Game.DoesNotExist, ValueError):
+		return None
+
+	state = LiveGameState.build(game)
+	save_live_state(state)
+	logger.debug(f"Rebuilt live state for game {game_id} at move {state.board.move_number}")
+	return state
+
+
+def save_live_state(state):
+	"""写入对局实时状态缓存"""
+	cache.set(CacheKeyManager.game_state(state.game_id), state.to_bytes(), CacheTimeouts.GAME_STATE)
+
+
+def drop_live_state(game_id):
+	"""删除对局实时状态缓存，下次读取时从数据库重建"""
+	cache.delete(CacheKeyManager.game_state(game_id))
+
+
+def rebuild_game_summary(game_id):
+	"""
+	按现存落子重算对局摘要（手数、行棋方、最新落子）和历史局面哈希
+
+	落子只经规则引擎追加；落子行在其他途径（shell、数据修复脚本）被删除或修改后
+	调用本函数，否则摘要与落子不一致，之后每一手都会因实时状态过期被拒绝。
+	对局已删除时什么也不做。
+	"""
+	from .models import Game
+
+	game = Game.objects.filter(pk=game_id).only('id', 'created_at', 'packed_moves').first()
+	if game is None:
+		return
+	moves = [move for move in sorted(game.get_moves(), key=lambda m: m.move_number) if move.color != 'empty']
+	try:
+		hashes = pack_hashes(LiveGameState._replay_hashes([(move.row, move.col, move.color) for move in moves]))
+	except IllegalMove:
+		# 剩余棋谱不合法：不保存局面哈希，构建实时状态时重放报错
+		hashes = b''
+	last = moves[-1] if moves else None
+	Game.objects.filter(pk=game_id).update(
+		move_count=len(moves),
+		last_move_color=last.color if last else None,
+		last_move_at=last.placed_at if last else None,
+		to_move=WHITE if last and last.color == BLACK else BLACK,
+		position_hashes=hashes,
+	)
+	drop_live_state(game_id)
+	logger.info(f"Rebuilt summary for game {game_id} at move {len(moves)}")
@@ -0,0 +1,112 @@
+import json
+import pickle
+import time
+import zlib
+
+from django.core.management.base import BaseCommand
+
+from core.cache_manager import CacheCodec
+from datab.models import Game
+from datab.serializers import GameSerializer
+
+
+class Command(BaseCommand):
+    help = '对比缓存值编解码方式（json/orjson/msgpack、是否压缩）在真实GameSerializer数据上的耗时和体积'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--games',
+            type=int,
+            default=20,
+            help='参与测试的对局数量（默认20，按落子数从多到少选取）'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help='每个负载编解码的重复次数（默认200）'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=int,
+            default=1024,
+            help='压缩阈值（字节，默认1024）'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        payloads = self._load_payloads(options['games'])
+        if not payloads:
+            self.stdout.write(self.style.WARNING('数据库中没有对局，无法生成测试负载'))
+            return
+
+        sizes = [len(json.dumps(p)) for p in payloads]
+        self.stdout.write(
+            f'负载：{len(payloads)} 个对局详情 + 1 个小负载，'
+            f'JSON大小 {min(sizes)}~{max(sizes)} 字节，每个负载重复 {iterations} 次'
+        )
+        payloads.append({'color': 'white'})  # 典型的小缓存值（玩家角色/最新落子）
+
+        candidates = [('pickle+zlib（原django_redis方式）', _PickleZlib())]
+        for format_name in CacheCodec.available_formats():
+            candidates.append((f'{format_name}', CacheCodec(format_name, compress_min_bytes=1 << 30)))
+            candidates.append((
+                f'{format_name}+zlib(>={options["threshold"]}B)',
+                CacheCodec(format_name, compress_min_bytes=options['threshold'])
+            ))
+
+        self.stdout.write(f'{"编码方式":<36}{"编码 µs":>10}{"解码 µs":>10}{"平均字节":>10}{"小值字节":>10}')
+        for name, codec in candidates:
+            encode_time, decode_time, total_size, small_size = self._measure(codec, payloads, iterations)
+            self.stdout.write(
+                f'{name:<36}{encode_time:>10.1f}{decode_time:>10.1f}'
+                f'{total_size / len(payloads):>10.0f}{small_size:>10}'
+            )
+
+    def _load_payloads(self, count):
+        """按落子数从多到少取对局，生成与详情接口一致的序列化结果"""
+        from django.db.models import Count
+
+        games = (
+            Game.objects.annotate(move_count=Count('intersections'))
+            .order_by('-move_count')
+            .select_related('player1', 'player2')
+            .prefetch_related('intersections')[:count]
+        )
+        # 经过一次JSON往返，得到与缓存时一致的纯字典/列表结构
+        return [json.loads(json.dumps(GameSerializer(game).data)) for game in games]
+
+    def _measure(self, codec, payloads, iterations):
+        """返回平均编码耗时、平均解码耗时（微秒）、总字节数和小值字节数"""
+        encode_total = decode_total = 0.0
+        total_size = 0
+        for payload in payloads:
+            start = time.perf_counter()
+            for _ in range(iterations):
+                frame = codec.encode(payload)
+            encode_total += time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                codec.decode(frame)
+            decode_total += time.perf_counter() - start
+            total_size += len(frame)
+
+        runs = len(payloads) * iterations
+        small_size = len(codec.encode(payloads[-1]))
+        return encode_total / runs * 1e6, decode_total / runs * 1e6, total_size, small_size
+
+
+class _PickleZlib:
+    """对照组：django_redis默认pickle序列化 + ZlibCompressor（超过15字节即压缩）"""
+
+    def encode(self, obj):
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        return zlib.compress(data) if len(data) > 15 else data
+
+    def decode(self, data):
+        try:
+            data = zlib.decompress(data)
+        except zlib.error:
+            pass
+        return pickle.loads(data)
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from datab.models import Game, Intersection
+from datab.packed_moves import compact_game
+
+
+class Command(BaseCommand):
+    help = '把已终局对局的落子记录压缩为 Game.packed_moves 二进制列，并删除对应的落子行'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='每批处理的对局数量（默认200）'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='最多处理的对局数量，默认处理全部'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只统计待压缩的对局和落子数，不实际修改'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        limit = options['limit']
+
+        # 已终局、尚未压缩且有落子的对局
+        candidates = Game.objects.filter(
+            ~models.Q(winner__isnull=True) & ~models.Q(winner=''),
+            packed_moves=b'',
+            move_count__gt=0,
+        )
+
+        if options['dry_run']:
+            game_count = candidates.count()
+            move_count = Intersection.objects.filter(game__in=candidates).count()
+            self.stdout.write(f'[DRY RUN] 将压缩 {game_count} 个已终局对局，共 {move_count} 条落子记录')
+            return
+
+        compacted = skipped = moves = 0
+        last_id = 0
+        started = time.monotonic()
+        while limit is None or compacted + skipped < limit:
+            size = batch_size if limit is None else min(batch_size, limit - compacted - skipped)
+            # 按主键分批推进，每个对局在独立事务中压缩，不会长时间持有锁
+            ids = list(candidates.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:size])
+            if not ids:
+                break
+            for game_id in ids:
+                count = compact_game(game_id)
+                if count is None:
+                    skipped += 1
+                else:
+                    compacted += 1
+                    moves += count
+            last_id = ids[-1]
+            self.stdout.write(f'  已处理至对局 {last_id}：压缩 {compacted} 个，跳过 {skipped} 个')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'压缩完成：{compacted} 个对局，{moves} 条落子记录，跳过 {skipped} 个（手数不连续或数据异常），'
+            f'耗时 {elapsed:.1f} 秒'
+        ))
+        if skipped:
+            self.stdout.write(self.style.WARNING('跳过的对局保留原有落子记录，不影响读取'))
@@ -0,0 +1,161 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from datab.engine import BLACK, WHITE
+from datab.models import BoardKeyframe, Game, Intersection
+from datab.sgf import load_sgf_file
+
+
+class Command(BaseCommand):
+    help = '批量导入SGF棋谱：进程池并行解析并用规则引擎校验，按内容哈希跳过重复对局'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='+',
+            help='SGF文件或目录（目录下递归查找 *.sgf）'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='解析校验的进程数（默认为CPU核数）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='bulk_create 每批写入的落子行数（默认1000）'
+        )
+        parser.add_argument(
+            '--create-players',
+            action='store_true',
+            help='PB/PW 对应的用户不存在时创建（不可登录的账号），默认跳过该对局'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只解析和校验，不写入数据库'
+        )
+
+    def handle(self, *args, **options):
+        files = self._collect_files(options['paths'])
+        if not files:
+            raise CommandError('没有找到SGF文件')
+
+        self.batch_size = options['batch_size']
+        self.create_players = options['create_players']
+        self.players = {}
+        self.seen_hashes = set()
+        stats = {'imported': 0, 'moves': 0, 'duplicate': 0, 'invalid': 0, 'missing_player': 0}
+
+        self.stdout.write(f'共 {len(files)} 个SGF文件，使用 {options["workers"]} 个进程解析')
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            # 解析和规则校验在子进程中进行，主进程只负责写库
+            for processed, record in enumerate(executor.map(load_sgf_file, files, chunksize=16), start=1):
+                if 'error' in record:
+                    outcome = 'invalid'
+                    self.stdout.write(self.style.WARNING(f'  跳过 {record["path"]}：{record["error"]}'))
+                elif options['dry_run']:
+                    outcome = 'imported'
+                else:
+                    outcome = self._import(record)
+                stats[outcome] += 1
+                if outcome == 'imported':
+                    stats['moves'] += len(record['moves'])
+
+                if processed % 500 == 0:
+                    self._report_progress(processed, len(files), stats, started)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        prefix = '[DRY RUN] 校验通过' if options['dry_run'] else '导入'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix} {stats["imported"]} 个对局、{stats["moves"]} 手，耗时 {elapsed:.1f} 秒 '
+            f'（{stats["imported"] / elapsed:.1f} 局/秒，{stats["moves"] / elapsed:.0f} 手/秒）'
+        ))
+        self.stdout.write(
+            f'  重复 {stats["duplicate"]} 个，无效 {stats["invalid"]} 个，缺少玩家 {stats["missing_player"]} 个'
+        )
+
+    def _collect_files(self, paths):
+        """展开目录，返回排序后的SGF文件列表"""
+        files = []
+        for path in map(Path, paths):
+            if path.is_dir():
+                files.extend(sorted(p for p in path.rglob('*') if p.suffix.lower() == '.sgf'))
+            elif path.is_file():
+                files.append(path)
+            else:
+                self.stdout.write(self.style.WARNING(f'  路径不存在：{path}'))
+        return files
+
+    def _report_progress(self, processed, total, stats, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'  已处理 {processed}/{total}：导入 {stats["imported"]} 局，'
+            f'{stats["imported"] / elapsed:.1f} 局/秒，{stats["moves"] / elapsed:.0f} 手/秒'
+        )
+
+    def _player(self, username):
+        """按用户名查找玩家（进程内缓存），允许时创建不可登录的账号"""
+        if username not in self.players:
+            user = User.objects.filter(username=username).first()
+            if user is None and self.create_players:
+                user = User.objects.create_user(username=username)
+            self.players[username] = user
+        return self.players[username]
+
+    def _import(self, record):
+        """在一个事务中写入对局及其全部落子和复盘关键帧，返回统计项名称"""
+        if record['hash'] in self.seen_hashes or Game.objects.filter(source_hash=record['hash']).exists():
+            return 'duplicate'
+        black, white = self._player(record['black']), self._player(record['white'])
+        if black is None or white is None:
+            return 'missing_player'
+
+        moves = record['moves']
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                game = Game.objects.create(
+                    player1=black,
+                    player2=white,
+                    winner=record['winner'],
+                    result=record['result'] if record['winner'] else '',
+                    score_black=0,
+                    score_white=0,
+                    komi=record['komi'],
+                    source_hash=record['hash'],
+                    position_hashes=record['position_hashes'],
+                    move_count=len(moves),
+                    last_move_color=moves[-1][2] if moves else None,
+                    last_move_at=now if moves else None,
+                    to_move=(WHITE if moves[-1][2] == BLACK else BLACK) if moves else BLACK,
+                )
+                Intersection.objects.bulk_create(
+                    [
+                        Intersection(game=game, row=row, col=col, color=color, move_number=number, placed_at=now)
+                        for number, (row, col, color) in enumerate(moves, start=1)
+                    ],
+                    batch_size=self.batch_size
+                )
+                BoardKeyframe.objects.bulk_create(
+                    [
+                        BoardKeyframe(game=game, move_number=number, snapshot=snapshot)
+                        for number, snapshot in record['keyframes']
+                    ],
+                    batch_size=self.batch_size
+                )
+        except IntegrityError:
+            # 并发导入同一对局时由 source_hash 唯一约束兜底
+            return 'duplicate'
+        self.seen_hashes.add(record['hash'])
+        return 'imported'
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from datab.game_stats import reconcile_game_counts
+from datab.participants import reconcile_participants
+
+
+class Command(BaseCommand):
+    help = '按对局表重新统计玩家对局计数（总数/未终局数）并核对对局参与者索引表，修正偏差'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='只核对指定用户ID（可重复指定），默认核对所有玩家'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只显示存在偏差的计数，不实际修正'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if not options['users']:
+            self._reconcile_participants(dry_run)
+        drift = reconcile_game_counts(user_ids=options['users'], dry_run=dry_run)
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('玩家对局计数与对局表一致'))
+            return
+
+        for user_id, (total, active), (actual_total, actual_active) in sorted(drift):
+            self.stdout.write(
+                f'  用户 {user_id}: 总数 {total} -> {actual_total}，未终局 {active} -> {actual_active}'
+            )
+
+        if dry_run:
+            self.stdout.write(f'[DRY RUN] {len(drift)} 个玩家的计数存在偏差')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'已修正 {len(drift)} 个玩家的计数'))
+
+    def _reconcile_participants(self, dry_run):
+        """核对参与者索引表（只在核对全部玩家时进行）"""
+        missing, stale = reconcile_participants(dry_run=dry_run)
+        if not (missing or stale):
+            self.stdout.write(self.style.SUCCESS('对局参与者索引与对局表一致'))
+        elif dry_run:
+            self.stdout.write(f'[DRY RUN] {missing} 个对局缺少参与者索引，{stale} 条索引的终局状态不一致')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'已补建 {missing} 个对局的参与者索引，修正 {stale} 条索引的终局状态'))
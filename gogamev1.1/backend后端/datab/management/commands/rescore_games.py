@@ -0,0 +1,181 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from core.cache_manager import invalidate_game_cache, invalidate_game_list_cache
+from datab.engine import KEYFRAME_INTERVAL, score_replay
+from datab.models import BoardKeyframe, Game, Intersection
+from datab.packed_moves import unpack_moves
+
+
+class Command(BaseCommand):
+    help = (
+        '按服务端规则引擎重算已终局对局的得分（终局局面数子，不标记死子），进程池并行数子并分批写回；'
+        '终局接口按死子数子写入的得分不会被覆盖'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='同时重算已有非零得分（客户端提交的历史得分）的对局，默认只处理双方得分都为0的对局'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='数子的进程数（默认为CPU核数）'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='每批读取、数子并 bulk_update 写回的对局数（默认500）'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='只数子并统计得分有变化的对局，不写入数据库'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        self.workers = options['workers']
+
+        # 终局接口的得分考虑了死子，终局局面直接数子会把死子算作活子，不能覆盖
+        games = Game.objects.filter(~models.Q(winner__isnull=True) & ~models.Q(winner=''), scored_by_server=False)
+        if not options['all']:
+            games = games.filter(score_black=0, score_white=0)
+        games = games.only(
+            'id', 'player1_id', 'player2_id', 'winner', 'komi', 'score_black', 'score_white',
+            'move_count', 'created_at', 'packed_moves'
+        ).order_by('id')
+
+        stats = {'processed': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0, 'winner_mismatch': 0}
+        self.stdout.write(f'使用 {self.workers} 个进程数子，每批 {batch_size} 局')
+        started = time.monotonic()
+        rows = games.iterator(chunk_size=batch_size)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while batch := list(islice(rows, batch_size)):
+                changed = self._rescore_batch(executor, batch, stats)
+                if changed and not dry_run:
+                    Game.objects.bulk_update(changed, ['score_black', 'score_white'], batch_size=batch_size)
+                    # bulk_update 不触发 post_save 信号，需手动失效对局缓存
+                    for game in changed:
+                        invalidate_game_cache(game.id, game.player1_id, game.player2_id)
+                self._report_progress(batch[-1].id, stats, started)
+
+        if stats['updated'] and not dry_run:
+            invalidate_game_list_cache()
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        prefix = '[DRY RUN] 得分有变化' if dry_run else '已更新'
+        self.stdout.write(self.style.SUCCESS(
+            f'处理 {stats["processed"]} 个对局，{prefix} {stats["updated"]} 个，未变化 {stats["unchanged"]} 个，'
+            f'耗时 {elapsed:.1f} 秒（{stats["processed"] / elapsed:.1f} 局/秒）'
+        ))
+        if stats['invalid']:
+            self.stdout.write(self.style.WARNING(f'  {stats["invalid"]} 个对局的棋谱无法通过规则校验，保留原得分'))
+        if stats['winner_mismatch']:
+            self.stdout.write(self.style.WARNING(
+                f'  {stats["winner_mismatch"]} 个对局的记录胜负与数子结果不一致（中盘认输或终局时标记了死子），胜负未修改'
+            ))
+
+    def _rescore_batch(self, executor, batch, stats):
+        """一批对局：读取最后关键帧及其后的落子，在进程池中重放并数子，返回得分有变化的对局"""
+        by_id = {game.id: game for game in batch}
+        snapshots = self._last_keyframes(batch)
+        moves = self._moves_after(batch, snapshots)
+
+        ids = []
+        for game_id in by_id:
+            if moves[game_id] is None:
+                stats['processed'] += 1
+                stats['invalid'] += 1
+                self.stdout.write(self.style.WARNING(f'  跳过对局 {game_id}：压缩棋谱无法解码'))
+            else:
+                ids.append(game_id)
+
+        # 数子在子进程中进行，主进程只负责读写数据库
+        results = executor.map(
+            score_replay,
+            ids,
+            [by_id[game_id].komi for game_id in ids],
+            [snapshots.get(game_id, (0, None))[1] for game_id in ids],
+            [moves[game_id] for game_id in ids],
+            chunksize=max(1, len(ids) // (self.workers * 4)),
+        )
+
+        changed = []
+        for game_id, score, error in results:
+            stats['processed'] += 1
+            game = by_id[game_id]
+            if score is None:
+                stats['invalid'] += 1
+                self.stdout.write(self.style.WARNING(f'  跳过对局 {game_id}：{error}'))
+                continue
+            if score.winner != game.winner:
+                stats['winner_mismatch'] += 1
+            if (score.black_total, score.white_total) == (game.score_black, game.score_white):
+                stats['unchanged'] += 1
+                continue
+            game.score_black = score.black_total
+            game.score_white = score.white_total
+            changed.append(game)
+            stats['updated'] += 1
+        return changed
+
+    @staticmethod
+    def _last_keyframes(batch):
+        """{game_id: (关键帧手数, 快照)}，只含存在最后一个关键帧的对局"""
+        wanted = {
+            game.id: game.move_count - game.move_count % KEYFRAME_INTERVAL
+            for game in batch if game.move_count >= KEYFRAME_INTERVAL
+        }
+        if not wanted:
+            return {}
+        rows = BoardKeyframe.objects.filter(
+            game_id__in=wanted, move_number__in=set(wanted.values())
+        ).values_list('game_id', 'move_number', 'snapshot')
+        return {
+            game_id: (move_number, bytes(snapshot))
+            for game_id, move_number, snapshot in rows if wanted[game_id] == move_number
+        }
+
+    @staticmethod
+    def _moves_after(batch, snapshots):
+        """{game_id: 关键帧之后的落子（0起始的 (row, col, color)），压缩棋谱无法解码时为None}"""
+        moves = {game.id: [] for game in batch}
+        bases = {}
+        for game in batch:
+            base = snapshots.get(game.id, (0, None))[0]
+            if game.packed_moves:
+                try:
+                    packed = unpack_moves(game.packed_moves, game.created_at)
+                except ValueError:
+                    moves[game.id] = None
+                    continue
+                moves[game.id] = [(row - 1, col - 1, color) for number, row, col, color, _ in packed if number > base]
+            else:
+                bases.setdefault(base, []).append(game.id)
+
+        # 关键帧手数相同的对局一起查询，走 (game, move_number) 索引
+        for base, game_ids in bases.items():
+            rows = Intersection.objects.filter(game_id__in=game_ids, move_number__gt=base).exclude(
+                color='empty'
+            ).order_by('game_id', 'move_number').values_list('game_id', 'row', 'col', 'color')
+            for game_id, row, col, color in rows:
+                moves[game_id].append((row - 1, col - 1, color))
+        return moves
+
+    def _report_progress(self, last_id, stats, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'  已处理至对局 {last_id}：{stats["processed"]} 局，更新 {stats["updated"]} 局，'
+            f'{stats["processed"] / elapsed:.1f} 局/秒'
+        )
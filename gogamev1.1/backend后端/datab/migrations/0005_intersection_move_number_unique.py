@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:11
+
+from django.db import migrations, models
+
+
+def backfill_move_numbers(apps, schema_editor):
+    """按落子时间为已有落子补齐手数（此前手数字段恒为默认值1）"""
+    Game = apps.get_model("datab", "Game")
+    Intersection = apps.get_model("datab", "Intersection")
+
+    for game_id in Game.objects.values_list("id", flat=True).iterator():
+        moves = list(
+            Intersection.objects.filter(game_id=game_id).order_by("placed_at", "id")
+        )
+        for number, move in enumerate(moves, start=1):
+            move.move_number = number
+        Intersection.objects.bulk_update(moves, ["move_number"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0004_alter_game_options_alter_intersection_options_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_move_numbers, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name="intersection",
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name="intersection",
+            constraint=models.UniqueConstraint(
+                fields=("game", "move_number"), name="unique_game_move_number"
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:12
+
+from django.db import migrations, models
+
+
+def backfill_position_hashes(apps, schema_editor):
+    """重放已有对局，记录每一手之后的局面哈希"""
+    from datab.engine import Board, IllegalMove, pack_hashes
+
+    Game = apps.get_model("datab", "Game")
+    Intersection = apps.get_model("datab", "Intersection")
+
+    for game_id in Game.objects.values_list("id", flat=True).iterator():
+        moves = (
+            Intersection.objects.filter(game_id=game_id)
+            .exclude(color="empty")
+            .order_by("move_number", "placed_at")
+            .values_list("row", "col", "color")
+        )
+        board = Board()
+        hashes = []
+        for row, col, color in moves:
+            try:
+                board.play(row - 1, col - 1, color)
+            except IllegalMove:
+                # 历史数据未经服务端校验，遇到非法落子时只保留此前的局面
+                break
+            hashes.append(board.hash)
+        Game.objects.filter(pk=game_id).update(position_hashes=pack_hashes(hashes))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0005_intersection_move_number_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="position_hashes",
+            field=models.BinaryField(default=b"", editable=False),
+        ),
+        migrations.RunPython(backfill_position_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_player_game_stats(apps, schema_editor):
+    """按已有对局统计每个玩家的对局总数和未终局对局数"""
+    Game = apps.get_model("datab", "Game")
+    PlayerGameStats = apps.get_model("datab", "PlayerGameStats")
+
+    active = models.Q(winner__isnull=True) | models.Q(winner="")
+    counts = {}
+    for field in ("player1", "player2"):
+        rows = (
+            Game.objects.values(field)
+            .annotate(total=models.Count("id"), active=models.Count("id", filter=active))
+            .values_list(field, "total", "active")
+            .order_by()
+        )
+        for user_id, total, active_count in rows:
+            previous_total, previous_active = counts.get(user_id, (0, 0))
+            counts[user_id] = (previous_total + total, previous_active + active_count)
+
+    PlayerGameStats.objects.bulk_create(
+        [
+            PlayerGameStats(user_id=user_id, total_games=total, active_games=active_count)
+            for user_id, (total, active_count) in counts.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("datab", "0006_game_position_hashes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayerGameStats",
+            fields=[
+                ("user", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="game_stats", serialize=False, to=settings.AUTH_USER_MODEL)),
+                ("total_games", models.PositiveIntegerField(default=0)),
+                ("active_games", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "玩家对局计数",
+                "verbose_name_plural": "玩家对局计数",
+                "db_table": "datab_player_game_stats",
+            },
+        ),
+        migrations.RunPython(backfill_player_game_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:39
+
+from django.db import migrations, models
+from django.db.models import Case, Count, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_game_summary(apps, schema_editor):
+    """按已有落子记录回填对局摘要"""
+    Game = apps.get_model("datab", "Game")
+    Intersection = apps.get_model("datab", "Intersection")
+
+    moves = Intersection.objects.filter(game=OuterRef("pk")).exclude(color="empty")
+    latest = moves.order_by("-move_number", "-placed_at")
+    move_count = moves.order_by().values("game").annotate(count=Count("id")).values("count")
+
+    Game.objects.update(
+        move_count=Coalesce(Subquery(move_count), 0),
+        last_move_color=Subquery(latest.values("color")[:1]),
+        last_move_at=Subquery(latest.values("placed_at")[:1]),
+    )
+    Game.objects.update(
+        to_move=Case(When(last_move_color="black", then=Value("white")), default=Value("black"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0007_player_game_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="last_move_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="last_move_color",
+            field=models.CharField(blank=True, choices=[("black", "Black"), ("white", "White")], editable=False, max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="move_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="game",
+            name="to_move",
+            field=models.CharField(choices=[("black", "Black"), ("white", "White")], default="black", editable=False, max_length=10),
+        ),
+        migrations.RunPython(backfill_game_summary, migrations.RunPython.noop),
+    ]
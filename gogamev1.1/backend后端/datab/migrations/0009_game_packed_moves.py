@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0008_game_summary_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="packed_moves",
+            field=models.BinaryField(default=b""),
+        ),
+    ]
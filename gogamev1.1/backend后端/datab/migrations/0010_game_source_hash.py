@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0009_game_packed_moves"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="source_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
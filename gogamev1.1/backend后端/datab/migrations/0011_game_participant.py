@@ -0,0 +1,56 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_game_participants(apps, schema_editor):
+    """为已有对局写入双方的参与者索引行"""
+    Game = apps.get_model("datab", "Game")
+    GameParticipant = apps.get_model("datab", "GameParticipant")
+
+    active = models.Q(winner__isnull=True) | models.Q(winner="")
+    games = (
+        Game.objects.annotate(finished=models.Case(models.When(active, then=False), default=True, output_field=models.BooleanField()))
+        .values_list("id", "player1_id", "player2_id", "created_at", "finished")
+        .order_by("id")
+    )
+    rows = []
+    for game_id, player1_id, player2_id, created_at, finished in games.iterator(chunk_size=2000):
+        rows.append(GameParticipant(user_id=player1_id, game_id=game_id, color="black", created_at=created_at, is_finished=finished))
+        rows.append(GameParticipant(user_id=player2_id, game_id=game_id, color="white", created_at=created_at, is_finished=finished))
+        if len(rows) >= 2000:
+            GameParticipant.objects.bulk_create(rows, batch_size=1000)
+            rows = []
+    GameParticipant.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0010_game_source_hash"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GameParticipant",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("color", models.CharField(choices=[("black", "Black"), ("white", "White")], max_length=10)),
+                ("created_at", models.DateTimeField()),
+                ("is_finished", models.BooleanField(default=False)),
+                ("game", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="participants", to="datab.game")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="game_participations", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "verbose_name": "对局参与者",
+                "verbose_name_plural": "对局参与者",
+                "db_table": "datab_game_participant",
+                "indexes": [models.Index(fields=["user", "created_at", "game"], name="participant_user_created"), models.Index(fields=["user", "is_finished", "created_at", "game"], name="participant_user_finished")],
+                "constraints": [models.UniqueConstraint(fields=("game", "user"), name="unique_game_participant")],
+            },
+        ),
+        migrations.RunPython(backfill_game_participants, migrations.RunPython.noop),
+    ]
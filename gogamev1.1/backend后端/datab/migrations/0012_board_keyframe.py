@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-17 07:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0011_game_participant"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BoardKeyframe",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("move_number", models.PositiveIntegerField()),
+                ("snapshot", models.BinaryField()),
+                ("game", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="keyframes", to="datab.game")),
+            ],
+            options={
+                "verbose_name": "复盘关键帧",
+                "verbose_name_plural": "复盘关键帧",
+                "db_table": "datab_board_keyframe",
+                "constraints": [models.UniqueConstraint(fields=("game", "move_number"), name="unique_game_keyframe")],
+            },
+        ),
+    ]
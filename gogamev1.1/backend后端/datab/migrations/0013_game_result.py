@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0012_board_keyframe"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="result",
+            field=models.CharField(blank=True, default="", editable=False, max_length=32),
+        ),
+    ]
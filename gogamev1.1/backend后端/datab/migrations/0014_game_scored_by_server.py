@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0013_game_result"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="scored_by_server",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
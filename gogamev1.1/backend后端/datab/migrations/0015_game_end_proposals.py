@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("datab", "0014_game_scored_by_server"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="end_proposals",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -17,6 +17,27 @@ class Game(models.Model):
 	# 添加游戏状态字段
 	is_completed = models.BooleanField(default=False, db_index=True)  # 游戏是否结束
 
+	# 历史局面的Zobrist哈希（每个8字节，按手数顺序拼接），用于超级劫判断
+	position_hashes = models.BinaryField(default=b'', editable=False)
+
+	# 导入对局的内容哈希（见 sgf.content_hash），重复导入时据此跳过
+	source_hash = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+	# 导入对局的原始结果（SGF RE属性，如 B+R），导出时原样写回
+	result = models.CharField(max_length=32, blank=True, default='', editable=False)
+	# 得分由终局接口按当时标记的死子数子得出（死子不保存），rescore_games 不覆盖
+	scored_by_server = models.BooleanField(default=False, editable=False)
+	# 终局死子提议 {颜色: {"move": 提议时的手数, "dead": 死子掩码（十进制字符串）}}，双方在同一手数提议一致时才数子
+	end_proposals = models.JSONField(default=dict, blank=True, editable=False)
+
+	# 终局后压缩的棋谱（见 packed_moves），压缩后落子行被删除
+	packed_moves = models.BinaryField(default=b'', editable=False)
+
+	# 对局摘要（反规范化），落子时在锁定对局行后用F()表达式更新，轮次、贴目锁定和最新落子只需读取本行
+	move_count = models.PositiveIntegerField(default=0, editable=False)  # 已落子数
+	last_move_color = models.CharField(max_length=10, choices=[('black', 'Black'), ('white', 'White')], null=True, blank=True, editable=False)  # 最新落子颜色
+	last_move_at = models.DateTimeField(null=True, blank=True, editable=False)  # 最新落子时间
+	to_move = models.CharField(max_length=10, choices=[('black', 'Black'), ('white', 'White')], default='black', editable=False)  # 下一手的行棋方
+
 	class Meta:
 		db_table = 'datab_game'  # 明确指定表名，避免与应用名冲突
 		indexes = [
@@ -48,6 +69,30 @@ class Game(models.Model):
 	def __str__(self):
 		return f'Game {self.id}: {self.player1.username} vs {self.player2.username}'
 
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		"""记录加载时的获胜方，保存时据此判断对局是否刚刚终局（见 game_stats）"""
+		instance = super().from_db(db, field_names, values)
+		instance._loaded_winner = instance.__dict__.get('winner', models.DEFERRED)
+		return instance
+
+	def get_moves(self):
+		"""全部落子：已压缩的对局从 packed_moves 解码为未保存的 Intersection 对象"""
+		if not self.packed_moves:
+			return self.intersections.all()
+		from .packed_moves import decode_intersections
+
+		moves = decode_intersections(self)
+		packed_numbers = {move.move_number for move in moves}
+		# 压缩后若对局被重新打开并继续落子，新落子仍保存为落子行
+		moves.extend(move for move in self.intersections.all() if move.move_number not in packed_numbers)
+		return sorted(moves, key=lambda move: move.move_number)
+
+	@property
+	def is_finished(self):
+		"""winner为null或空字符串表示未终局"""
+		return self.winner not in (None, '')
+
 
 class Intersection(models.Model):
 	"""棋盘交叉点模型，存储每一步棋的位置信息"""
@@ -63,7 +108,6 @@ class Intersection(models.Model):
 
 	class Meta:
 		db_table = 'datab_intersection'  # 明确指定表名
-		unique_together = ('game', 'row', 'col')  # 确保同一游戏中位置唯一
 		indexes = [
 			models.Index(fields=['game', 'row', 'col']),  # 游戏位置复合索引
 			models.Index(fields=['game', 'placed_at']),  # 游戏时间索引
@@ -71,6 +115,8 @@ class Intersection(models.Model):
 			models.Index(fields=['color', 'placed_at']),  # 按颜色查询
 		]
 		constraints = [
+			# 提子后同一位置可以再次落子，因此唯一性以手数为准
+			models.UniqueConstraint(fields=['game', 'move_number'], name='unique_game_move_number'),
 			# 暂时注释掉约束，避免迁移问题
 			# models.CheckConstraint(
 			# 	check=models.Q(row__gte=1) & models.Q(row__lte=19),
@@ -94,3 +140,67 @@ class Intersection(models.Model):
 
 	def __str__(self):
 		return f'Game {self.game.id} - {self.color} at ({self.row}, {self.col})'
+
+
+class BoardKeyframe(models.Model):
+	"""复盘关键帧：每隔固定手数保存一次局面快照（见 engine.snapshot），按手数随机访问局面时从最近的关键帧开始重放"""
+	game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='keyframes')  # 关联游戏
+	move_number = models.PositiveIntegerField()  # 快照对应的手数（该手之后的局面）
+	snapshot = models.BinaryField()  # 打包的位棋盘、行棋方、提子数和劫点
+
+	class Meta:
+		db_table = 'datab_board_keyframe'
+		constraints = [
+			models.UniqueConstraint(fields=['game', 'move_number'], name='unique_game_keyframe'),
+		]
+		verbose_name = '复盘关键帧'
+		verbose_name_plural = '复盘关键帧'
+
+	def __str__(self):
+		return f'Game {self.game_id} @ {self.move_number}'
+
+
+class PlayerGameStats(models.Model):
+	"""玩家对局计数（反规范化），创建对局时的数量限制检查直接读取，无需统计Game表"""
+	user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='game_stats')  # 玩家
+	total_games = models.PositiveIntegerField(default=0)  # 参与的对局总数
+	active_games = models.PositiveIntegerField(default=0)  # 未终局的对局数
+	updated_at = models.DateTimeField(auto_now=True)  # 更新时间
+
+	class Meta:
+		db_table = 'datab_player_game_stats'
+		verbose_name = '玩家对局计数'
+		verbose_name_plural = '玩家对局计数'
+
+	def __str__(self):
+		return f'{self.user_id}: {self.active_games}/{self.total_games}'
+
+
+class GameParticipant(models.Model):
+	"""
+	对局参与者索引表（反规范化，每局两行）
+
+	按玩家查询对局时不再使用 player1=... OR player2=... 加去重，
+	而是在 (user, created_at) / (user, is_finished, created_at) 索引上顺序扫描。
+	由 participants 模块的信号与 Game 同步维护。
+	"""
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='game_participations')  # 玩家
+	game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='participants')  # 对局
+	color = models.CharField(max_length=10, choices=[('black', 'Black'), ('white', 'White')])  # 该玩家执子颜色
+	created_at = models.DateTimeField()  # 对局创建时间（同 Game.created_at）
+	is_finished = models.BooleanField(default=False)  # 对局是否已终局（同 Game.is_finished）
+
+	class Meta:
+		db_table = 'datab_game_participant'
+		indexes = [
+			models.Index(fields=['user', 'created_at', 'game'], name='participant_user_created'),  # 玩家的全部对局
+			models.Index(fields=['user', 'is_finished', 'created_at', 'game'], name='participant_user_finished'),  # 按终局状态
+		]
+		constraints = [
+			models.UniqueConstraint(fields=['game', 'user'], name='unique_game_participant'),
+		]
+		verbose_name = '对局参与者'
+		verbose_name_plural = '对局参与者'
+
+	def __str__(self):
+		return f'Game {self.game_id} - {self.user_id} ({self.color})'
@@ -0,0 +1,166 @@
+"""
+已终局对局的紧凑棋谱存储
+
+终局后棋谱只会按顺序重放，不再需要逐手一行的 Intersection 记录（及其多个索引）。
+压缩后整盘棋保存在 Game.packed_moves 一个二进制列中：
+
+	版本(1字节) + 每手 [位置与颜色(2字节) + 距上一手的毫秒数(varint)]
+
+位置与颜色为大端 uint16：最高位为颜色（0黑1白），低9位为 (row-1)*19 + (col-1)。
+第一手的时间差相对于对局创建时间。重放接口通过 Game.get_moves / load_moves_after
+透明地解码，调用方无需区分对局是否已压缩。
+"""
+
+import struct
+from datetime import timedelta
+
+from django.db import transaction
+
+from .engine.bitboard import BOARD_SIZE, NUM_POINTS
+from .models import Game, Intersection
+
+FORMAT_VERSION = 1
+_POINT = struct.Struct('>H')
+_WHITE_BIT = 0x8000
+
+
+def _encode_varint(value):
+	"""无符号LEB128编码"""
+	out = bytearray()
+	while True:
+		byte = value & 0x7F
+		value >>= 7
+		if value:
+			out.append(byte | 0x80)
+		else:
+			out.append(byte)
+			return bytes(out)
+
+
+def pack_moves(moves, started_at):
+	"""
+	打包棋谱
+
+	Args:
+		moves: 按手数顺序的 (row, col, color, placed_at)，坐标为1起始，颜色为 black/white
+		started_at: 对局创建时间，作为第一手时间差的基准
+	"""
+	out = bytearray([FORMAT_VERSION])
+	previous = started_at
+	for row, col, color, placed_at in moves:
+		point = (row - 1) * BOARD_SIZE + (col - 1)
+		out += _POINT.pack(point | (_WHITE_BIT if color == 'white' else 0))
+		delta_ms = max(0, int((placed_at - previous).total_seconds() * 1000))
+		out += _encode_varint(delta_ms)
+		# 以解码端还原出的时间为基准，截断误差不会逐手累积
+		previous += timedelta(milliseconds=delta_ms)
+	return bytes(out)
+
+
+def unpack_moves(data, started_at):
+	"""解码棋谱，返回 (move_number, row, col, color, placed_at) 列表；格式不正确时抛出ValueError"""
+	data = bytes(data)
+	if not data:
+		return []
+	if data[0] != FORMAT_VERSION:
+		raise ValueError(f'Unsupported packed move format version {data[0]}')
+
+	moves = []
+	placed_at = started_at
+	offset = 1
+	length = len(data)
+	while offset < length:
+		if offset + _POINT.size > length:
+			raise ValueError('Truncated packed move list')
+		(value,) = _POINT.unpack_from(data, offset)
+		offset += _POINT.size
+		if value & ~_WHITE_BIT >= NUM_POINTS:
+			raise ValueError(f'Corrupt packed move at offset {offset - _POINT.size}')
+
+		delta_ms = 0
+		shift = 0
+		while True:
+			if offset >= length:
+				raise ValueError('Truncated packed move list')
+			byte = data[offset]
+			offset += 1
+			delta_ms |= (byte & 0x7F) << shift
+			if not byte & 0x80:
+				break
+			shift += 7
+
+		placed_at = placed_at + timedelta(milliseconds=delta_ms)
+		row, col = divmod(value & 0x1FF, BOARD_SIZE)
+		color = 'white' if value & _WHITE_BIT else 'black'
+		moves.append((len(moves) + 1, row + 1, col + 1, color, placed_at))
+	return moves
+
+
+def decode_intersections(game):
+	"""把对局的压缩棋谱解码为未保存的 Intersection 对象（id为None）"""
+	return [
+		Intersection(game=game, row=row, col=col, color=color, move_number=number, placed_at=placed_at)
+		for number, row, col, color, placed_at in unpack_moves(game.packed_moves, game.created_at)
+	]
+
+
+def load_moves_after(game_id, after=0, until=None):
+	"""
+	按手数顺序返回手数大于 after（且不超过 until）的落子，已压缩的部分透明解码
+
+	落子行从 after+1 连续开始时只需一次查询；否则（对局已压缩）再读取压缩棋谱。
+	"""
+	moves = Intersection.objects.filter(game_id=game_id, move_number__gt=after).order_by('move_number')
+	if until is not None:
+		moves = moves.filter(move_number__lte=until)
+	moves = list(moves)
+	if moves and moves[0].move_number == after + 1:
+		return moves
+
+	game = Game.objects.filter(pk=game_id).only('id', 'created_at', 'packed_moves').first()
+	if game is None or not game.packed_moves:
+		return moves
+	packed = [
+		move for move in decode_intersections(game)
+		if move.move_number > after and (until is None or move.move_number <= until)
+	]
+	stored = {move.move_number for move in moves}
+	return sorted([move for move in packed if move.move_number not in stored] + moves, key=lambda m: m.move_number)
+
+
+def compact_game(game_id):
+	"""
+	把已终局对局的落子压缩进 Game.packed_moves 并删除落子行
+
+	Returns:
+		int | None: 压缩的手数；对局未终局、已压缩、没有落子或棋谱不连续（历史数据）时返回None
+	"""
+	with transaction.atomic():
+		game = Game.objects.select_for_update().filter(pk=game_id).first()
+		if game is None or not game.is_finished or game.packed_moves:
+			return None
+
+		moves = list(Intersection.objects.filter(game_id=game_id).order_by('move_number').values_list(
+			'move_number', 'row', 'col', 'color', 'placed_at'
+		))
+		if not moves:
+			return None
+		if [move[0] for move in moves] != list(range(1, len(moves) + 1)):
+			return None
+		if any(color not in ('black', 'white') or not (1 <= row <= BOARD_SIZE and 1 <= col <= BOARD_SIZE)
+				for _, row, col, color, _ in moves):
+			return None
+
+		packed = pack_moves([move[1:] for move in moves], game.created_at)
+		# 删除落子行前确认解码结果一致（时间精度为毫秒）
+		decoded = unpack_moves(packed, game.created_at)
+		if [move[:4] for move in decoded] != [move[:4] for move in moves]:
+			return None
+
+		# 保存时 game_post_save 失效一次对局缓存；落子行直接删除，不逐行触发落子的
+		# post_delete 信号（每行都会失效缓存并重算摘要，而压缩前后棋谱不变）
+		game.packed_moves = packed
+		game.save(update_fields=['packed_moves'])
+		rows = Intersection.objects.filter(game_id=game_id)
+		rows._raw_delete(rows.db)
+	return len(moves)
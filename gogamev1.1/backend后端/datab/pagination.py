@@ -0,0 +1,180 @@
+"""
+键集（游标）分页
+
+按固定的唯一排序键分页：游标记录上一页最后一行的排序键值，下一页用
+(a, b) > (x, y) 形式的条件直接从索引定位，不使用OFFSET，响应时间与历史长度无关。
+对局按参与者索引表的 (created_at, game) 倒序，落子按 (game, move_number) 正序，均有对应的复合索引。
+"""
+
+import base64
+import hashlib
+import json
+from functools import reduce
+
+from django.db import models
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(NotFound):
+	"""游标无法解析（被篡改或来自排序方式不同的列表）"""
+	default_detail = '无效的分页游标'
+
+
+class KeysetPagination(BasePagination):
+	"""
+	键集分页基类
+
+	ordering 为排序字段（'-' 前缀表示倒序），组合起来必须唯一。响应格式为
+	{"next": 下一页链接或null, "results": [...]}，只支持向后翻页。
+	查询集也可以是已排序好的对象列表（如已压缩对局解码出的落子），此时在内存中过滤。
+	"""
+	ordering = ()
+	page_size = 20
+	max_page_size = 100
+	page_size_query_param = 'page_size'
+	cursor_query_param = 'cursor'
+
+	def paginate_queryset(self, queryset, request, view=None):
+		self.request = request
+		self.page_size = self.get_page_size(request)
+		position = self.decode_cursor(request)
+
+		if isinstance(queryset, list):
+			rows = self._paginate_list(queryset, position)
+		else:
+			queryset = queryset.order_by(*self.ordering)
+			if position is not None:
+				queryset = queryset.filter(self._after(queryset, position))
+			# 多取一行判断是否还有下一页
+			rows = list(queryset[:self.page_size + 1])
+
+		self.has_next = len(rows) > self.page_size
+		self.page = rows[:self.page_size]
+		return self.page
+
+	def get_paginated_response(self, data):
+		return Response({'next': self.get_next_link(), 'results': data})
+
+	def get_paginated_response_schema(self, schema):
+		return {
+			'type': 'object',
+			'required': ['results'],
+			'properties': {
+				'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+				'results': schema,
+			},
+		}
+
+	def get_page_size(self, request):
+		try:
+			size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+		except (TypeError, ValueError):
+			return self.page_size
+		return min(max(size, 1), self.max_page_size)
+
+	def get_next_link(self):
+		if not self.has_next:
+			return None
+		last = self.page[-1]
+		values = [self._value(last, field) for field, _ in self._fields()]
+		return replace_query_param(
+			self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(values)
+		)
+
+	def _fields(self):
+		"""[(字段名, 是否倒序)]"""
+		return [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+	@staticmethod
+	def _value(obj, field):
+		value = getattr(obj, field)
+		return value.isoformat() if hasattr(value, 'isoformat') else value
+
+	def encode_cursor(self, values):
+		data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+		return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+	def decode_cursor(self, request):
+		"""解析游标，返回排序键值列表（仍为字符串/数字，比较前由字段转换），没有游标时返回None"""
+		cursor = request.query_params.get(self.cursor_query_param)
+		if not cursor:
+			return None
+		try:
+			values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+		except (TypeError, ValueError):
+			raise InvalidCursor()
+		if not isinstance(values, list) or len(values) != len(self.ordering):
+			raise InvalidCursor()
+		return values
+
+	def _position(self, model, values, annotations=None):
+		"""按模型字段（或注解的输出字段）类型转换游标中的值"""
+		annotations = annotations or {}
+		try:
+			return [
+				(annotations[field].output_field if field in annotations else model._meta.get_field(field)).to_python(value)
+				for (field, _), value in zip(self._fields(), values)
+			]
+		except Exception:
+			raise InvalidCursor()
+
+	def _after(self, queryset, values):
+		"""
+		排在游标之后的行：(f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...（倒序字段为 <）
+
+		额外加上首字段的范围条件（>= 或 <=），便于数据库直接做索引范围扫描。
+		"""
+		position = self._position(queryset.model, values, queryset.query.annotations)
+		fields = self._fields()
+		branches = []
+		for index, (field, descending) in enumerate(fields):
+			equal = {name: value for (name, _), value in zip(fields[:index], position[:index])}
+			lookup = f'{field}__lt' if descending else f'{field}__gt'
+			branches.append(models.Q(**equal, **{lookup: position[index]}))
+		first, descending = fields[0]
+		bound = models.Q(**{f'{first}__lte' if descending else f'{first}__gte': position[0]})
+		return bound & reduce(lambda a, b: a | b, branches)
+
+	def _paginate_list(self, rows, values):
+		"""在内存中对已按 ordering 排序的对象列表分页"""
+		if values is not None and rows:
+			position = self._position(type(rows[0]), values)
+			fields = self._fields()
+
+			def after(row):
+				for (field, descending), value in zip(fields, position):
+					current = getattr(row, field)
+					if current != value:
+						return current < value if descending else current > value
+				return False
+
+			rows = [row for row in rows if after(row)]
+		return rows[:self.page_size + 1]
+
+
+class ParticipantGamePagination(KeysetPagination):
+	"""
+	按玩家查询的对局列表（participants.user_games）：按参与者索引行的创建时间倒序，id 保证顺序唯一
+
+	listed_at 与 Game.created_at 相同，但排序键来自 GameParticipant，
+	(user, created_at, game) 索引即可直接给出顺序，无需排序。
+	"""
+	ordering = ('-listed_at', '-id')
+
+
+class IntersectionPagination(KeysetPagination):
+	"""落子列表：按对局和手数正序（game + move_number 唯一）"""
+	ordering = ('game_id', 'move_number')
+	page_size = 200
+	max_page_size = 1000
+
+
+def page_cache_tag(request):
+	"""分页参数的缓存键/ETag标记，未指定游标和页大小（第一页）时为空字符串"""
+	params = [request.query_params.get(name, '') for name in ('cursor', 'page_size')]
+	if not any(params):
+		return ''
+	return hashlib.sha1('|'.join(params).encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,80 @@
+"""
+对局参与者索引表
+
+GameParticipant 为每局对局的双方各保存一行（玩家、对局、创建时间、是否终局），
+“我的对局”查询按 user 过滤后直接沿 (user, created_at) 索引有序扫描，
+不再需要 player1/player2 的 OR 条件（BitmapOr）和 DISTINCT 去重。
+索引行由 Game 的 post_save 信号维护，与对局的写入处于同一事务；删除随对局级联。
+"""
+
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Game, GameParticipant
+
+
+def participant_rows(game):
+	"""对局双方的索引行（未保存）"""
+	return [
+		GameParticipant(user_id=user_id, game_id=game.id, color=color, created_at=game.created_at, is_finished=game.is_finished)
+		for user_id, color in ((game.player1_id, 'black'), (game.player2_id, 'white'))
+	]
+
+
+def user_games(user, finished=None):
+	"""
+	用户参与的对局（每局一行，无需去重），finished 为 True/False 时只返回已终局/未终局的对局
+
+	附带 listed_at（索引行的创建时间），按 ('-listed_at', '-id') 排序即可走索引顺序扫描。
+	"""
+	filters = {'participants__user': user}
+	if finished is not None:
+		filters['participants__is_finished'] = finished
+	return Game.objects.filter(**filters).annotate(listed_at=models.F('participants__created_at'))
+
+
+def shared_unfinished_game_id(user_id, other_id):
+	"""两名玩家之间未终局对局的ID（没有时为None）"""
+	return GameParticipant.objects.filter(
+		user_id=user_id,
+		is_finished=False,
+		game__participants__user_id=other_id,
+	).values_list('game_id', flat=True).first()
+
+
+def reconcile_participants(dry_run=False):
+	"""
+	补建缺少的索引行，修正终局状态不一致的索引行（如绕过信号的 QuerySet.update）
+
+	Returns:
+		tuple: (补建索引行的对局数, 修正终局状态的索引行数)
+	"""
+	finished = models.Q(winner__isnull=False) & ~models.Q(winner='')
+	missing = Game.objects.annotate(rows=models.Count('participants')).filter(rows__lt=2).order_by('id')
+	stale = GameParticipant.objects.filter(
+		models.Q(is_finished=True, game__in=Game.objects.exclude(finished))
+		| models.Q(is_finished=False, game__in=Game.objects.filter(finished))
+	)
+	if dry_run:
+		return missing.count(), stale.count()
+
+	repaired = 0
+	with transaction.atomic():
+		for game in missing.iterator(chunk_size=500):
+			GameParticipant.objects.bulk_create(participant_rows(game), ignore_conflicts=True)
+			repaired += 1
+		updated = stale.filter(is_finished=True).update(is_finished=False)
+		updated += stale.filter(is_finished=False).update(is_finished=True)
+	return repaired, updated
+
+
+@receiver(post_save, sender=Game)
+def game_participants_post_save(sender, instance, created, update_fields=None, **kwargs):
+	"""对局创建时写入双方索引行，获胜方可能变化时同步终局状态"""
+	if created:
+		GameParticipant.objects.bulk_create(participant_rows(instance), ignore_conflicts=True)
+	elif update_fields is None or 'winner' in update_fields:
+		GameParticipant.objects.filter(game_id=instance.id).exclude(
+			is_finished=instance.is_finished
+		).update(is_finished=instance.is_finished)
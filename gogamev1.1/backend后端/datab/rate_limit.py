@@ -1,18 +1,32 @@
-import time
 import hashlib
-from django.db import models
-from django.core.cache import cache
 from django.http import JsonResponse
 from functools import wraps
 from rest_framework import status
 
+from core.rate_limiter import SlidingWindowPolicy, TokenBucketPolicy, rate_limiter
+
 
 class RateLimitExceeded(Exception):
     """频率限制异常"""
     pass
 
 
-def rate_limit(max_requests=10, window_seconds=60, key_func=None):
+def _limited_response(result, payload):
+    """429响应，附带 Retry-After 和 X-RateLimit-* 头"""
+    response = JsonResponse(payload, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    for header, value in result.headers().items():
+        response[header] = value
+    return response
+
+
+def _with_headers(response, result):
+    """在放行的响应上附加 X-RateLimit-* 头"""
+    for header, value in result.headers().items():
+        response[header] = value
+    return response
+
+
+def rate_limit(max_requests=10, window_seconds=60, key_func=None, burst=None):
     """
     频率限制装饰器
 
@@ -20,39 +34,45 @@ def rate_limit(max_requests=10, window_seconds=60, key_func=None):
         max_requests: 时间窗口内最大请求数
         window_seconds: 时间窗口（秒）
         key_func: 自定义key生成函数，默认使用用户ID
+        burst: 指定时改用令牌桶（容量为burst，按 max_requests/window_seconds 的速率恢复），默认滑动窗口
     """
+    if burst:
+        policy = TokenBucketPolicy(burst, max_requests / window_seconds)
+    else:
+        policy = SlidingWindowPolicy((max_requests, window_seconds))
+
     def decorator(view_func):
         @wraps(view_func)
         def wrapped_view(request, *args, **kwargs):
-            # 生成缓存key
+            # 生成限流key
             if key_func:
-                cache_key = key_func(request)
+                limit_key = key_func(request)
             else:
                 # 默认使用用户ID作为key
                 user_id = getattr(request.user, 'id', 'anonymous')
                 view_name = f"{view_func.__module__}.{view_func.__name__}"
-                cache_key = f"rate_limit:{hashlib.md5(f'{user_id}:{view_name}'.encode()).hexdigest()}"
+                limit_key = hashlib.md5(f'{user_id}:{view_name}'.encode()).hexdigest()
 
-            # 获取当前计数
-            current_count = cache.get(cache_key, 0)
-
-            # 检查是否超过限制
-            if current_count >= max_requests:
-                return JsonResponse({
-                    "detail": f"请求过于频繁，请在{window_seconds}秒后再试",
+            result = rate_limiter.check(f"rate_limit:{limit_key}", policy)
+            if not result.allowed:
+                return _limited_response(result, {
+                    "detail": f"请求过于频繁，请在{result.headers()['Retry-After']}秒后再试",
                     "limit": max_requests,
                     "window": window_seconds
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-
-            # 增加计数
-            cache.set(cache_key, current_count + 1, window_seconds)
+                })
 
-            return view_func(request, *args, **kwargs)
+            return _with_headers(view_func(request, *args, **kwargs), result)
 
         return wrapped_view
     return decorator
 
 
+# 每用户每分钟最多创建1个游戏，每小时最多创建5个游戏（两个窗口在同一次检查中原子计数）
+GAME_CREATION_POLICY = SlidingWindowPolicy((1, 60), (5, 3600))
+# 每游戏每用户每秒最多1次落子
+MOVE_CREATION_POLICY = TokenBucketPolicy(capacity=1, refill_rate=1)
+
+
 def game_creation_limit():
     """
     游戏创建频率限制
@@ -64,35 +84,24 @@ def game_creation_limit():
             if not request.user or not request.user.is_authenticated:
                 return view_func(self, request, *args, **kwargs)
 
-            user_id = request.user.id
-
-            # 每分钟限制
-            minute_key = f"game_limit:minute:{user_id}"
-            minute_count = cache.get(minute_key, 0)
-            if minute_count >= 1:
-                return JsonResponse({
-                    "detail": "游戏创建过于频繁，请等待1分钟后再试",
-                    "type": "minute_limit",
-                    "limit": 1,
-                    "window": 60
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-
-            # 每小时限制
-            hour_key = f"game_limit:hour:{user_id}"
-            hour_count = cache.get(hour_key, 0)
-            if hour_count >= 5:
-                return JsonResponse({
+            result = rate_limiter.check(f"game_limit:{request.user.id}", GAME_CREATION_POLICY)
+            if not result.allowed:
+                # 剩余次数最少的窗口即为触发限制的窗口
+                if result.limit == 1:
+                    return _limited_response(result, {
+                        "detail": "游戏创建过于频繁，请等待1分钟后再试",
+                        "type": "minute_limit",
+                        "limit": 1,
+                        "window": 60
+                    })
+                return _limited_response(result, {
                     "detail": "游戏创建过于频繁，每小时最多创建5个游戏",
                     "type": "hour_limit",
                     "limit": 5,
                     "window": 3600
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-
-            # 设置计数
-            cache.set(minute_key, minute_count + 1, 60)
-            cache.set(hour_key, hour_count + 1, 3600)
+                })
 
-            return view_func(self, request, *args, **kwargs)
+            return _with_headers(view_func(self, request, *args, **kwargs), result)
 
         return wrapped_view
     return decorator
@@ -116,24 +125,15 @@ def move_creation_limit():
                     "detail": "必须指定游戏ID"
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            user_id = request.user.id
-            move_key = f"move_limit:{game_id}:{user_id}"
-
-            # 检查最近操作
-            last_move_time = cache.get(move_key)
-            current_time = int(time.time())
-
-            if last_move_time and current_time - last_move_time < 1:
-                return JsonResponse({
+            result = rate_limiter.check(f"move_limit:{game_id}:{request.user.id}", MOVE_CREATION_POLICY)
+            if not result.allowed:
+                return _limited_response(result, {
                     "detail": "落子过于频繁，请稍后再试",
                     "type": "move_limit",
                     "min_interval": 1
-                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-
-            # 记录当前操作时间
-            cache.set(move_key, current_time, 10)
+                })
 
-            return view_func(self, request, *args, **kwargs)
+            return _with_headers(view_func(self, request, *args, **kwargs), result)
 
         return wrapped_view
     return decorator
@@ -149,15 +149,15 @@ def check_game_limits():
             if not request.user or not request.user.is_authenticated:
                 return view_func(self, request, *args, **kwargs)
 
-            from .models import Game
+            from .game_stats import get_game_counts
+            from .participants import shared_unfinished_game_id
 
             user = request.user
 
-            # 检查总游戏数量限制（最多50个）
-            total_games = Game.objects.filter(
-                models.Q(player1=user) | models.Q(player2=user)
-            ).distinct().count()
+            # 对局计数按主键读取一行（由 game_stats 在对局创建/终局/删除时维护）
+            total_games, active_games = get_game_counts(user.id)
 
+            # 检查总游戏数量限制（最多50个）
             if total_games >= 50:
                 return JsonResponse({
                     "detail": "您已达到最大游戏数量限制（50个）",
@@ -166,11 +166,6 @@ def check_game_limits():
                 }, status=status.HTTP_429_TOO_MANY_REQUESTS)
 
             # 检查进行中游戏数量限制（最多10个）
-            active_games = Game.objects.filter(
-                models.Q(player1=user) | models.Q(player2=user),
-                winner__in=['black', 'white']  # 假设'draw'表示未结束，实际逻辑可能需要调整
-            ).distinct().count()
-
             if active_games >= 10:
                 return JsonResponse({
                     "detail": "您有太多进行中的游戏（最多10个）",
@@ -187,18 +182,13 @@ def check_game_limits():
                 if player1_id and player2_id:
                     # 检查这两个用户之间是否已有未完成的对局
                     # 未完成的对局判断标准：winner为空字符串或null
-                    conflict_games = Game.objects.filter(
-                        models.Q(player1_id=player1_id, player2_id=player2_id) |
-                        models.Q(player1_id=player2_id, player2_id=player1_id)
-                    ).filter(
-                        models.Q(winner__isnull=True) | models.Q(winner='')
-                    ).distinct()
-
-                    if conflict_games.exists():
+                    existing_game_id = shared_unfinished_game_id(player1_id, player2_id)
+
+                    if existing_game_id is not None:
                         return JsonResponse({
                             "detail": "这两位用户之间已有未完成的对局，请先完成现有对局",
                             "type": "user_conflict",
-                            "existing_game_id": conflict_games.first().id
+                            "existing_game_id": existing_game_id
                         }, status=status.HTTP_429_TOO_MANY_REQUESTS)
 
             except Exception as e:
@@ -0,0 +1,279 @@
+"""
+对局实时推送模块
+
+提供基于原生ASGI协议的WebSocket端点（不依赖Channels），把落子、终局和贴目变化
+推送给对局双方，取代前端的定时轮询。
+
+使用Redis缓存后端时，事件经Redis发布/订阅总线广播：每次落子只发布一条消息，
+每个进程运行一个订阅任务，再分发给本进程持有的连接，从而支持多进程、多容器部署。
+未配置Redis时在进程内直接分发。
+
+连接地址：/api/datab/ws/games/<game_id>/?ticket=<一次性票据>
+票据由 POST /api/datab/games/<game_id>/socket-ticket/ 用请求头中的access token换取，
+只能使用一次且很快过期，access token 本身不出现在URL和访问日志中。
+推送消息：{"type": "move" | "game_end" | "komi" | "ping", "game": <id>, ...}
+"""
+
+import asyncio
+import json
+import logging
+import re
+import secrets
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+
+logger = logging.getLogger('datab')
+
+WS_PATH_PATTERN = re.compile(r'^/api/datab/ws/games/(?P<game_id>\d+)/?$')
+HEARTBEAT_INTERVAL = 20  # 心跳间隔（秒），需小于nginx的proxy_read_timeout（30秒）
+QUEUE_SIZE = 100  # 单个连接的待发送消息上限，超出说明客户端过慢
+EVENT_CHANNEL = 'gogame:game-events'  # Redis发布/订阅频道
+SUBSCRIBER_MAX_RETRY_DELAY = 30  # 订阅断线后的最长重连间隔（秒）
+
+
+class GameConnectionHub:
+	"""进程内连接注册表：对局ID -> 该进程持有的WebSocket连接消息队列"""
+
+	def __init__(self):
+		self._connections = {}  # 对局ID -> {队列: 所属事件循环}
+		self._lock = threading.Lock()
+
+	def register(self, game_id, queue):
+		"""注册连接（在事件循环内调用）"""
+		with self._lock:
+			self._connections.setdefault(game_id, {})[queue] = asyncio.get_running_loop()
+
+	def unregister(self, game_id, queue):
+		"""注销连接"""
+		with self._lock:
+			queues = self._connections.get(game_id)
+			if queues is not None:
+				queues.pop(queue, None)
+				if not queues:
+					del self._connections[game_id]
+
+	def connection_count(self, game_id=None):
+		"""当前进程持有的连接数"""
+		with self._lock:
+			if game_id is not None:
+				return len(self._connections.get(game_id, ()))
+			return sum(len(queues) for queues in self._connections.values())
+
+	def dispatch(self, game_id, message):
+		"""把消息投递给本进程内该对局的全部连接（可在任意线程调用）"""
+		by_loop = {}
+		with self._lock:
+			for queue, loop in self._connections.get(game_id, {}).items():
+				by_loop.setdefault(loop, []).append(queue)
+		for loop, queues in by_loop.items():
+			if not loop.is_closed():
+				loop.call_soon_threadsafe(self._deliver, queues, message)
+
+	@staticmethod
+	def _deliver(queues, message):
+		"""在事件循环内把消息放入各连接队列，队列已满的慢连接直接丢弃该消息"""
+		for queue in queues:
+			try:
+				queue.put_nowait(message)
+			except asyncio.QueueFull:
+				logger.warning("WebSocket queue full, dropping game event")
+
+
+hub = GameConnectionHub()
+
+
+# Redis事件总线
+
+def _redis_url():
+	"""默认缓存为django_redis时返回其Redis地址，否则返回None"""
+	from django.conf import settings
+
+	config = settings.CACHES.get('default', {})
+	if not config.get('BACKEND', '').startswith('django_redis.'):
+		return None
+	location = config.get('LOCATION')
+	return location[0] if isinstance(location, (list, tuple)) else location
+
+
+class GameEventSubscriber:
+	"""进程内唯一的Redis订阅任务：接收总线上的对局事件并分发给本进程的连接"""
+
+	def __init__(self, hub):
+		self.hub = hub
+		self._task = None
+		self._loop = None
+
+	def ensure_started(self):
+		"""
+		在当前事件循环内按需启动订阅任务（未配置Redis时不启动）
+
+		订阅任务属于创建它的事件循环。WSGI进程中的长轮询每个请求运行在各自的事件循环里，
+		请求结束后循环关闭，其上的任务不会再运行也不会结束，因此调用方的事件循环与
+		任务所属的不同时在当前循环中重新启动。
+		"""
+		loop = asyncio.get_running_loop()
+		if self._task is not None and not self._task.done() and self._loop is loop:
+			return
+		url = _redis_url()
+		if url is None:
+			return
+		if self._task is not None and not self._task.done() and not self._loop.is_closed():
+			# 旧循环仍在运行（如多个线程各有事件循环）：在其所属循环中取消旧任务
+			try:
+				self._loop.call_soon_threadsafe(self._task.cancel)
+			except RuntimeError:
+				pass
+		self._loop = loop
+		self._task = loop.create_task(self._run(url))
+
+	async def _run(self, url):
+		"""订阅事件频道，连接断开后按指数退避重连"""
+		import redis.asyncio as aioredis
+		from redis.exceptions import RedisError
+
+		delay = 1
+		while True:
+			client = aioredis.from_url(url)
+			try:
+				async with client.pubsub() as pubsub:
+					await pubsub.subscribe(EVENT_CHANNEL)
+					logger.info("Subscribed to game event bus")
+					delay = 1
+					async for item in pubsub.listen():
+						if item['type'] == 'message':
+							self._forward(item['data'])
+			except (RedisError, OSError) as e:
+				logger.warning(f"Game event bus subscription lost: {e}")
+			finally:
+				await client.aclose()
+			await asyncio.sleep(delay)
+			delay = min(delay * 2, SUBSCRIBER_MAX_RETRY_DELAY)
+
+	def _forward(self, data):
+		"""把总线消息转交给本进程内该对局的连接"""
+		message = data.decode() if isinstance(data, bytes) else data
+		try:
+			game_id = int(json.loads(message)['game'])
+		except (ValueError, KeyError, TypeError):
+			logger.warning("Ignoring malformed game event on bus")
+			return
+		self.hub.dispatch(game_id, message)
+
+
+subscriber = GameEventSubscriber(hub)
+
+
+def publish_game_event(game_id, event_type, **payload):
+	"""发布对局事件，推送给对局双方的WebSocket连接"""
+	message = json.dumps({'type': event_type, 'game': int(game_id), **payload}, ensure_ascii=False)
+	if _redis_url() is not None:
+		from django_redis import get_redis_connection
+		from redis.exceptions import RedisError
+
+		try:
+			# 所有进程（包括本进程）的订阅任务都会收到这条消息
+			get_redis_connection('default').publish(EVENT_CHANNEL, message)
+			return
+		except RedisError as e:
+			logger.warning(f"Failed to publish game event to Redis, delivering locally only: {e}")
+	hub.dispatch(int(game_id), message)
+
+
+def publish_game_event_on_commit(game_id, event_type, **payload):
+	"""在当前数据库事务提交后发布对局事件，避免推送未落库的数据"""
+	from django.db import transaction
+
+	transaction.on_commit(lambda: publish_game_event(game_id, event_type, **payload))
+
+
+# 连接票据
+
+def issue_ticket(game_id, user_id):
+	"""为已确认是对局参与者的用户签发一次性连接票据"""
+	from django.core.cache import cache
+
+	from core.cache_manager import CacheKeyManager, CacheTimeouts
+
+	ticket = secrets.token_urlsafe(24)
+	cache.set(CacheKeyManager.socket_ticket(ticket), f'{int(game_id)}:{int(user_id)}', CacheTimeouts.SOCKET_TICKET)
+	return ticket
+
+
+def redeem_ticket(ticket, game_id):
+	"""兑换连接票据，返回用户ID；票据无效、过期、已使用或不属于该对局时返回None"""
+	from django.core.cache import cache
+
+	from core.cache_manager import CacheKeyManager
+
+	if not ticket:
+		return None
+	key = CacheKeyManager.socket_ticket(ticket)
+	value = cache.get(key)
+	# 删除成功的一方才算兑换成功，同一票据并发握手时只有一个连接通过
+	if value is None or not cache.delete(key):
+		return None
+	ticket_game, _, user_id = value.partition(':')
+	if ticket_game != str(game_id):
+		return None
+	return int(user_id)
+
+
+# ASGI WebSocket应用
+
+async def websocket_application(scope, receive, send):
+	"""对局推送WebSocket端点"""
+	match = WS_PATH_PATTERN.match(scope.get('path', ''))
+	event = await receive()
+	if event['type'] != 'websocket.connect':
+		return
+	if match is None:
+		await send({'type': 'websocket.close', 'code': 4404})
+		return
+
+	game_id = int(match.group('game_id'))
+	query = parse_qs(scope.get('query_string', b'').decode())
+	# 票据签发时已校验参与者身份
+	user_id = await sync_to_async(redeem_ticket)(query.get('ticket', [None])[0], game_id)
+	if user_id is None:
+		await send({'type': 'websocket.close', 'code': 4401})
+		return
+
+	await send({'type': 'websocket.accept'})
+	subscriber.ensure_started()
+	queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+	hub.register(game_id, queue)
+	logger.info(f"WebSocket connected: game {game_id}, user {user_id}")
+
+	receiver = asyncio.ensure_future(_wait_for_disconnect(receive))
+	sender = None
+	try:
+		while True:
+			if sender is None:
+				sender = asyncio.ensure_future(queue.get())
+			done, _ = await asyncio.wait(
+				{sender, receiver}, timeout=HEARTBEAT_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+			)
+			if receiver in done:
+				break
+			if sender in done:
+				await send({'type': 'websocket.send', 'text': sender.result()})
+				sender = None
+			else:
+				# 空闲时发送心跳，防止代理因读超时断开连接
+				await send({'type': 'websocket.send', 'text': json.dumps({'type': 'ping', 'game': game_id})})
+	finally:
+		for task in (sender, receiver):
+			if task is not None:
+				task.cancel()
+		hub.unregister(game_id, queue)
+		logger.info(f"WebSocket disconnected: game {game_id}, user {user_id}")
+
+
+async def _wait_for_disconnect(receive):
+	"""读取客户端消息直到断开（客户端无需发送业务消息）"""
+	while True:
+		event = await receive()
+		if event['type'] == 'websocket.disconnect':
+			return
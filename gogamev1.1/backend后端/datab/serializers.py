@@ -7,13 +7,25 @@ class IntersectionSerializer(serializers.ModelSerializer):
 	"""棋子交叉点序列化器 - 用于处理棋子位置数据的序列化和反序列化"""
 	class Meta:
 		model = Intersection
-		fields = ('id', 'game', 'row', 'col', 'color', 'placed_at')  # 包含ID、游戏、行列、颜色和落子时间
-		read_only_fields = ('placed_at',)  # 落子时间为只读字段
+		fields = ('id', 'game', 'row', 'col', 'color', 'placed_at', 'move_number')  # 包含ID、游戏、行列、颜色、落子时间和手数
+		read_only_fields = ('placed_at', 'move_number')  # 落子时间和手数由服务端确定
+		validators = []  # 手数由服务端分配，(game, move_number) 唯一性交由数据库约束保证
+
+
+class GameSummarySerializer(serializers.ModelSerializer):
+	"""对局摘要序列化器 - 用于列表接口，不含落子记录（需 select_related 双方玩家）"""
+	player1 = serializers.CharField(source='player1.username', read_only=True)  # 黑棋玩家用户名
+	player2 = serializers.CharField(source='player2.username', read_only=True)  # 白棋玩家用户名
+
+	class Meta:
+		model = Game
+		fields = ('id', 'player1', 'player2', 'winner', 'score_black', 'score_white', 'komi', 'move_count', 'last_move_color', 'last_move_at', 'to_move', 'created_at', 'updated_at')
+		read_only_fields = fields
 
 
 class GameSerializer(serializers.ModelSerializer):
 	"""游戏序列化器 - 用于处理游戏数据的序列化和反序列化"""
-	intersections = IntersectionSerializer(many=True, read_only=True)  # 嵌套的棋子位置序列化器
+	intersections = IntersectionSerializer(source='get_moves', many=True, read_only=True)  # 嵌套的棋子位置序列化器（已压缩的对局透明解码）
 	player1 = serializers.CharField(source='player1.username', read_only=True)  # 返回黑棋玩家用户名
 	player2 = serializers.CharField(source='player2.username', read_only=True)  # 返回白棋玩家用户名
 
@@ -23,7 +35,16 @@ class GameSerializer(serializers.ModelSerializer):
 
 	class Meta:
 		model = Game
-		fields = ('id', 'player1', 'player2', 'player1_username', 'player2_username', 'winner', 'score_black', 'score_white', 'komi', 'created_at', 'updated_at', 'intersections')  # 包含游戏所有相关字段
+		fields = ('id', 'player1', 'player2', 'player1_username', 'player2_username', 'winner', 'score_black', 'score_white', 'komi', 'move_count', 'last_move_color', 'last_move_at', 'to_move', 'created_at', 'updated_at', 'intersections')  # 包含游戏所有相关字段（对局摘要字段只读）
+		read_only_fields = ('winner', 'score_black', 'score_white')  # 终局结果只由 EndGameView 数子写入
+
+	def get_fields(self):
+		"""对局创建后双方和贴目只读：贴目只能经 SetKomiView 在第一手之前设置"""
+		fields = super().get_fields()
+		if self.instance is not None:
+			for name in ('komi', 'player1_username', 'player2_username'):
+				fields[name].read_only = True
+		return fields
 
 	def validate_player1_username(self, value):
 		"""验证黑棋玩家用户名是否存在"""
@@ -42,7 +63,10 @@ class GameSerializer(serializers.ModelSerializer):
 			raise serializers.ValidationError(f"用户 '{value}' 不存在")
 
 	def validate(self, data):
-		"""验证两个玩家不能是同一个用户"""
+		"""验证两个玩家不能是同一个用户（只在创建时校验，更新时双方只读）"""
+		if self.instance is not None:
+			return data
+
 		player1_user = data.get('player1_username')
 		player2_user = data.get('player2_username')
 
@@ -61,10 +85,12 @@ class GameSerializer(serializers.ModelSerializer):
 		player1_user = validated_data.pop('player1_username')
 		player2_user = validated_data.pop('player2_username')
 
-		# 创建游戏记录
+		# 创建游戏记录（得分在终局数子时写入）
 		game = Game.objects.create(
 			player1=player1_user,
 			player2=player2_user,
+			score_black=0,
+			score_white=0,
 			**validated_data
 		)
 		return game
@@ -0,0 +1,319 @@
+"""
+SGF棋谱导入导出
+
+导出：单局导出和批量导出都以生成器逐块产出内容：落子通过 .iterator(chunk_size) 分批读取，
+批量导出边生成边写入ZIP（不可寻址的输出流，使用数据描述符），任何时候都不会把
+全部对局或整份压缩包保存在内存中。
+
+导入：解析与规则校验（load_sgf_file）只依赖规则引擎，不导入Django模型，可在进程池中运行。
+"""
+
+import hashlib
+import zipfile
+from decimal import Decimal, InvalidOperation
+
+from .engine import BOARD_SIZE, Board, IllegalMove, is_keyframe, pack_hashes, pack_snapshot
+
+SGF_COORDS = 'abcdefghijklmnopqrs'
+EXPORT_CHUNK_SIZE = 2000  # 每批读取的落子行数
+ZIP_FLUSH_BYTES = 64 * 1024  # ZIP输出缓冲超过该大小时产出一块
+
+
+def _escape(text):
+	"""转义SGF文本属性中的 \\ 和 ]"""
+	return str(text).replace('\\', '\\\\').replace(']', '\\]')
+
+
+def _result(game):
+	"""
+	RE属性：black/white胜（得分差为正时附带目数），draw为和棋，未终局时为None
+
+	导入对局保存了原始结果（如中盘胜 B+R），与获胜方一致时原样写回；
+	没有得分差时不编造目数，写作 B+? / W+?（胜因未知）。
+	"""
+	if game.result and _winner(game.result) == game.winner:
+		return game.result
+	if game.winner == 'draw':
+		return '0'
+	if game.winner not in ('black', 'white'):
+		return None
+	prefix = 'B+' if game.winner == 'black' else 'W+'
+	margin = (game.score_black - game.score_white) * (1 if game.winner == 'black' else -1)
+	return f'{prefix}{margin.normalize():f}' if margin > 0 else f'{prefix}?'
+
+
+def sgf_header(game):
+	"""根节点属性（需 select_related 双方玩家）"""
+	properties = [
+		('GM', '1'),
+		('FF', '4'),
+		('CA', 'UTF-8'),
+		('SZ', str(BOARD_SIZE)),
+		('KM', f'{game.komi.normalize():f}'),
+		('PB', game.player1.username),
+		('PW', game.player2.username),
+		('DT', game.created_at.date().isoformat()),
+		('GN', f'Game {game.id}'),
+	]
+	result = _result(game)
+	if result is not None:
+		properties.append(('RE', result))
+	return '(;' + ''.join(f'{name}[{_escape(value)}]' for name, value in properties)
+
+
+def iter_moves(game, chunk_size=EXPORT_CHUNK_SIZE):
+	"""按手数顺序逐手产出 (row, col, color)，已压缩的对局从 packed_moves 解码"""
+	if game.packed_moves:
+		for move in game.get_moves():
+			if move.color != 'empty':
+				yield move.row, move.col, move.color
+		return
+	from .models import Intersection
+
+	yield from Intersection.objects.filter(game_id=game.id).exclude(color='empty').order_by(
+		'move_number'
+	).values_list('row', 'col', 'color').iterator(chunk_size=chunk_size)
+
+
+def iter_game_sgf(game, chunk_size=EXPORT_CHUNK_SIZE):
+	"""逐块产出一局棋的SGF文本"""
+	yield sgf_header(game)
+	nodes = []
+	for row, col, color in iter_moves(game, chunk_size):
+		nodes.append(f";{'B' if color == 'black' else 'W'}[{SGF_COORDS[col - 1]}{SGF_COORDS[row - 1]}]")
+		if len(nodes) >= chunk_size:
+			yield ''.join(nodes)
+			nodes = []
+	nodes.append(')\n')
+	yield ''.join(nodes)
+
+
+class _ZipOutput:
+	"""ZipFile的只写输出流：写入内容暂存，由生成器取走（不支持seek，ZipFile改用数据描述符）"""
+
+	def __init__(self):
+		self._chunks = []
+		self.size = 0
+
+	def write(self, data):
+		self._chunks.append(bytes(data))
+		self.size += len(data)
+		return len(data)
+
+	def flush(self):
+		pass
+
+	def take(self):
+		data = b''.join(self._chunks)
+		self._chunks = []
+		self.size = 0
+		return data
+
+
+def iter_sgf_zip(games, chunk_size=EXPORT_CHUNK_SIZE):
+	"""逐块产出包含多局SGF的ZIP字节流，games 可以是 QuerySet.iterator()"""
+	output = _ZipOutput()
+	with zipfile.ZipFile(output, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+		for game in games:
+			info = zipfile.ZipInfo(f'game-{game.id}.sgf', date_time=game.created_at.timetuple()[:6])
+			info.compress_type = zipfile.ZIP_DEFLATED
+			with archive.open(info, mode='w') as entry:
+				for text in iter_game_sgf(game, chunk_size):
+					entry.write(text.encode('utf-8'))
+					if output.size >= ZIP_FLUSH_BYTES:
+						yield output.take()
+			if output.size >= ZIP_FLUSH_BYTES:
+				yield output.take()
+	yield output.take()
+
+
+# 导入
+
+class SgfError(ValueError):
+	"""SGF内容无法解析或不受支持"""
+	pass
+
+
+def _parse_node(text, pos):
+	"""解析一个节点的属性，返回 (属性dict, 结束位置)"""
+	properties = {}
+	length = len(text)
+	while pos < length:
+		char = text[pos]
+		if char in ';()':
+			break
+		if not char.isalpha():
+			pos += 1
+			continue
+		start = pos
+		while pos < length and text[pos].isalpha():
+			pos += 1
+		# FF[3]允许小写字母修饰属性名（如AddBlack），只保留大写部分
+		name = ''.join(c for c in text[start:pos] if c.isupper())
+		values = []
+		while True:
+			while pos < length and text[pos].isspace():
+				pos += 1
+			if pos >= length or text[pos] != '[':
+				break
+			pos += 1
+			value = []
+			while pos < length and text[pos] != ']':
+				if text[pos] == '\\' and pos + 1 < length:
+					pos += 1
+				value.append(text[pos])
+				pos += 1
+			if pos >= length:
+				raise SgfError('属性值缺少结束的 ]')
+			pos += 1
+			values.append(''.join(value))
+		if not values:
+			raise SgfError(f'属性 {name} 缺少值')
+		properties.setdefault(name, []).extend(values)
+	return properties, pos
+
+
+def parse_sgf(text):
+	"""解析SGF的第一棵对局树，沿每个分支的第一个变化取主线，返回节点属性列表"""
+	pos = text.find('(')
+	if pos < 0:
+		raise SgfError('不是SGF内容')
+	pos += 1
+	nodes = []
+	length = len(text)
+	while pos < length:
+		char = text[pos]
+		if char == ';':
+			node, pos = _parse_node(text, pos + 1)
+			nodes.append(node)
+		elif char == ')':
+			# 主线所在的（最深的第一个）变化结束，其余变化忽略
+			break
+		else:
+			# '(' 表示进入第一个变化，其余字符为空白
+			pos += 1
+	if not nodes:
+		raise SgfError('SGF中没有节点')
+	return nodes
+
+
+def _point(value):
+	"""SGF坐标 -> 1起始的 (row, col)，空值或tt表示停一手，返回None"""
+	if value in ('', 'tt'):
+		return None
+	if len(value) != 2 or any(c not in SGF_COORDS for c in value):
+		raise SgfError(f'无效的坐标 {value}')
+	return SGF_COORDS.index(value[1]) + 1, SGF_COORDS.index(value[0]) + 1
+
+
+def _winner(result):
+	"""RE属性 -> black/white/draw，无结果或无效对局时为None"""
+	result = result.strip().upper()
+	if result.startswith('B+'):
+		return 'black'
+	if result.startswith('W+'):
+		return 'white'
+	if result in ('0', 'DRAW', 'JIGO'):
+		return 'draw'
+	return None
+
+
+def read_game_record(text):
+	"""
+	把SGF文本解析为对局记录
+
+	Returns:
+		dict: black/white（玩家名）、komi、winner、result（原始RE属性）、moves（1起始的 (row, col, color) 列表）
+
+	Raises:
+		SgfError: 非19路、让子/摆子、中途停一手等本系统无法表示的内容
+	"""
+	nodes = parse_sgf(text)
+	root = nodes[0]
+	first = lambda name, default='': root.get(name, [default])[0].strip()
+
+	if first('SZ', str(BOARD_SIZE)) != str(BOARD_SIZE):
+		raise SgfError(f"不支持 {first('SZ')} 路棋盘")
+	if any(name in node for node in nodes for name in ('AB', 'AW', 'AE')) or first('HA', '0') not in ('0', ''):
+		raise SgfError('不支持让子或摆子')
+	try:
+		komi = Decimal(first('KM', '0') or '0').quantize(Decimal('0.01'))
+	except InvalidOperation:
+		raise SgfError(f"无效的贴目 {first('KM')}")
+	if abs(komi) >= 100:
+		raise SgfError(f'贴目超出范围 {komi}')
+
+	moves = []
+	passed = False
+	for node in nodes[1:]:
+		for name, color in (('B', 'black'), ('W', 'white')):
+			if name not in node:
+				continue
+			point = _point(node[name][0].strip())
+			if point is None:
+				passed = True
+				continue
+			if passed:
+				raise SgfError('不支持中途停一手')
+			moves.append((point[0], point[1], color))
+
+	black, white = first('PB'), first('PW')
+	if not black or not white:
+		raise SgfError('缺少对局双方（PB/PW）')
+	if black == white:
+		raise SgfError('黑白双方为同一玩家')
+	return {
+		'black': black,
+		'white': white,
+		'komi': komi,
+		'winner': _winner(first('RE')),
+		'result': first('RE')[:32],
+		'moves': moves,
+	}
+
+
+def content_hash(record):
+	"""对局内容哈希（双方、贴目、结果和着法），与文件格式、空白和注释无关，用于导入去重"""
+	canonical = '\n'.join([
+		record['black'],
+		record['white'],
+		str(record['komi']),
+		record['winner'] or '',
+		''.join(f"{color[0]}{SGF_COORDS[col - 1]}{SGF_COORDS[row - 1]}" for row, col, color in record['moves']),
+	])
+	return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def load_sgf_file(path):
+	"""
+	读取、解析并用规则引擎校验一个SGF文件（可在进程池中调用）
+
+	Returns:
+		dict: 成功时为对局记录并附带 path、hash、position_hashes、keyframes（[(手数, 快照)]）；
+			失败时为 {'path', 'error'}
+	"""
+	try:
+		with open(path, 'rb') as f:
+			raw = f.read()
+		try:
+			text = raw.decode('utf-8')
+		except UnicodeDecodeError:
+			text = raw.decode('latin-1')
+		record = read_game_record(text)
+
+		board = Board()
+		hashes = []
+		keyframes = []
+		for number, (row, col, color) in enumerate(record['moves'], start=1):
+			try:
+				board.play(row - 1, col - 1, color)
+			except IllegalMove as e:
+				raise SgfError(f'第{number}手不合法：{e.message}')
+			hashes.append(board.hash)
+			if is_keyframe(board.move_number):
+				keyframes.append((board.move_number, pack_snapshot(board)))
+	except (OSError, SgfError) as e:
+		return {'path': str(path), 'error': str(e)}
+
+	record.update(path=str(path), hash=content_hash(record), position_hashes=pack_hashes(hashes), keyframes=keyframes)
+	return record
@@ -0,0 +1,1656 @@
+import asyncio
+import io
+import tempfile
+import time
+from decimal import Decimal
+import zipfile
+from pathlib import Path
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.cache_manager import CacheCodec, CacheKeyManager, cache_codec, cache_result, get_version, invalidate_user_cache
+from core.cache_signals import invalidate_bulk_game_cache
+from core.rate_limiter import (
+	LocalRateLimitStore, RateLimitResult, SlidingWindowPolicy, TokenBucketPolicy, rate_limiter,
+)
+from core.tiered_cache import TieredCache, tiered_cache
+from .engine import BLACK, WHITE, Board, IllegalMove, pack_snapshot, unpack_snapshot
+from .engine.bitboard import point_index
+from .engine.scoring import dead_stone_mask, score_position, territory
+from .engine.zobrist import position_hash
+from . import live_state
+from .game_stats import get_game_counts, reconcile_game_counts
+from .keyframes import build_keyframes, position_at
+from .models import BoardKeyframe, Game, GameParticipant, Intersection, PlayerGameStats
+from .participants import reconcile_participants, shared_unfinished_game_id
+from .packed_moves import compact_game, pack_moves, unpack_moves
+from .pagination import KeysetPagination
+from .realtime import GameEventSubscriber, redeem_ticket
+from .sgf import SgfError, content_hash, read_game_record
+
+
+def bits(*points):
+	"""0起始的 (row, col) 列表转换为位棋盘"""
+	value = 0
+	for row, col in points:
+		value |= 1 << point_index(row, col)
+	return value
+
+
+class GameListQueryCountTests(TestCase):
+	"""列表接口的查询次数不随对局数量增长（N+1回归测试）"""
+
+	# 分页查询 + 权限/认证等固定开销的上限
+	MAX_LIST_QUERIES = 3
+
+	LIST_URLS = (
+		'/api/datab/games/',
+		'/api/datab/games/incomplete/',
+		'/api/datab/games/completed/',
+	)
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.black = User.objects.create_user('black', password='x')
+		cls.white = User.objects.create_user('white', password='x')
+
+	def setUp(self):
+		self.client = APIClient()
+		self.client.force_authenticate(self.black)
+
+	def create_games(self, count):
+		"""创建 count 个对局（一半已终局），每局带几手棋"""
+		for index in range(count):
+			opponent = User.objects.create_user(f'opponent{Game.objects.count()}', password='x')
+			game = Game.objects.create(
+				player1=self.black if index % 2 else opponent,
+				player2=opponent if index % 2 else self.black,
+				winner='black' if index % 2 else None,
+				score_black=0,
+				score_white=0,
+				komi=6.5,
+			)
+			Intersection.objects.bulk_create([
+				Intersection(game=game, row=number, col=number, color='black' if number % 2 else 'white', move_number=number)
+				for number in range(1, 4)
+			])
+		# 直接写库不会经过视图的缓存失效，手动使列表缓存失效
+		invalidate_user_cache(self.black.id)
+
+	def count_queries(self, url):
+		with CaptureQueriesContext(connection) as context:
+			response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		return len(context), response.json()['results']
+
+	def test_list_query_count_is_constant(self):
+		for url in self.LIST_URLS:
+			with self.subTest(url=url):
+				self.create_games(2)
+				few, _ = self.count_queries(url)
+				self.create_games(10)
+				many, results = self.count_queries(url)
+
+				self.assertTrue(results)
+				self.assertEqual(few, many)
+				self.assertLessEqual(many, self.MAX_LIST_QUERIES)
+
+	def test_list_items_are_summaries(self):
+		self.create_games(2)
+		_, results = self.count_queries('/api/datab/games/')
+		for item in results:
+			self.assertNotIn('intersections', item)
+			self.assertIn(self.black.username, (item['player1'], item['player2']))
+
+
+class EngineRuleTests(SimpleTestCase):
+	"""规则引擎：提子、自杀、劫和局面超级劫"""
+
+	def ko_board(self):
+		"""
+		中央的劫：白子 (2,2) 被黑子三面包围，黑方在 (2,3) 提子后白方不能立刻回提
+
+		    . B W .
+		    B W . W
+		    . B W .
+		"""
+		board = Board.from_position(
+			black=bits((1, 2), (2, 1), (3, 2)),
+			white=bits((1, 3), (2, 2), (2, 4), (3, 3)),
+		)
+		board.history = {board.hash}
+		return board
+
+	def test_capture_removes_group_and_counts_prisoners(self):
+		board = Board.from_position(black=bits((0, 1)), white=bits((0, 0)), to_move=BLACK)
+		result = board.play(1, 0, BLACK)
+
+		self.assertEqual(result.captured, [(0, 0)])
+		self.assertIsNone(board.color_at(0, 0))
+		self.assertEqual(board.captures[BLACK], 1)
+		self.assertEqual(board.liberties(1, 0), 3)
+
+	def test_capture_of_multi_stone_group(self):
+		board = Board.from_position(black=bits((0, 2), (1, 0)), white=bits((0, 0), (0, 1)), to_move=BLACK)
+		result = board.play(1, 1, BLACK)
+
+		self.assertEqual(sorted(result.captured), [(0, 0), (0, 1)])
+		self.assertEqual(board.stones[WHITE], 0)
+
+	def test_suicide_is_rejected_and_board_unchanged(self):
+		board = Board.from_position(black=bits((0, 1), (1, 0)), white=0, to_move=WHITE)
+		before = (dict(board.stones), board.hash, board.move_number)
+
+		with self.assertRaises(IllegalMove) as context:
+			board.play(0, 0, WHITE)
+		self.assertEqual(context.exception.reason, 'suicide')
+		self.assertEqual((dict(board.stones), board.hash, board.move_number), before)
+
+	def test_filling_own_last_liberty_that_captures_is_legal(self):
+		board = Board.from_position(black=bits((0, 1), (1, 0)), white=bits((0, 2), (1, 1), (2, 0)), to_move=WHITE)
+		result = board.play(0, 0, WHITE)
+		self.assertEqual(sorted(result.captured), [(0, 1), (1, 0)])
+
+	def test_simple_ko_recapture_is_rejected(self):
+		board = self.ko_board()
+		result = board.play(2, 3, BLACK)
+		self.assertEqual(result.captured, [(2, 2)])
+
+		with self.assertRaises(IllegalMove) as context:
+			board.play(2, 2, WHITE)
+		self.assertEqual(context.exception.reason, 'ko')
+
+	def test_ko_can_be_retaken_after_a_threat(self):
+		board = self.ko_board()
+		board.play(2, 3, BLACK)
+		board.play(10, 10, WHITE)
+		board.play(10, 11, BLACK)
+
+		result = board.play(2, 2, WHITE)
+		self.assertEqual(result.captured, [(2, 3)])
+
+	def test_positional_superko_rejects_repeated_position(self):
+		board = self.ko_board()
+		board.play(2, 3, BLACK)
+		# 劫点信息丢失（如从不含劫点的局面恢复）时，局面哈希历史仍能拒绝同形再现
+		board.ko_point = None
+
+		with self.assertRaises(IllegalMove) as context:
+			board.play(2, 2, WHITE)
+		self.assertEqual(context.exception.reason, 'superko')
+
+	def test_incremental_hash_matches_full_position_hash(self):
+		board = self.ko_board()
+		for row, col, color in [(2, 3, BLACK), (10, 10, WHITE), (10, 11, BLACK), (2, 2, WHITE)]:
+			board.play(row, col, color)
+			self.assertEqual(board.hash, position_hash(board.stones[BLACK], board.stones[WHITE]))
+			self.assertIn(board.hash, board.history)
+
+	def test_wrong_turn_and_occupied_point(self):
+		board = Board()
+		with self.assertRaises(IllegalMove) as context:
+			board.play(3, 3, WHITE)
+		self.assertEqual(context.exception.reason, 'wrong_turn')
+
+		board.play(3, 3, BLACK)
+		with self.assertRaises(IllegalMove) as context:
+			board.play(3, 3, WHITE)
+		self.assertEqual(context.exception.reason, 'occupied')
+
+
+class MoveEditingTests(TestCase):
+	"""落子只能经规则引擎创建，已有落子不能修改或删除"""
+
+	def test_intersection_detail_is_read_only(self):
+		black = User.objects.create_user('black', password='x')
+		white = User.objects.create_user('white', password='x')
+		game = Game.objects.create(player1=black, player2=white, score_black=0, score_white=0, komi=6.5)
+		move = Intersection.objects.create(game=game, row=4, col=4, color='black', move_number=1)
+		client = APIClient()
+		client.force_authenticate(black)
+		url = f'/api/datab/intersections/{move.id}/'
+
+		self.assertEqual(client.get(url).status_code, 200)
+		self.assertEqual(client.patch(url, {'row': 10, 'col': 10}, format='json').status_code, 405)
+		self.assertEqual(client.put(url, {'game': game.id, 'row': 10, 'col': 10, 'color': 'black'}, format='json').status_code, 405)
+		self.assertEqual(client.delete(url).status_code, 405)
+		move.refresh_from_db()
+		self.assertEqual((move.row, move.col), (4, 4))
+
+
+class SummaryRebuildTests(TestCase):
+	"""落子行被删除后按剩余落子重算对局摘要，之后仍能继续落子"""
+
+	def setUp(self):
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		# 测试连续落子，放宽每秒一手的限流
+		patcher = mock.patch('datab.rate_limit.MOVE_CREATION_POLICY', TokenBucketPolicy(capacity=100, refill_rate=100))
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def play(self, user, row, col, color):
+		client = APIClient()
+		client.force_authenticate(user)
+		return client.post('/api/datab/games/validated-move/', {
+			'game': self.game.id, 'row': row, 'col': col, 'color': color,
+		}, format='json')
+
+	def test_delete_last_move_rebuilds_summary(self):
+		self.assertEqual(self.play(self.black, 4, 4, 'black').status_code, 201)
+		self.assertEqual(self.play(self.white, 16, 16, 'white').status_code, 201)
+		self.assertEqual(self.play(self.black, 4, 16, 'black').status_code, 201)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Intersection.objects.filter(game=self.game, move_number=3).delete()
+
+		self.game.refresh_from_db()
+		self.assertEqual(self.game.move_count, 2)
+		self.assertEqual(self.game.last_move_color, 'white')
+		self.assertEqual(self.game.to_move, 'black')
+		self.assertEqual(len(self.game.position_hashes), 2 * 8)
+		self.assertEqual(self.play(self.black, 16, 4, 'black').status_code, 201)
+
+	def test_delete_all_moves_resets_summary(self):
+		self.assertEqual(self.play(self.black, 4, 4, 'black').status_code, 201)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Intersection.objects.filter(game=self.game).delete()
+
+		self.game.refresh_from_db()
+		self.assertEqual((self.game.move_count, self.game.last_move_color, self.game.to_move), (0, None, 'black'))
+		self.assertEqual(self.play(self.black, 10, 10, 'black').status_code, 201)
+
+	def test_rolled_back_delete_does_not_suppress_later_rebuild(self):
+		self.assertEqual(self.play(self.black, 4, 4, 'black').status_code, 201)
+		self.assertEqual(self.play(self.white, 16, 16, 'white').status_code, 201)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			with self.assertRaises(RuntimeError), transaction.atomic():
+				Intersection.objects.filter(game=self.game, move_number=2).delete()
+				raise RuntimeError('rollback')
+			# 同一事务中已有其他待提交回调时，回滚留下的安排不能让本次删除跳过重算
+			self.game.save(update_fields=['updated_at'])
+			Intersection.objects.filter(game=self.game, move_number=2).delete()
+
+		self.game.refresh_from_db()
+		self.assertEqual((self.game.move_count, self.game.last_move_color, self.game.to_move), (1, 'black', 'white'))
+
+
+class PackedMovesTests(SimpleTestCase):
+	"""压缩棋谱的编解码：往返一致，截断或损坏的数据抛出ValueError"""
+
+	STARTED = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+	def moves(self):
+		return [
+			(4, 4, 'black', self.STARTED + timedelta(seconds=3)),
+			(16, 16, 'white', self.STARTED + timedelta(seconds=3, milliseconds=250)),
+			(19, 19, 'black', self.STARTED + timedelta(hours=2)),
+			(1, 1, 'white', self.STARTED + timedelta(hours=2)),
+		]
+
+	def test_round_trip(self):
+		packed = pack_moves(self.moves(), self.STARTED)
+		self.assertEqual(
+			unpack_moves(packed, self.STARTED),
+			[(number, *move) for number, move in enumerate(self.moves(), start=1)]
+		)
+		self.assertEqual(unpack_moves(b'', self.STARTED), [])
+
+	def test_truncated_input(self):
+		packed = pack_moves(self.moves(), self.STARTED)
+		# 截在位置中间、时间差varint中间
+		for end in (len(packed) - 1, 2, len(packed) - 4):
+			with self.subTest(end=end), self.assertRaises(ValueError):
+				unpack_moves(packed[:end], self.STARTED)
+
+	def test_corrupt_input(self):
+		packed = pack_moves(self.moves(), self.STARTED)
+		with self.assertRaises(ValueError):
+			unpack_moves(b'\x09' + packed[1:], self.STARTED)  # 未知格式版本
+		with self.assertRaises(ValueError):
+			unpack_moves(b'\x01\x01\xff\x00', self.STARTED)  # 位置超出棋盘
+
+
+class CompactGameTests(TestCase):
+	"""压缩终局对局：棋谱不变，删除落子行的查询数与手数无关"""
+
+	def setUp(self):
+		black = User.objects.create_user('black', password='x')
+		white = User.objects.create_user('white', password='x')
+		self.game = Game.objects.create(player1=black, player2=white, score_black=0, score_white=0, komi=6.5)
+
+	def finish_with_moves(self, count):
+		Intersection.objects.bulk_create([
+			Intersection(game=self.game, row=number // 19 + 1, col=number % 19 + 1,
+				color='black' if number % 2 == 0 else 'white', move_number=number + 1)
+			for number in range(count)
+		])
+		Game.objects.filter(pk=self.game.pk).update(winner='black', move_count=count)
+
+	def test_compact_keeps_moves_in_constant_queries(self):
+		self.finish_with_moves(40)
+		expected = [(m.move_number, m.row, m.col, m.color) for m in self.game.intersections.order_by('move_number')]
+
+		with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+			self.assertEqual(compact_game(self.game.id), 40)
+
+		self.assertFalse(Intersection.objects.filter(game=self.game).exists())
+		self.assertLess(len(queries), 10)
+		self.game.refresh_from_db()
+		self.assertEqual(self.game.move_count, 40)
+		self.assertEqual([(m.move_number, m.row, m.col, m.color) for m in self.game.get_moves()], expected)
+
+
+class SgfImportTests(SimpleTestCase):
+	"""SGF解析：停一手、变化分支和内容哈希去重"""
+
+	HEADER = '(;GM[1]FF[4]SZ[19]KM[6.5]PB[black]PW[white]RE[W+3.5]'
+
+	def test_main_line(self):
+		record = read_game_record(self.HEADER + ';B[dd];W[pp])')
+		self.assertEqual(record['moves'], [(4, 4, 'black'), (16, 16, 'white')])
+		self.assertEqual((record['winner'], record['result']), ('white', 'W+3.5'))
+		self.assertEqual(str(record['komi']), '6.50')
+
+	def test_trailing_passes(self):
+		for passes in (';B[];W[]', ';B[tt];W[tt]'):
+			with self.subTest(passes=passes):
+				record = read_game_record(self.HEADER + ';B[dd];W[pp]' + passes + ')')
+				self.assertEqual(record['moves'], [(4, 4, 'black'), (16, 16, 'white')])
+
+	def test_pass_in_the_middle_is_rejected(self):
+		with self.assertRaises(SgfError):
+			read_game_record(self.HEADER + ';B[dd];W[];B[pp])')
+
+	def test_first_variation_is_main_line(self):
+		record = read_game_record(self.HEADER + ';B[dd](;W[pp];B[dp](;W[pd])(;W[qq]))(;W[cc]))')
+		self.assertEqual(record['moves'], [(4, 4, 'black'), (16, 16, 'white'), (16, 4, 'black'), (4, 16, 'white')])
+
+	def test_content_hash_ignores_formatting(self):
+		plain = read_game_record(self.HEADER + ';B[dd];W[pp])')
+		noisy = read_game_record(
+			'(;FF[4]GM[1]SZ[19]\n  PW[white] PB[black]KM[6.50]RE[W+3.5]C[comment [with\\] escape]]\n'
+			';B[dd]C[first move]\n;W[pp](;B[qq]))'
+		)
+		self.assertEqual(content_hash(plain), content_hash({**noisy, 'moves': noisy['moves'][:2]}))
+		self.assertNotEqual(content_hash(plain), content_hash(noisy))
+
+	def test_content_hash_covers_players_komi_and_result(self):
+		base = read_game_record(self.HEADER + ';B[dd];W[pp])')
+		for change in ({'black': 'other'}, {'komi': base['komi'] + 1}, {'winner': 'black'}, {'moves': base['moves'][::-1]}):
+			with self.subTest(change=change):
+				self.assertNotEqual(content_hash(base), content_hash({**base, **change}))
+
+
+class SgfExportTests(TestCase):
+	"""SGF导出：导入对局的原始结果原样写回，单局与ZIP批量导出内容一致"""
+
+	SGF = '(;GM[1]FF[4]SZ[19]KM[6.5]PB[black]PW[white]RE[B+R];B[dd];W[pp];B[dp])'
+
+	def setUp(self):
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.client = APIClient()
+		self.client.force_authenticate(self.black)
+
+	def import_sgf(self):
+		with tempfile.TemporaryDirectory() as directory:
+			path = Path(directory) / 'game.sgf'
+			path.write_text(self.SGF, encoding='utf-8')
+			call_command('import_sgf', str(path), workers=1, stdout=io.StringIO())
+		return Game.objects.get(source_hash__isnull=False)
+
+	def export(self, url):
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		return b''.join(response.streaming_content)
+
+	def test_imported_result_round_trips(self):
+		game = self.import_sgf()
+		text = self.export(f'/api/datab/games/{game.id}/sgf/').decode('utf-8')
+
+		self.assertIn('RE[B+R]', text)
+		self.assertIn('KM[6.5]PB[black]PW[white]', text)
+		self.assertTrue(text.endswith(';B[dd];W[pp];B[dp])\n'))
+
+	def test_duplicate_import_is_skipped(self):
+		self.import_sgf()
+		with tempfile.TemporaryDirectory() as directory:
+			# 同一对局，空白、属性顺序和注释不同
+			path = Path(directory) / 'copy.sgf'
+			path.write_text('(;SZ[19]PW[white]PB[black]\nKM[6.5]RE[B+R]C[copy]\n;B[dd];W[pp];B[dp])', encoding='utf-8')
+			call_command('import_sgf', str(path), workers=1, stdout=io.StringIO())
+		self.assertEqual(Game.objects.count(), 1)
+
+	def test_result_without_margin(self):
+		game = Game.objects.create(player1=self.black, player2=self.white, winner='white', score_black=0, score_white=0, komi=6.5)
+		text = self.export(f'/api/datab/games/{game.id}/sgf/').decode('utf-8')
+		self.assertIn('RE[W+?]', text)
+
+		Game.objects.filter(pk=game.pk).update(score_black=180, score_white='187.5')
+		text = self.export(f'/api/datab/games/{game.id}/sgf/').decode('utf-8')
+		self.assertIn('RE[W+7.5]', text)
+
+	def test_zip_export_contains_each_game(self):
+		imported = self.import_sgf()
+		unfinished = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+
+		archive = zipfile.ZipFile(io.BytesIO(self.export('/api/datab/games/export/')))
+		self.assertEqual(sorted(archive.namelist()), sorted([f'game-{imported.id}.sgf', f'game-{unfinished.id}.sgf']))
+		self.assertEqual(
+			archive.read(f'game-{imported.id}.sgf'),
+			self.export(f'/api/datab/games/{imported.id}/sgf/')
+		)
+		self.assertNotIn(b'RE[', archive.read(f'game-{unfinished.id}.sgf'))
+
+		archive = zipfile.ZipFile(io.BytesIO(self.export('/api/datab/games/export/?completed=1')))
+		self.assertEqual(archive.namelist(), [f'game-{imported.id}.sgf'])
+
+
+class KeysetPaginationTests(TestCase):
+	"""游标分页：沿 next 链接翻页不重不漏，无效游标返回400，已压缩对局的落子在内存中分页"""
+
+	def setUp(self):
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.client = APIClient()
+		self.client.force_authenticate(self.black)
+
+	def collect(self, url):
+		"""沿 next 链接读取全部页，返回 (每页结果列表, 页数)"""
+		results, pages = [], 0
+		while url:
+			response = self.client.get(url)
+			self.assertEqual(response.status_code, 200)
+			results.extend(response.data['results'])
+			pages += 1
+			url = response.data['next']
+		return results, pages
+
+	def test_cursor_round_trip(self):
+		games = [
+			Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+			for _ in range(5)
+		]
+		results, pages = self.collect('/api/datab/games/?page_size=2')
+		self.assertEqual(pages, 3)
+		self.assertEqual([game['id'] for game in results], [game.id for game in reversed(games)])
+
+	def test_invalid_cursor(self):
+		encode = KeysetPagination().encode_cursor
+		for cursor in ('not-a-cursor!', encode([1]), encode(['not a date', 1]), encode({'id': 1})):
+			with self.subTest(cursor=cursor):
+				response = self.client.get('/api/datab/games/', {'cursor': cursor})
+				self.assertEqual(response.status_code, 400)
+
+	def test_packed_game_pages_in_memory(self):
+		game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		Intersection.objects.bulk_create([
+			Intersection(game=game, row=number + 1, col=1, color='black' if number % 2 == 0 else 'white', move_number=number + 1)
+			for number in range(7)
+		])
+		Game.objects.filter(pk=game.pk).update(winner='black', move_count=7)
+		self.assertEqual(compact_game(game.id), 7)
+
+		results, pages = self.collect(f'/api/datab/intersections/?game={game.id}&page_size=3')
+		self.assertEqual(pages, 3)
+		self.assertEqual([move['move_number'] for move in results], list(range(1, 8)))
+		self.assertEqual([move['row'] for move in results], list(range(1, 8)))
+
+
+class SnapshotTests(SimpleTestCase):
+	"""局面快照打包后还原出相同的棋子、行棋方、手数、提子数和劫点"""
+
+	def test_round_trip(self):
+		board = Board.from_position(
+			black=bits((1, 2), (2, 1), (3, 2)),
+			white=bits((1, 3), (2, 2), (2, 4), (3, 3)),
+			move_number=7,
+		)
+		board.play(2, 3, BLACK)
+		self.assertIsNotNone(board.ko_point)
+
+		restored = unpack_snapshot(pack_snapshot(board))
+		self.assertEqual(restored.stones, board.stones)
+		self.assertEqual(restored.captures, {BLACK: 1, WHITE: 0})
+		self.assertEqual((restored.to_move, restored.move_number, restored.ko_point), (WHITE, 8, board.ko_point))
+		self.assertEqual(restored.hash, board.hash)
+		# 劫点随快照还原：白方不能立刻回提
+		with self.assertRaises(IllegalMove):
+			restored.play(2, 2, WHITE)
+
+	def test_invalid_snapshot(self):
+		data = pack_snapshot(Board())
+		for corrupt in (data[:-1], b'\x09' + data[1:], b''):
+			with self.subTest(length=len(corrupt)), self.assertRaises(ValueError):
+				unpack_snapshot(corrupt)
+
+
+class KeyframeTests(TestCase):
+	"""按手数读取局面与关键帧：与从头重放一致，落子被删除后失效的关键帧随之删除"""
+
+	MOVES = 40
+
+	def setUp(self):
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		patcher = mock.patch('datab.rate_limit.MOVE_CREATION_POLICY', TokenBucketPolicy(capacity=100, refill_rate=100))
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	@staticmethod
+	def move(index):
+		"""第 index+1 手（1起始坐标）：都落在奇数行列上，互不相邻，不会提子"""
+		return 2 * (index // 10) + 1, 2 * (index % 10) + 1, 'black' if index % 2 == 0 else 'white'
+
+	def play(self, index):
+		row, col, color = self.move(index)
+		client = APIClient()
+		client.force_authenticate(self.black if color == 'black' else self.white)
+		return client.post('/api/datab/games/validated-move/', {
+			'game': self.game.id, 'row': row, 'col': col, 'color': color,
+		}, format='json')
+
+	def test_position_at_matches_replay(self):
+		Intersection.objects.bulk_create([
+			Intersection(game=self.game, row=row, col=col, color=color, move_number=index + 1)
+			for index, (row, col, color) in enumerate(map(self.move, range(self.MOVES)))
+		])
+		for lazy in (True, False):
+			if not lazy:
+				BoardKeyframe.objects.filter(game=self.game).delete()
+				self.assertEqual(build_keyframes(self.game.id), 2)
+			for number in (0, 1, 15, 16, 17, 32, 39, 40):
+				with self.subTest(lazy=lazy, number=number):
+					board, last = position_at(self.game.id, number)
+					expected = Board.replay((row - 1, col - 1, color) for row, col, color in map(self.move, range(number)))
+					self.assertEqual(board.stones, expected.stones)
+					self.assertEqual(board.move_number, number)
+					self.assertEqual(last.move_number if last else 0, number)
+		self.assertEqual(list(BoardKeyframe.objects.filter(game=self.game).values_list('move_number', flat=True).order_by('move_number')), [16, 32])
+
+	def test_undecodable_keyframes_fall_back_to_earlier_ones(self):
+		Intersection.objects.bulk_create([
+			Intersection(game=self.game, row=row, col=col, color=color, move_number=index + 1)
+			for index, (row, col, color) in enumerate(map(self.move, range(self.MOVES)))
+		])
+		Game.objects.filter(pk=self.game.pk).update(move_count=self.MOVES)
+		self.assertEqual(build_keyframes(self.game.id), 2)
+		expected = Board.replay((row - 1, col - 1, color) for row, col, color in map(self.move, range(self.MOVES)))
+
+		# 32手的快照损坏：退回16手的关键帧
+		BoardKeyframe.objects.filter(game=self.game, move_number=32).update(snapshot=b'\x09corrupt')
+		board, _ = position_at(self.game.id, self.MOVES)
+		self.assertEqual(board.stones, expected.stones)
+		self.assertEqual(list(BoardKeyframe.objects.filter(game=self.game).values_list('move_number', flat=True)), [16])
+
+		# 16手的快照也损坏：从头重放，接口不返回500
+		BoardKeyframe.objects.filter(game=self.game, move_number=16).update(snapshot=b'')
+		client = APIClient()
+		client.force_authenticate(self.black)
+		response = client.get(f'/api/datab/games/{self.game.id}/position/', {'move': 20})
+		self.assertEqual(response.status_code, 200)
+		board, _ = position_at(self.game.id, 20)
+		self.assertEqual(board.stones, Board.replay((r - 1, c - 1, color) for r, c, color in map(self.move, range(20))).stones)
+
+	def test_deleting_moves_drops_later_keyframes(self):
+		for index in range(self.MOVES):
+			self.assertEqual(self.play(index).status_code, 201)
+		self.assertEqual(BoardKeyframe.objects.filter(game=self.game).count(), 2)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Intersection.objects.filter(game=self.game, move_number__gte=30).delete()
+
+		self.assertEqual(list(BoardKeyframe.objects.filter(game=self.game).values_list('move_number', flat=True)), [16])
+		# 重新下到第32手时写入新的关键帧，不与旧关键帧冲突
+		for index in range(29, 32):
+			self.assertEqual(self.play(index).status_code, 201)
+		board, _ = position_at(self.game.id, 32)
+		self.assertEqual(board.stones, Board.replay((r - 1, c - 1, color) for r, c, color in map(self.move, range(32))).stones)
+
+
+def column(col):
+	"""整列（0起始）的位棋盘"""
+	return bits(*((row, col) for row in range(19)))
+
+
+class ScoringTests(SimpleTestCase):
+	"""数子：领地只归只与一方相邻的空点连通块，死子移除后计入对方"""
+
+	def test_empty_board_has_no_territory(self):
+		self.assertEqual(territory(0, 0), (0, 0))
+
+	def test_walls_split_the_board(self):
+		black_area, white_area = territory(column(2), column(3))
+		self.assertEqual(black_area, column(0) | column(1))
+		self.assertEqual(white_area.bit_count(), 15 * 19)
+
+	def test_region_touching_both_colors_is_neutral(self):
+		black_area, white_area = territory(column(2), column(4))
+		self.assertEqual(black_area, column(0) | column(1))
+		self.assertFalse((black_area | white_area) & column(3))
+
+	def test_score_position(self):
+		score = score_position(column(2), column(3), Decimal('6.5'))
+		self.assertEqual((score.black_stones, score.black_territory), (19, 38))
+		self.assertEqual((score.white_stones, score.white_territory), (19, 285))
+		self.assertEqual((score.black_total, score.white_total, score.winner), (57, Decimal('310.5'), WHITE))
+
+	def test_komi_decides_equal_areas(self):
+		# 对称局面，中间一列为单官：双方各 171 子
+		score = score_position(column(8), column(10), Decimal('0'))
+		self.assertEqual((score.black_total, score.white_total, score.winner), (171, 171, 'draw'))
+		self.assertEqual(score_position(column(8), column(10), Decimal('0.5')).winner, WHITE)
+		self.assertEqual(score_position(column(8), column(10), Decimal('-0.5')).winner, BLACK)
+
+	def test_dead_stones_count_for_the_opponent(self):
+		black = column(2)
+		white = column(3) | bits((0, 0), (0, 1))
+		dead = dead_stone_mask(black, white, [(0, 0)])
+		self.assertEqual(dead, bits((0, 0), (0, 1)))
+
+		score = score_position(black, white, Decimal('6.5'), dead)
+		self.assertEqual((score.white_dead, score.black_dead), (2, 0))
+		self.assertEqual((score.black_territory, score.white_stones), (38, 19))
+
+	def test_invalid_dead_stones(self):
+		for point in ((5, 5), (19, 0), (-1, 3)):
+			with self.subTest(point=point), self.assertRaises(ValueError):
+				dead_stone_mask(column(2), column(3), [point])
+
+
+class EndGameTests(TestCase):
+	"""终局结果只能由终局接口数子写入，且只能写入一次"""
+
+	def setUp(self):
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		self.client = APIClient()
+		self.client.force_authenticate(self.black)
+
+	def test_game_update_cannot_set_result_komi_or_players(self):
+		response = self.client.patch(f'/api/datab/games/{self.game.id}/', {
+			'player1': 'white', 'player2': 'black', 'winner': 'black', 'score_black': '99.00', 'score_white': '1.00', 'komi': '99',
+		}, format='json')
+		self.assertEqual(response.status_code, 200)
+		self.game.refresh_from_db()
+		self.assertEqual((self.game.winner, self.game.score_black, self.game.score_white), (None, 0, 0))
+		self.assertEqual(self.game.komi, Decimal('6.5'))
+		self.assertEqual((self.game.player1_id, self.game.player2_id), (self.black.id, self.white.id))
+
+		# 贴目只能经设置贴目接口修改
+		response = self.client.put(f'/api/datab/games/{self.game.id}/set-komi/', {'komi': '7.5'}, format='json')
+		self.assertEqual(response.status_code, 200)
+		self.game.refresh_from_db()
+		self.assertEqual(self.game.komi, Decimal('7.5'))
+
+	def test_finished_game_cannot_be_updated(self):
+		Game.objects.filter(pk=self.game.pk).update(winner='white', score_white=6.5)
+		for method in (self.client.patch, self.client.put):
+			with self.subTest(method=method.__name__):
+				response = method(f'/api/datab/games/{self.game.id}/', {'player1': 'black', 'player2': 'white', 'komi': '6.5'}, format='json')
+				self.assertEqual(response.status_code, 409)
+
+	def end_game(self, user, dead_stones=()):
+		client = APIClient()
+		client.force_authenticate(user)
+		return client.put(f'/api/datab/games/{self.game.id}/end-game/', {'dead_stones': list(dead_stones)}, format='json')
+
+	def place_moves(self):
+		"""黑 (4,4)、白 (16,16)、黑 (10,10)、白 (1,1)"""
+		moves = [(4, 4, 'black'), (16, 16, 'white'), (10, 10, 'black'), (1, 1, 'white')]
+		Intersection.objects.bulk_create([
+			Intersection(game=self.game, row=row, col=col, color=color, move_number=number)
+			for number, (row, col, color) in enumerate(moves, start=1)
+		])
+		Game.objects.filter(pk=self.game.pk).update(move_count=len(moves), to_move='black', last_move_color='white')
+		live_state.drop_live_state(self.game.id)
+
+	def test_end_game_only_once(self):
+		self.assertEqual(self.end_game(self.black).status_code, 202)
+		response = self.end_game(self.white)
+		self.assertEqual(response.status_code, 200)
+		# 空棋盘：黑0，白只有贴目
+		self.assertEqual((response.data['winner'], response.data['score_white']), ('white', '6.50'))
+
+		self.assertEqual(self.end_game(self.black).status_code, 409)
+		self.game.refresh_from_db()
+		self.assertEqual((self.game.winner, self.game.score_white), ('white', Decimal('6.5')))
+
+	def test_one_sided_dead_stones_do_not_end_the_game(self):
+		self.place_moves()
+		# 黑方把白方的两子都标为死子
+		response = self.end_game(self.black, [[1, 1], [16, 16]])
+		self.assertEqual(response.status_code, 202)
+		self.assertEqual(sorted(response.data['dead_stones']), [[1, 1], [16, 16]])
+		self.game.refresh_from_db()
+		self.assertFalse(self.game.is_finished)
+
+		# 白方提交不同的死子：仍不终局，双方提议都被记录
+		self.assertEqual(self.end_game(self.white, [[1, 1]]).status_code, 202)
+		self.game.refresh_from_db()
+		self.assertFalse(self.game.is_finished)
+		self.assertEqual(set(self.game.end_proposals), {'black', 'white'})
+
+		# 黑方接受白方的提议后按一致的死子数子
+		response = self.end_game(self.black, [[1, 1]])
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual((response.data['score_black'], response.data['score_white']), ('2.00', '7.50'))
+		self.assertEqual(response.data['details']['white_dead'], 1)
+		self.game.refresh_from_db()
+		self.assertEqual((self.game.winner, self.game.end_proposals), ('white', {}))
+
+	def test_proposal_expires_after_a_move(self):
+		self.assertEqual(self.end_game(self.black).status_code, 202)
+		self.place_moves()
+		self.assertEqual(self.end_game(self.white).status_code, 202)
+		self.game.refresh_from_db()
+		self.assertFalse(self.game.is_finished)
+
+
+class RescoreGamesTests(TestCase):
+	"""rescore_games 不覆盖终局接口按死子数子写入的得分"""
+
+	MOVES = [(4, 4, 'black'), (16, 16, 'white'), (10, 10, 'black'), (1, 1, 'white')]
+
+	def setUp(self):
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+
+	def create_game(self):
+		game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		Intersection.objects.bulk_create([
+			Intersection(game=game, row=row, col=col, color=color, move_number=number)
+			for number, (row, col, color) in enumerate(self.MOVES, start=1)
+		])
+		Game.objects.filter(pk=game.pk).update(move_count=len(self.MOVES), to_move='black', last_move_color='white')
+		return game
+
+	def test_server_scored_games_are_kept(self):
+		scored = self.create_game()
+		client = APIClient()
+		client.force_authenticate(self.black)
+		response = client.put(f'/api/datab/games/{scored.id}/end-game/', {'dead_stones': [[1, 1]]}, format='json')
+		self.assertEqual(response.status_code, 202)
+		client.force_authenticate(self.white)
+		response = client.put(f'/api/datab/games/{scored.id}/end-game/', {'dead_stones': [[1, 1]]}, format='json')
+		self.assertEqual(response.status_code, 200)
+
+		legacy = self.create_game()
+		Game.objects.filter(pk=legacy.pk).update(winner='black', score_black=50, score_white=10)
+
+		call_command('rescore_games', all=True, workers=1, stdout=io.StringIO())
+
+		scored.refresh_from_db()
+		legacy.refresh_from_db()
+		self.assertTrue(scored.scored_by_server)
+		self.assertEqual((scored.score_black, scored.score_white), (2, Decimal('7.5')))
+		self.assertEqual((legacy.score_black, legacy.score_white), (2, Decimal('8.5')))
+
+
+class LiveStateTests(TestCase):
+	"""对局实时状态：二进制序列化往返，缓存缺失或版本不符时从数据库重建"""
+
+	# 1起始坐标：黑方在 (3,4) 提掉白子 (3,3) 形成劫
+	MOVES = [
+		(2, 3, BLACK), (2, 4, WHITE), (3, 2, BLACK), (3, 5, WHITE),
+		(4, 3, BLACK), (4, 4, WHITE), (1, 1, BLACK), (3, 3, WHITE), (3, 4, BLACK),
+	]
+
+	def setUp(self):
+		cache.clear()
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+
+	def state(self):
+		board = Board.replay((row - 1, col - 1, color) for row, col, color in self.MOVES)
+		hashes = live_state.LiveGameState._replay_hashes(self.MOVES)
+		return live_state.LiveGameState(self.game.id, self.black.id, self.white.id, board, hashes, finished=True)
+
+	def assertSameState(self, restored, state):
+		self.assertEqual(restored.game_id, state.game_id)
+		self.assertEqual((restored.player1_id, restored.player2_id), (state.player1_id, state.player2_id))
+		self.assertEqual(restored.board.stones, state.board.stones)
+		self.assertEqual(restored.board.move_number, state.board.move_number)
+		self.assertEqual(restored.board.to_move, state.board.to_move)
+		self.assertEqual(restored.board.captures, state.board.captures)
+		self.assertEqual(restored.board.ko_point, state.board.ko_point)
+		self.assertEqual(restored.board.hash, state.board.hash)
+		self.assertEqual(restored.hashes, state.hashes)
+
+	def test_bytes_round_trip(self):
+		state = self.state()
+		self.assertEqual(state.board.ko_point, point_index(2, 2))
+		self.assertEqual(state.board.captures[BLACK], 1)
+
+		restored = live_state.LiveGameState.from_bytes(self.game.id, state.to_bytes())
+		self.assertSameState(restored, state)
+		self.assertTrue(restored.finished)
+		# 历史局面哈希参与超级劫判断，还原后仍然拒绝劫的立即回提
+		with self.assertRaises(IllegalMove):
+			restored.apply(2, 2, WHITE)
+
+	def test_unknown_version_or_empty_data_is_ignored(self):
+		data = self.state().to_bytes()
+		self.assertIsNone(live_state.LiveGameState.from_bytes(self.game.id, bytes([data[0] + 1]) + data[1:]))
+		self.assertIsNone(live_state.LiveGameState.from_bytes(self.game.id, None))
+		self.assertIsNone(live_state.LiveGameState.from_bytes(self.game.id, b''))
+
+	def test_rebuilds_from_database_on_miss(self):
+		Intersection.objects.bulk_create([
+			Intersection(game=self.game, row=row, col=col, color=color, move_number=number)
+			for number, (row, col, color) in enumerate(self.MOVES, start=1)
+		])
+		expected = self.state()
+		key = CacheKeyManager.game_state(self.game.id)
+		for cached in (None, b'\xff' + expected.to_bytes()[1:]):
+			with self.subTest(cached=cached):
+				if cached is None:
+					cache.delete(key)
+				else:
+					cache.set(key, cached)
+				state = live_state.get_live_state(self.game.id)
+				self.assertSameState(state, expected)
+				self.assertFalse(state.finished)
+				# 重建结果回填缓存，之后直接读取缓存
+				self.assertEqual(cache.get(key), state.to_bytes())
+				with self.assertNumQueries(0):
+					self.assertSameState(live_state.get_live_state(self.game.id), expected)
+
+	def test_missing_game_returns_none(self):
+		self.assertIsNone(live_state.get_live_state(self.game.id + 1000))
+
+
+class ConditionalGetTests(TestCase):
+	"""条件GET：If-None-Match 与当前ETag一致时列表和详情返回304，数据变化后ETag随之变化"""
+
+	def setUp(self):
+		cache.clear()
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		self.client = APIClient()
+		self.client.force_authenticate(self.black)
+		patcher = mock.patch('datab.rate_limit.MOVE_CREATION_POLICY', TokenBucketPolicy(capacity=100, refill_rate=100))
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def play(self, row, col):
+		with self.captureOnCommitCallbacks(execute=True):
+			response = self.client.post('/api/datab/games/validated-move/', {
+				'game': self.game.id, 'row': row, 'col': col, 'color': 'black',
+			}, format='json')
+		self.assertEqual(response.status_code, 201)
+
+	def assertRevalidates(self, url):
+		response = self.client.get(url)
+		self.assertEqual(response.status_code, 200)
+		etag = response['ETag']
+		self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+		# 304 只读取缓存中的版本号，不查询数据库
+		with self.assertNumQueries(0):
+			response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 304)
+		self.assertEqual(response['ETag'], etag)
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", W/{etag}').status_code, 304)
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+		return etag
+
+	def test_game_list_not_modified(self):
+		for url in ('/api/datab/games/', '/api/datab/games/incomplete/', '/api/datab/games/completed/'):
+			with self.subTest(url=url):
+				self.assertRevalidates(url)
+
+	def test_game_list_etag_changes_after_move(self):
+		url = '/api/datab/games/'
+		etag = self.assertRevalidates(url)
+		self.play(4, 4)
+		response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], etag)
+
+	def test_game_detail_not_modified(self):
+		url = f'/api/datab/games/{self.game.id}/'
+		etag = self.assertRevalidates(url)
+		self.play(4, 4)
+		response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(response.status_code, 200)
+		self.assertNotEqual(response['ETag'], etag)
+		self.assertEqual(len(response.data['intersections']), 1)
+
+	def test_game_detail_non_participant_is_not_revalidated(self):
+		url = f'/api/datab/games/{self.game.id}/'
+		etag = self.client.get(url)['ETag']
+		outsider = APIClient()
+		outsider.force_authenticate(User.objects.create_user('outsider', password='x'))
+		# ETag函数不为非参与者生成ETag，请求交由视图的权限检查处理
+		response = outsider.get(url, HTTP_IF_NONE_MATCH=etag)
+		self.assertNotEqual(response.status_code, 304)
+		self.assertFalse(response.has_header('ETag'))
+
+
+class GameStatsTests(TestCase):
+	"""玩家对局计数：创建、落子、终局、删除时随对局同步，偏差由对账修正"""
+
+	def setUp(self):
+		rate_limiter.local.clear()
+		self.addCleanup(rate_limiter.local.clear)
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.client = APIClient()
+		self.client.force_authenticate(self.black)
+
+	def counts(self):
+		return get_game_counts(self.black.id), get_game_counts(self.white.id)
+
+	def client_for(self, user):
+		client = APIClient()
+		client.force_authenticate(user)
+		return client
+
+	def test_counts_follow_game_lifecycle(self):
+		self.assertEqual(self.counts(), ((0, 0), (0, 0)))
+		response = self.client.post('/api/datab/games/', {
+			'player1_username': 'black', 'player2_username': 'white', 'komi': 6.5,
+		}, format='json')
+		self.assertEqual(response.status_code, 201)
+		game_id = response.data['id']
+		self.assertEqual(self.counts(), ((1, 1), (1, 1)))
+
+		# 落子只更新对局摘要，不改变计数
+		response = self.client.post('/api/datab/games/validated-move/', {
+			'game': game_id, 'row': 4, 'col': 4, 'color': 'black',
+		}, format='json')
+		self.assertEqual(response.status_code, 201)
+		self.assertEqual(self.counts(), ((1, 1), (1, 1)))
+
+		for user, expected in ((self.black, 202), (self.white, 200)):
+			response = self.client_for(user).put(f'/api/datab/games/{game_id}/end-game/', {'dead_stones': []}, format='json')
+			self.assertEqual(response.status_code, expected)
+		self.assertEqual(self.counts(), ((1, 0), (1, 0)))
+
+		Game.objects.get(pk=game_id).delete()
+		self.assertEqual(self.counts(), ((0, 0), (0, 0)))
+
+	def test_finished_game_created_directly_is_not_active(self):
+		Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5, winner='white')
+		self.assertEqual(self.counts(), ((1, 0), (1, 0)))
+
+	def test_reconcile_fixes_drift(self):
+		Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		Game.objects.create(player1=self.white, player2=self.black, score_black=0, score_white=0, komi=6.5, winner='black')
+		# 绕过信号的修改：计数偏差，白方计数行丢失
+		PlayerGameStats.objects.filter(user=self.black).update(total_games=7, active_games=0)
+		PlayerGameStats.objects.filter(user=self.white).delete()
+
+		drift = reconcile_game_counts(dry_run=True)
+		self.assertEqual(sorted(drift), [
+			(self.black.id, (7, 0), (2, 1)),
+			(self.white.id, (0, 0), (2, 1)),
+		])
+		self.assertEqual(self.counts(), ((7, 0), (0, 0)))
+
+		out = io.StringIO()
+		call_command('reconcile_game_stats', stdout=out)
+		self.assertIn('已修正 2 个玩家的计数', out.getvalue())
+		self.assertEqual(self.counts(), ((2, 1), (2, 1)))
+		self.assertEqual(reconcile_game_counts(), [])
+
+	def test_reconcile_single_user(self):
+		Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		PlayerGameStats.objects.update(active_games=0)
+		out = io.StringIO()
+		call_command('reconcile_game_stats', '--user', str(self.black.id), stdout=out)
+		self.assertEqual(self.counts(), ((1, 1), (1, 0)))
+
+
+class GameParticipantTests(TestCase):
+	"""对局参与者索引：创建和终局时随对局同步，列表按索引读取，偏差由对账修正"""
+
+	def setUp(self):
+		cache.clear()
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+
+	def rows(self, game=None):
+		return list(GameParticipant.objects.filter(game=game or self.game).order_by('color').values_list(
+			'user_id', 'color', 'created_at', 'is_finished'
+		))
+
+	def listed(self, url):
+		client = APIClient()
+		client.force_authenticate(self.white)
+		return [game['id'] for game in client.get(url).data['results']]
+
+	def test_rows_created_with_game(self):
+		self.assertEqual(self.rows(), [
+			(self.black.id, 'black', self.game.created_at, False),
+			(self.white.id, 'white', self.game.created_at, False),
+		])
+		self.assertEqual(shared_unfinished_game_id(self.white.id, self.black.id), self.game.id)
+		self.assertEqual(self.listed('/api/datab/games/incomplete/'), [self.game.id])
+		self.assertEqual(self.listed('/api/datab/games/completed/'), [])
+
+	def test_end_game_marks_rows_finished(self):
+		for user, expected in ((self.black, 202), (self.white, 200)):
+			client = APIClient()
+			client.force_authenticate(user)
+			with self.captureOnCommitCallbacks(execute=True):
+				response = client.put(f'/api/datab/games/{self.game.id}/end-game/', {'dead_stones': []}, format='json')
+			self.assertEqual(response.status_code, expected)
+
+		self.assertEqual([row[3] for row in self.rows()], [True, True])
+		self.assertIsNone(shared_unfinished_game_id(self.black.id, self.white.id))
+		self.assertEqual(self.listed('/api/datab/games/incomplete/'), [])
+		self.assertEqual(self.listed('/api/datab/games/completed/'), [self.game.id])
+
+	def test_reconcile_repairs_missing_and_stale_rows(self):
+		other = Game.objects.create(player1=self.white, player2=self.black, score_black=0, score_white=0, komi=6.5)
+		# 绕过信号：一局缺少索引行，另一局终局状态未同步
+		GameParticipant.objects.filter(game=other).delete()
+		Game.objects.filter(pk=self.game.pk).update(winner='black')
+
+		self.assertEqual(reconcile_participants(dry_run=True), (1, 2))
+		self.assertEqual(self.rows(other), [])
+
+		out = io.StringIO()
+		call_command('reconcile_game_stats', stdout=out)
+		self.assertIn('已补建 1 个对局的参与者索引，修正 2 条索引的终局状态', out.getvalue())
+		self.assertEqual([row[3] for row in self.rows()], [True, True])
+		self.assertEqual(self.rows(other), [
+			(self.white.id, 'black', other.created_at, False),
+			(self.black.id, 'white', other.created_at, False),
+		])
+		self.assertEqual(reconcile_participants(), (0, 0))
+
+
+class SocketTicketTests(TestCase):
+	"""对局推送连接票据：只签发给参与者，只能兑换一次且只对签发的对局有效"""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.black = User.objects.create_user('black', password='x')
+		cls.white = User.objects.create_user('white', password='x')
+		cls.outsider = User.objects.create_user('outsider', password='x')
+		cls.game = Game.objects.create(player1=cls.black, player2=cls.white, score_black=0, score_white=0, komi=6.5)
+
+	def request_ticket(self, user):
+		client = APIClient()
+		client.force_authenticate(user)
+		return client.post(f'/api/datab/games/{self.game.id}/socket-ticket/')
+
+	def test_ticket_is_single_use(self):
+		response = self.request_ticket(self.white)
+		self.assertEqual(response.status_code, 200)
+		ticket = response.json()['ticket']
+
+		self.assertEqual(redeem_ticket(ticket, self.game.id), self.white.id)
+		self.assertIsNone(redeem_ticket(ticket, self.game.id))
+
+	def test_ticket_is_bound_to_game(self):
+		ticket = self.request_ticket(self.black).json()['ticket']
+		self.assertIsNone(redeem_ticket(ticket, self.game.id + 1))
+		self.assertIsNone(redeem_ticket('not-a-ticket', self.game.id))
+
+	def test_outsider_gets_no_ticket(self):
+		self.assertEqual(self.request_ticket(self.outsider).status_code, 403)
+
+
+class GameEventSubscriberTests(SimpleTestCase):
+	"""事件总线订阅任务：调用方的事件循环变化或任务结束时重新启动"""
+
+	def test_restarts_on_new_event_loop(self):
+		subscriber = GameEventSubscriber(hub=None)
+		started = []
+
+		async def run(url):
+			started.append(asyncio.get_running_loop())
+			await asyncio.Event().wait()
+
+		async def call():
+			subscriber.ensure_started()
+			await asyncio.sleep(0)
+			subscriber.ensure_started()
+			await asyncio.sleep(0)
+
+		with mock.patch('datab.realtime._redis_url', return_value='redis://localhost'), \
+				mock.patch.object(subscriber, '_run', run):
+			# 请求结束后循环停止，其上的订阅任务保持pending
+			first = asyncio.new_event_loop()
+			second = asyncio.new_event_loop()
+			try:
+				first.run_until_complete(call())
+				old_task = subscriber._task
+				second.run_until_complete(call())
+				# 旧任务在其所属循环中被取消
+				first.run_until_complete(asyncio.sleep(0))
+				self.assertTrue(old_task.cancelled())
+				subscriber._task.cancel()
+				second.run_until_complete(asyncio.sleep(0))
+			finally:
+				first.close()
+				second.close()
+		# 同一循环内只启动一次，新的循环中重新启动
+		self.assertEqual(started, [first, second])
+
+	def test_restarts_after_task_finishes(self):
+		subscriber = GameEventSubscriber(hub=None)
+		started = []
+
+		async def run(url):
+			started.append(url)
+
+		async def call():
+			subscriber.ensure_started()
+			await asyncio.sleep(0)
+			subscriber.ensure_started()
+			await asyncio.sleep(0)
+
+		with mock.patch('datab.realtime._redis_url', return_value='redis://localhost'), \
+				mock.patch.object(subscriber, '_run', run):
+			asyncio.run(call())
+		self.assertEqual(len(started), 2)
+
+
+class MoveWaitTests(TestCase):
+	"""长轮询：参数校验和实时状态重建失败时的错误响应"""
+
+	@classmethod
+	def setUpTestData(cls):
+		cls.black = User.objects.create_user('black', password='x')
+		cls.white = User.objects.create_user('white', password='x')
+		cls.game = Game.objects.create(player1=cls.black, player2=cls.white, score_black=0, score_white=0, komi=6.5)
+
+	def setUp(self):
+		self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(self.black)}'
+		self.url = f'/api/datab/games/{self.game.id}/moves/wait/'
+
+	def test_non_finite_timeout_is_rejected(self):
+		for value in ('nan', 'inf', '-inf', 'abc'):
+			with self.subTest(timeout=value):
+				self.assertEqual(self.client.get(self.url, {'timeout': value}).status_code, 400)
+
+	def test_state_rebuild_failure_while_waiting_returns_conflict(self):
+		calls = []
+
+		def get_state(game_id):
+			calls.append(game_id)
+			if len(calls) > 1:
+				raise IllegalMove('occupied', '位置已有棋子。')
+			return live_state.get_live_state(game_id)
+
+		with mock.patch('datab.views.get_live_state', get_state):
+			response = self.client.get(self.url, {'timeout': 1})
+		self.assertEqual(response.status_code, 409)
+
+
+class BulkInvalidationTests(TestCase):
+	"""批量失效对局缓存时同时递增双方玩家的版本号"""
+
+	def test_bulk_invalidation_bumps_player_versions(self):
+		black = User.objects.create_user('black', password='x')
+		white = User.objects.create_user('white', password='x')
+		game = Game.objects.create(player1=black, player2=white, score_black=0, score_white=0, komi=6.5)
+		keys = [CacheKeyManager.game_version(game.id), CacheKeyManager.user_version(black.id), CacheKeyManager.user_version(white.id)]
+		before = [get_version(key) for key in keys]
+
+		invalidate_bulk_game_cache([game.id])
+
+		after = [get_version(key) for key in keys]
+		for key, old, new in zip(keys, before, after):
+			with self.subTest(key=key):
+				self.assertNotEqual(old, new)
+
+
+class CommitInvalidationTests(TestCase):
+	"""落子和终局的缓存版本号在事务提交后才递增，提交前的读请求不会把旧内容缓存在新版本下"""
+
+	def test_versions_bump_on_commit(self):
+		black = User.objects.create_user('black', password='x')
+		white = User.objects.create_user('white', password='x')
+		game = Game.objects.create(player1=black, player2=white, score_black=0, score_white=0, komi=6.5)
+		keys = [CacheKeyManager.game_version(game.id), CacheKeyManager.user_version(black.id), CacheKeyManager.user_version(white.id)]
+		before = [get_version(key) for key in keys]
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Intersection.objects.create(game=game, row=4, col=4, color='black', move_number=1)
+			game.winner = 'black'
+			game.save(update_fields=['winner'])
+			self.assertEqual([get_version(key) for key in keys], before)
+
+		for key, old, new in zip(keys, before, [get_version(key) for key in keys]):
+			with self.subTest(key=key):
+				self.assertNotEqual(old, new)
+
+
+class MoveSignalQueryTests(TestCase):
+	"""落子信号使用实时状态中的双方ID，不再查询对局行"""
+
+	def test_move_does_not_query_players(self):
+		black = User.objects.create_user('black', password='x')
+		white = User.objects.create_user('white', password='x')
+		game = Game.objects.create(player1=black, player2=white, score_black=0, score_white=0, komi=6.5)
+		keys = [CacheKeyManager.user_version(black.id), CacheKeyManager.user_version(white.id)]
+		before = [get_version(key) for key in keys]
+		client = APIClient()
+		client.force_authenticate(black)
+
+		with mock.patch('datab.rate_limit.MOVE_CREATION_POLICY', TokenBucketPolicy(capacity=100, refill_rate=100)), \
+				mock.patch('core.cache_signals._game_player_ids') as lookup, self.captureOnCommitCallbacks(execute=True):
+			response = client.post('/api/datab/games/validated-move/', {'game': game.id, 'row': 4, 'col': 4, 'color': 'black'}, format='json')
+
+		self.assertEqual(response.status_code, 201)
+		lookup.assert_not_called()
+		for key, old in zip(keys, before):
+			with self.subTest(key=key):
+				self.assertNotEqual(get_version(key), old)
+
+
+class MoveDeltaTests(TestCase):
+	"""增量落子：返回 since 之后被提掉的棋子，ETag按列表解析"""
+
+	def setUp(self):
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		# 黑 (1,2)、白 (1,1)、黑 (2,1) 提掉白 (1,1)、白 (10,10)
+		moves = [(1, 2, 'black'), (1, 1, 'white'), (2, 1, 'black'), (10, 10, 'white')]
+		Intersection.objects.bulk_create([
+			Intersection(game=self.game, row=row, col=col, color=color, move_number=number)
+			for number, (row, col, color) in enumerate(moves, start=1)
+		])
+		Game.objects.filter(pk=self.game.pk).update(move_count=len(moves), to_move='black', last_move_color='white')
+		live_state.drop_live_state(self.game.id)
+		self.client = APIClient()
+		self.client.force_authenticate(self.black)
+		self.url = f'/api/datab/games/{self.game.id}/moves/'
+
+	def test_captured_stones(self):
+		for since, numbers, captured in ((0, [1, 2, 3, 4], [[1, 1]]), (1, [2, 3, 4], [[1, 1]]), (2, [3, 4], [[1, 1]]), (3, [4], []), (4, [], [])):
+			with self.subTest(since=since):
+				response = self.client.get(self.url, {'since': since})
+				self.assertEqual(response.status_code, 200)
+				self.assertEqual([move[0] for move in response.data['moves']], numbers)
+				self.assertEqual(response.data['captured'], captured)
+
+	def test_etag_list(self):
+		etag = self.client.get(self.url)['ETag']
+		response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+		self.assertEqual(response.status_code, 304)
+		self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='*').status_code, 304)
+		self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+
+class CacheCodecTests(SimpleTestCase):
+	"""缓存编解码：各序列化格式往返，超过阈值才压缩，不认识的帧按错误处理"""
+
+	VALUE = {'color': 'white', 'moves': [[4, 4, 'black'], [16, 16, 'white']], 'name': '黑方'}
+
+	def test_round_trip_in_every_available_format(self):
+		for format_name in CacheCodec.available_formats():
+			with self.subTest(format=format_name):
+				codec = CacheCodec(format_name=format_name)
+				frame = codec.encode(self.VALUE)
+				self.assertEqual(frame[:2], bytes((CacheCodec.VERSION, CacheCodec.FORMATS[format_name])))
+				self.assertEqual(codec.decode(frame), self.VALUE)
+				# 解码按帧内记录的格式进行，切换格式后旧数据仍可读取
+				self.assertEqual(CacheCodec(format_name='json').decode(frame), self.VALUE)
+
+	def test_compresses_only_above_threshold(self):
+		codec = CacheCodec(format_name='json', compress_min_bytes=64)
+		small = codec.encode({'color': 'white'})
+		self.assertEqual(small[2], 0)
+		self.assertEqual(small[3:], b'{"color":"white"}')
+
+		value = {'board': ['.' * 19] * 19}
+		large = codec.encode(value)
+		self.assertEqual(large[2] & CacheCodec.FLAG_COMPRESSED, CacheCodec.FLAG_COMPRESSED)
+		self.assertLess(len(large), 19 * 22)
+		self.assertEqual(codec.decode(large), value)
+
+	def test_incompressible_value_is_stored_plain(self):
+		# 超过阈值但压缩后反而更长（zlib头部开销）时保存原文
+		codec = CacheCodec(format_name='json', compress_min_bytes=4)
+		value = 'abcdefgh'
+		frame = codec.encode(value)
+		self.assertEqual(frame[2], 0)
+		self.assertEqual(codec.decode(frame), value)
+
+	def test_rejects_unknown_frames(self):
+		codec = CacheCodec(format_name='json')
+		frame = codec.encode(self.VALUE)
+		for bad in (bytes((CacheCodec.VERSION + 1,)) + frame[1:], frame[:1] + b'\x09' + frame[2:], b'\x01', 'text', None):
+			with self.subTest(frame=bad):
+				with self.assertRaises(ValueError):
+					codec.decode(bad)
+
+	def test_unavailable_format_falls_back_to_json(self):
+		with self.assertLogs('cache', level='WARNING'):
+			codec = CacheCodec(format_name='pickle')
+		self.assertEqual(codec.format_name, 'json')
+		self.assertEqual(codec.decode(codec.encode(self.VALUE)), self.VALUE)
+
+
+class LocalRateLimiterTests(SimpleTestCase):
+	"""进程内限流：滑动窗口与令牌桶的计数、等待时间和响应头"""
+
+	def setUp(self):
+		self.store = LocalRateLimitStore()
+		self.now = 1000.0
+		patcher = mock.patch('core.rate_limiter.time.monotonic', lambda: self.now)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_sliding_window(self):
+		policy = SlidingWindowPolicy((2, 60))
+		first = policy.check_local(self.store, 'user')
+		self.assertEqual((first.allowed, first.limit, first.remaining, first.reset), (True, 2, 1, 60))
+		self.now += 10
+		self.assertTrue(policy.check_local(self.store, 'user').allowed)
+		# 其他键不受影响
+		self.assertTrue(policy.check_local(self.store, 'other').allowed)
+
+		self.now += 10
+		denied = policy.check_local(self.store, 'user')
+		self.assertFalse(denied.allowed)
+		self.assertEqual(denied.remaining, 0)
+		self.assertEqual(denied.retry_after, 40)  # 第一次请求滑出窗口
+
+		self.now += 40
+		allowed = policy.check_local(self.store, 'user')
+		self.assertTrue(allowed.allowed)
+		self.assertEqual(allowed.remaining, 0)
+		self.assertEqual(allowed.reset, 10)
+
+	def test_sliding_window_reports_tightest_window(self):
+		policy = SlidingWindowPolicy((1, 60), (5, 3600))
+		self.assertEqual(policy.check_local(self.store, 'user').limit, 1)
+		denied = policy.check_local(self.store, 'user')
+		self.assertFalse(denied.allowed)
+		self.assertEqual((denied.limit, denied.retry_after), (1, 60))
+
+		# 分钟窗口有余量、小时窗口用尽时按小时窗口报告，被拒绝的请求不计数
+		for _ in range(4):
+			self.now += 61
+			self.assertTrue(policy.check_local(self.store, 'user').allowed)
+		self.now += 61
+		denied = policy.check_local(self.store, 'user')
+		self.assertFalse(denied.allowed)
+		self.assertEqual(denied.limit, 5)
+		self.assertEqual(denied.retry_after, 3600 - 61 * 5)
+
+	def test_token_bucket(self):
+		policy = TokenBucketPolicy(capacity=2, refill_rate=0.5)
+		self.assertEqual(policy.check_local(self.store, 'user').remaining, 1)
+		self.assertEqual(policy.check_local(self.store, 'user').remaining, 0)
+		denied = policy.check_local(self.store, 'user')
+		self.assertFalse(denied.allowed)
+		self.assertEqual((denied.retry_after, denied.reset), (2, 4))
+
+		self.now += 1
+		self.assertFalse(policy.check_local(self.store, 'user').allowed)
+		self.now += 1
+		self.assertTrue(policy.check_local(self.store, 'user').allowed)
+		self.now += 100
+		self.assertEqual(policy.check_local(self.store, 'user').remaining, 1)
+
+	def test_expired_entries_are_purged(self):
+		store = LocalRateLimitStore(max_keys=2)
+		policy = SlidingWindowPolicy((1, 60))
+		for key in ('a', 'b'):
+			policy.check_local(store, key)
+		self.now += 61
+		policy.check_local(store, 'c')
+		self.assertEqual(len(store._data), 1)
+
+	def test_headers(self):
+		self.assertEqual(RateLimitResult(True, 5, 3, 12.2).headers(), {
+			'X-RateLimit-Limit': '5', 'X-RateLimit-Remaining': '3', 'X-RateLimit-Reset': '13',
+		})
+		headers = RateLimitResult(False, 5, -1, 0.4, retry_after=0.2).headers()
+		self.assertEqual(headers['X-RateLimit-Remaining'], '0')
+		self.assertEqual(headers['Retry-After'], '1')
+
+
+class RateLimitResponseTests(TestCase):
+	"""限流装饰器：放行的响应带 X-RateLimit-* 头，被拒绝时返回429和 Retry-After"""
+
+	def setUp(self):
+		rate_limiter.local.clear()
+		self.addCleanup(rate_limiter.local.clear)
+		self.black = User.objects.create_user('black', password='x')
+		self.white = User.objects.create_user('white', password='x')
+		self.client = APIClient()
+		self.client.force_authenticate(self.black)
+
+	def test_move_limit_headers(self):
+		game = Game.objects.create(player1=self.black, player2=self.white, score_black=0, score_white=0, komi=6.5)
+		data = {'game': game.id, 'row': 4, 'col': 4, 'color': 'black'}
+		response = self.client.post('/api/datab/games/validated-move/', data, format='json')
+		self.assertEqual(response.status_code, 201)
+		self.assertEqual(response['X-RateLimit-Limit'], '1')
+		self.assertEqual(response['X-RateLimit-Remaining'], '0')
+		self.assertFalse(response.has_header('Retry-After'))
+
+		response = self.client.post('/api/datab/games/validated-move/', {**data, 'col': 5}, format='json')
+		self.assertEqual(response.status_code, 429)
+		self.assertEqual(response.json()['type'], 'move_limit')
+		self.assertEqual(response['Retry-After'], '1')
+		self.assertEqual(Intersection.objects.filter(game=game).count(), 1)
+
+	def test_game_creation_minute_limit(self):
+		data = {'player1_username': 'black', 'player2_username': 'white', 'komi': 6.5}
+		response = self.client.post('/api/datab/games/', data, format='json')
+		self.assertEqual(response.status_code, 201)
+		self.assertEqual(response['X-RateLimit-Limit'], '1')
+
+		response = self.client.post('/api/datab/games/', data, format='json')
+		self.assertEqual(response.status_code, 429)
+		self.assertEqual(response.json()['type'], 'minute_limit')
+		self.assertEqual(response['X-RateLimit-Remaining'], '0')
+		self.assertIn(response['Retry-After'], ('59', '60'))
+		self.assertEqual(Game.objects.count(), 1)
+
+
+class TieredCacheTests(SimpleTestCase):
+	"""两级缓存：L1命中不访问L2，L2命中回填L1，LRU淘汰与TTL过期，各层计数"""
+
+	def setUp(self):
+		cache.clear()
+		self.tiered = TieredCache(cache, max_entries=2, ttl=5)
+
+	def counters(self):
+		stats = self.tiered.stats()
+		return {name: stats[name] for name in ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses')}
+
+	def test_l1_hit_skips_backend(self):
+		self.tiered.set('a', {'value': 1}, 60)
+		with mock.patch.object(cache, 'get', side_effect=AssertionError('L2 read')):
+			self.assertEqual(self.tiered.get('a'), {'value': 1})
+		self.assertEqual(self.counters(), {'l1_hits': 1, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0})
+
+	def test_l2_hit_fills_l1(self):
+		cache.set('a', cache_codec.encode({'value': 1}), 60)
+		self.assertEqual(self.tiered.get('a', codec=cache_codec), {'value': 1})
+		# L1保存解码后的对象
+		self.assertEqual(self.tiered.get('a', codec=cache_codec), {'value': 1})
+		self.assertEqual(self.tiered.get('b', 'default'), 'default')
+		self.assertEqual(self.counters(), {'l1_hits': 1, 'l1_misses': 2, 'l2_hits': 1, 'l2_misses': 1})
+
+		stats = self.tiered.stats()
+		self.assertEqual(stats['l1_hit_rate'], 33.33)
+		self.assertEqual(stats['l2_hit_rate'], 50.0)
+		self.assertEqual(stats['l1_entries'], 1)
+
+	def test_undecodable_l2_value_is_a_miss(self):
+		cache.set('a', b'\xffold', 60)
+		self.assertIsNone(self.tiered.get('a', codec=cache_codec))
+		self.assertEqual(self.counters(), {'l1_hits': 0, 'l1_misses': 1, 'l2_hits': 0, 'l2_misses': 1})
+		self.assertEqual(len(self.tiered.local), 0)
+
+	def test_lru_eviction_and_ttl_expiry(self):
+		for key in ('a', 'b'):
+			self.tiered.set(key, key, 60)
+		self.tiered.get('a')
+		self.tiered.set('c', 'c', 60)
+		# 'b' 最久未使用被淘汰出L1，仍可从L2读取
+		self.assertEqual(self.counters()['l1_hits'], 1)
+		self.assertEqual(self.tiered.get('b'), 'b')
+		self.assertEqual(self.counters()['l2_hits'], 1)
+
+		later = time.monotonic() + 10
+		with mock.patch('core.tiered_cache.time.monotonic', return_value=later):
+			self.assertEqual(self.tiered.get('c'), 'c')
+		self.assertEqual(self.counters()['l2_hits'], 2)
+
+	def test_get_many_counts_each_key(self):
+		self.tiered.set('a', 1, 60)
+		cache.set('b', 2, 60)
+		self.assertEqual(self.tiered.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+		self.assertEqual(self.counters(), {'l1_hits': 1, 'l1_misses': 2, 'l2_hits': 1, 'l2_misses': 1})
+
+	def test_incr_and_add_drop_l1_copy(self):
+		self.tiered.set('version', 1, None)
+		self.assertEqual(self.tiered.incr('version'), 2)
+		self.assertEqual(self.tiered.get('version'), 2)
+
+		self.assertFalse(self.tiered.add('version', 10, None))
+		self.assertEqual(self.tiered.get('version'), 2)
+		self.assertEqual(self.counters()['l2_hits'], 2)
+
+
+class CacheResultTests(SimpleTestCase):
+	"""cache_result：命中不重算、单飞锁下返回旧值、XFetch按重算耗时提前刷新、响应按字节重放"""
+
+	def setUp(self):
+		cache.clear()
+		tiered_cache.local.clear()
+		self.calls = []
+
+		@cache_result(key_func=lambda value: CacheKeyManager.get_key('test', 'result', value), timeout=60)
+		def compute(value):
+			self.calls.append(value)
+			return {'value': value, 'call': len(self.calls)}
+
+		self.compute = compute
+		self.key = CacheKeyManager.get_key('test', 'result', 1)
+
+	def seed(self, value, expiry, delta=0.01):
+		tiered_cache.set(self.key, {'value': value, 'delta': delta, 'expiry': expiry}, 120, codec=cache_codec)
+
+	def test_hit_does_not_recompute(self):
+		started = time.time()
+		self.assertEqual(self.compute(1), {'value': 1, 'call': 1})
+		self.assertEqual(self.compute(1), {'value': 1, 'call': 1})
+		self.assertEqual(self.calls, [1])
+
+		entry = cache_codec.decode(cache.get(self.key))
+		self.assertAlmostEqual(entry['expiry'], started + 60, delta=5)
+		self.assertGreaterEqual(entry['delta'], 0)
+		self.assertIsNone(cache.get(f'{self.key}:lock'))
+
+	def test_expired_entry_served_stale_while_locked(self):
+		self.seed({'value': 1, 'call': 0}, expiry=time.time() - 1)
+		cache.add(f'{self.key}:lock', 1, 10)
+		# 其他进程持锁刷新：直接返回旧值，不重算
+		self.assertEqual(self.compute(1), {'value': 1, 'call': 0})
+		self.assertEqual(self.calls, [])
+
+		cache.delete(f'{self.key}:lock')
+		tiered_cache.local.clear()
+		self.assertEqual(self.compute(1), {'value': 1, 'call': 1})
+		self.assertEqual(self.calls, [1])
+		self.assertIsNone(cache.get(f'{self.key}:lock'))
+
+	def test_xfetch_refreshes_early_when_recompute_is_slow(self):
+		# random() = 0.5 时提前量为 delta * ln2
+		with mock.patch('core.cache_manager.random.random', return_value=0.5):
+			self.seed({'value': 1, 'call': 0}, expiry=time.time() + 5, delta=0.01)
+			self.assertEqual(self.compute(1)['call'], 0)
+
+			tiered_cache.local.clear()
+			self.seed({'value': 1, 'call': 0}, expiry=time.time() + 5, delta=10)
+			self.assertEqual(self.compute(1)['call'], 1)
+		self.assertEqual(self.calls, [1])
+
+	def test_exception_releases_lock(self):
+		@cache_result(key_func=lambda: self.key, timeout=60)
+		def broken():
+			raise RuntimeError('boom')
+
+		with self.assertRaises(RuntimeError):
+			broken()
+		self.assertIsNone(cache.get(f'{self.key}:lock'))
+		self.assertIsNone(cache.get(self.key))
+
+	def test_response_is_replayed_from_rendered_content(self):
+		responses = [
+			HttpResponse('{"value":1}', content_type='application/json'),
+			HttpResponse('{"value":2}', content_type='application/json'),
+		]
+
+		@cache_result(key_func=lambda: self.key, timeout=60)
+		def view():
+			return responses.pop(0)
+
+		first = view()
+		replayed = view()
+		self.assertIsNot(replayed, first)
+		self.assertEqual(replayed.status_code, 200)
+		self.assertEqual(replayed.content, b'{"value":1}')
+		self.assertEqual(replayed['Content-Type'], 'application/json')
+		self.assertEqual(len(responses), 1)
+
+	def test_error_response_is_not_cached(self):
+		responses = [HttpResponse('busy', status=503), HttpResponse('ok')]
+
+		@cache_result(key_func=lambda: self.key, timeout=60)
+		def view():
+			return responses.pop(0)
+
+		self.assertEqual(view().status_code, 503)
+		self.assertEqual(view().content, b'ok')
+		self.assertEqual(view().content, b'ok')
+		self.assertEqual(responses, [])
+
+
+class CacheResultLockTests(SimpleTestCase):
+	"""cache_result：其他进程持有重算锁且没有旧值时直接重算，不等待"""
+
+	def test_miss_while_locked_recomputes_without_waiting(self):
+		calls = []
+
+		@cache_result(key_func=lambda value: CacheKeyManager.get_key('test', 'locked', value), timeout=60)
+		def compute(value):
+			calls.append(value)
+			return {'value': value}
+
+		key = CacheKeyManager.get_key('test', 'locked', 1)
+		cache.add(f'{key}:lock', 1, 10)
+		try:
+			started = time.monotonic()
+			self.assertEqual(compute(1), {'value': 1})
+			self.assertLess(time.monotonic() - started, 0.5)
+			self.assertEqual(calls, [1])
+			# 持锁进程负责写缓存，未持锁的请求不写入
+			self.assertIsNone(cache.get(key))
+		finally:
+			cache.delete(f'{key}:lock')
@@ -8,8 +8,15 @@ from .views import (
 	IncompleteGamesView,
 	CompletedGamesView,
 	LatestMoveView,
+	MoveDeltaView,
+	MoveWaitView,
+	GameBoardView,
+	GamePositionView,
+	GameSgfView,
+	GameExportView,
 	PlayerColorView,
 	EndGameView,
+	GameSocketTicketView,
 	SetKomiView,
 	ValidatedMoveView,
 )
@@ -19,8 +26,15 @@ urlpatterns = [
 	path('games/<int:pk>/', GameDetailView.as_view(), name='game-detail'),  # 游戏详情
 	path('games/incomplete/', IncompleteGamesView.as_view(), name='incomplete-games'),  # 未终局对局列表
 	path('games/completed/', CompletedGamesView.as_view(), name='completed-games'),  # 已完棋局列表
+	path('games/export/', GameExportView.as_view(), name='game-export'),  # 批量导出SGF（ZIP流式响应）
 	path('games/<int:game_id>/latest-move/', LatestMoveView.as_view(), name='latest-move'),  # 最新落子颜色查询
+	path('games/<int:game_id>/moves/', MoveDeltaView.as_view(), name='move-delta'),  # 增量落子（紧凑格式，支持ETag）
+	path('games/<int:game_id>/moves/wait/', MoveWaitView.as_view(), name='move-wait'),  # 长轮询等待新落子
+	path('games/<int:game_id>/board/', GameBoardView.as_view(), name='game-board'),  # 当前棋盘状态
+	path('games/<int:game_id>/position/', GamePositionView.as_view(), name='game-position'),  # 复盘：第N手之后的局面（?move=N）
+	path('games/<int:game_id>/sgf/', GameSgfView.as_view(), name='game-sgf'),  # 导出单局SGF（流式响应）
 	path('games/<int:game_id>/player-color/', PlayerColorView.as_view(), name='player-color'),  # 玩家角色查询
+	path('games/<int:game_id>/socket-ticket/', GameSocketTicketView.as_view(), name='socket-ticket'),  # 对局推送一次性连接票据
 	path('games/<int:game_id>/end-game/', EndGameView.as_view(), name='end-game'),  # 标记对局终局
 	path('games/<int:game_id>/set-komi/', SetKomiView.as_view(), name='set-komi'),  # 设置贴目数
 	path('games/validated-move/', ValidatedMoveView.as_view(), name='validated-move'),  # 验证落子创建
@@ -1,28 +1,246 @@
-from django.db import models
+import asyncio
+import math
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, models, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .models import Game, Intersection
-from .serializers import GameSerializer, IntersectionSerializer
+from .serializers import GameSerializer, GameSummarySerializer, IntersectionSerializer
 from .permissions import IsGameParticipant, IsIntersectionGameParticipant
 from .rate_limit import game_creation_limit, check_game_limits, move_creation_limit
 from .logging_decorators import log_api_access, log_database_operation, get_client_ip
+from .engine import BLACK, WHITE, Board, IllegalMove, dead_stone_mask, opponent, score_position
+from .engine.bitboard import BOARD_SIZE, iter_points, point_index
+from .keyframes import position_at, save_keyframe
+from .live_state import board_to_dict, drop_live_state, get_live_state, save_live_state
+from .packed_moves import load_moves_after
+from .pagination import IntersectionPagination, InvalidCursor, ParticipantGamePagination, page_cache_tag
+from .participants import user_games
+from .realtime import hub, issue_ticket, publish_game_event_on_commit, subscriber
+from .sgf import iter_game_sgf, iter_sgf_zip
 
 # 缓存相关导入
 from core.cache_manager import (
     CacheKeyManager,
     CacheTimeouts,
     cache_result,
+    conditional_get,
+    etag_matches,
+    get_version,
     invalidate_game_cache,
+    invalidate_game_list_cache,
     invalidate_user_cache
 )
 
 
-class GameListCreateView(generics.ListCreateAPIView):
+def _game_detail_etag(view, request, *args, **kwargs):
+	"""对局详情ETag：由对局版本号生成，参与者身份由实时状态校验，否则交由视图返回403/404"""
+	game_id = kwargs.get('pk')
+	try:
+		state = get_live_state(game_id)
+	except IllegalMove:
+		return None
+	if state is None or state.color_of(request.user.id) is None:
+		return None
+	return f'"game-{game_id}-{get_version(CacheKeyManager.game_version(game_id))}"'
+
+
+def _streaming_content(request, iterator):
+	"""
+	按当前服务方式包装流式响应内容
+
+	ASGI下StreamingHttpResponse会把同步迭代器一次性读入内存（WSGI下则是异步迭代器），
+	因此ASGI时改为逐块在线程中推进同步生成器，保持边生成边发送。
+	"""
+	if not isinstance(getattr(request, '_request', request), ASGIRequest):  # DRF Request包装了Django请求
+		return iterator
+
+	async def chunks():
+		done = object()
+		next_chunk = sync_to_async(next, thread_sensitive=True)
+		while True:
+			chunk = await next_chunk(iterator, done)
+			if chunk is done:
+				return
+			yield chunk
+
+	return chunks()
+
+
+def _user_games_etag(kind):
+	"""对局列表ETag：由当前用户的对局版本号生成，kind 区分不同列表，分页参数不同的页ETag也不同"""
+	def etag_func(view, request, *args, **kwargs):
+		user_id = request.user.id
+		page = page_cache_tag(request)
+		name = f'{kind}-{page}' if page else kind
+		return f'"games-{name}-{user_id}-{get_version(CacheKeyManager.user_version(user_id))}"'
+	return etag_func
+
+
+class MoveValidationMixin:
+	"""落子校验混入类 - 使用服务端规则引擎校验轮次、占位、提子、劫和自杀"""
+
+	def create_validated_move(self, request):
+		"""校验并创建落子，返回包含被提棋子坐标的响应"""
+		game_id = request.data.get('game')
+		row = request.data.get('row')
+		col = request.data.get('col')
+		color = request.data.get('color')
+
+		# 基本参数验证
+		if not all([game_id, row is not None, col is not None, color]):
+			return Response(
+				{"detail": "必须提供游戏ID、行、列和颜色参数。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		# 验证颜色参数
+		if color not in ['black', 'white']:
+			return Response(
+				{"detail": "颜色必须是 'black' 或 'white'。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		try:
+			game_id = int(game_id)
+			row = int(row)
+			col = int(col)
+		except (ValueError, TypeError):
+			return Response(
+				{"detail": "游戏ID、行和列必须是整数。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		# 从实时状态缓存读取棋盘与参与者，热路径上不查询数据库
+		try:
+			state = get_live_state(game_id)
+		except IllegalMove as e:
+			return Response(
+				{"detail": f"对局记录无法通过规则校验：{e.message}"},
+				status=status.HTTP_409_CONFLICT
+			)
+		user_color = state.color_of(request.user.id) if state else None
+		if user_color is None:
+			return Response(
+				{"detail": "您无权在该游戏中落子或游戏不存在。"},
+				status=status.HTTP_403_FORBIDDEN
+			)
+
+		# 验证用户落子颜色是否匹配其玩家身份
+		if user_color != color:
+			return Response(
+				{"detail": f"您是{user_color}棋玩家，只能下{user_color}棋。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		if state.finished:
+			return Response(
+				{"detail": "对局已结束，不能继续落子。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		# 用规则引擎校验本手（轮次、占位、提子、劫、超级劫、自杀）
+		try:
+			result = state.apply(row - 1, col - 1, color)
+		except IllegalMove as e:
+			return Response(
+				{"detail": e.message, "reason": e.reason},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		# 锁定对局行，以对局摘要确认实时状态未过期（手数、行棋方一致）后写入本手并更新摘要；
+		# (game, move_number) 唯一约束仍作为最后一道保证
+		try:
+			with transaction.atomic():
+				summary = Game.objects.select_for_update().filter(pk=state.game_id).values(
+					'move_count', 'to_move', 'winner'
+				).first()
+				if (summary is None or summary['move_count'] != result.move_number - 1
+						or summary['to_move'] != color or summary['winner']):
+					raise IntegrityError('stale live state')
+
+				placed_at = timezone.now()
+				intersection = Intersection(
+					game_id=state.game_id,
+					row=row,
+					col=col,
+					color=color,
+					move_number=result.move_number,
+					placed_at=placed_at,
+				)
+				# 双方ID取自实时状态，落子信号失效双方对局列表时不必再查询对局行
+				intersection._player_ids = (state.player1_id, state.player2_id)
+				intersection.save(force_insert=True)
+				save_keyframe(state.game_id, state.board)
+				Game.objects.filter(pk=state.game_id).update(
+					position_hashes=state.packed_hashes(),
+					move_count=models.F('move_count') + 1,
+					last_move_color=color,
+					last_move_at=placed_at,
+					to_move=WHITE if color == BLACK else BLACK,
+				)
+				transaction.on_commit(lambda: save_live_state(state))
+				publish_game_event_on_commit(state.game_id, 'move', move={
+					'row': row,
+					'col': col,
+					'color': color,
+					'move_number': result.move_number,
+					'captured': [[r + 1, c + 1] for r, c in result.captured],
+				})
+		except IntegrityError:
+			drop_live_state(state.game_id)
+			return Response(
+				{"detail": "对手刚刚落子，请刷新棋盘后重试。"},
+				status=status.HTTP_409_CONFLICT
+			)
+
+		serializer = self.get_serializer(intersection)
+		data = dict(serializer.data)
+		data['captured'] = [[r + 1, c + 1] for r, c in result.captured]  # 转换为1起始坐标
+		return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(serializer.data))
+
+
+def _game_list_queryset(user, finished=None):
+	"""
+	当前用户的对局列表查询（配合 GameSummarySerializer 和 ParticipantGamePagination）
+
+	经由参与者索引表按用户过滤，一次联表取出双方用户名，不读取棋谱等二进制列。
+	"""
+	return user_games(user, finished).select_related('player1', 'player2').defer(
+		'position_hashes', 'packed_moves'
+	).order_by('-listed_at', '-id')
+
+
+class CursorListMixin:
+	"""游标分页的列表视图：游标无效时返回400（log_api_access会把未处理的异常转为500）"""
+
+	def list(self, request, *args, **kwargs):
+		try:
+			return super().list(request, *args, **kwargs)
+		except InvalidCursor as e:
+			return Response({"detail": str(e.detail)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class GameListCreateView(CursorListMixin, generics.ListCreateAPIView):
 	"""游戏列表创建视图 - 提供游戏的列表查询和创建功能"""
 	serializer_class = GameSerializer
 	permission_classes = [IsAuthenticated]  # 需要登录认证
+	pagination_class = ParticipantGamePagination  # 按 (created_at, id) 倒序的游标分页
+
+	def get_serializer_class(self):
+		"""列表只返回对局摘要，创建仍使用完整的序列化器"""
+		if self.request.method == 'GET':
+			return GameSummarySerializer
+		return GameSerializer
 
 	def get_queryset(self):
 		"""
@@ -30,15 +248,15 @@ class GameListCreateView(generics.ListCreateAPIView):
 		"""
 		if not self.request.user.is_authenticated:
 			return Game.objects.none()
-		return Game.objects.filter(
-			models.Q(player1=self.request.user) | models.Q(player2=self.request.user)
-		).order_by('-created_at').distinct()  # 按创建时间降序排列，确保去重
+		return _game_list_queryset(self.request.user)  # 按创建时间降序排列，每局一行无需去重
 
 	@log_api_access("游戏列表访问")
+	@conditional_get(_user_games_etag('all'))
 	@cache_result(
-		key_func=lambda self: CacheKeyManager.game_list(
-			user_id=self.request.user.id if self.request.user.is_authenticated else None,
-			status=self.request.query_params.get('status', '')
+		key_func=lambda self, request, *args, **kwargs: CacheKeyManager.game_list(
+			user_id=request.user.id if request.user.is_authenticated else None,
+			status=request.query_params.get('status', ''),
+			page=page_cache_tag(request)
 		),
 		timeout=CacheTimeouts.GAME_LIST
 	)
@@ -46,6 +264,11 @@ class GameListCreateView(generics.ListCreateAPIView):
 		"""获取游戏列表"""
 		return super().get(request, *args, **kwargs)
 
+	def perform_create(self, serializer):
+		"""创建对局与双方对局计数的更新（game_stats 信号）处于同一事务"""
+		with transaction.atomic():
+			serializer.save()
+
 	@log_api_access("游戏创建")
 	@log_database_operation("Game", "create")
 	@game_creation_limit()
@@ -61,28 +284,41 @@ class GameListCreateView(generics.ListCreateAPIView):
 				invalidate_user_cache(request.user.id)
 
 				# 失效游戏列表缓存
-				from core.cache_manager import invalidate_cache_pattern
-				invalidate_cache_pattern("games:list:*")
+				invalidate_game_list_cache()
 
 		return response
 
 
 class GameDetailView(generics.RetrieveUpdateDestroyAPIView):
 	"""游戏详情视图 - 提供单个游戏的查询、更新和删除功能"""
-	queryset = Game.objects.all()
+	# 双方用户名联表读取，落子记录一次预取（按手数排序）
+	queryset = Game.objects.select_related('player1', 'player2').prefetch_related(
+		models.Prefetch('intersections', queryset=Intersection.objects.order_by('move_number'))
+	)
 	serializer_class = GameSerializer
 	permission_classes = [IsAuthenticated, IsGameParticipant]  # 需要登录认证且是游戏参与者
 
 	@log_api_access("游戏详情访问")
+	@conditional_get(_game_detail_etag)
 	@log_database_operation("Game", "retrieve")
 	@cache_result(
-		key_func=lambda self, game_id: CacheKeyManager.game_detail(game_id),
-		timeout=CacheTimeouts.GAME_DETAIL
+		key_func=lambda self, request, *args, **kwargs: CacheKeyManager.game_detail(kwargs.get('pk')),
+		timeout=CacheTimeouts.GAME_DETAIL,
+		vary_on_user=True  # 命中缓存时不会执行参与者权限检查，按用户区分
 	)
 	def get(self, request, *args, **kwargs):
 		"""获取游戏详情"""
 		return super().get(request, *args, **kwargs)
 
+	def update(self, request, *args, **kwargs):
+		"""已终局的对局不能再修改（双方、贴目和终局结果对任何对局都只读）"""
+		if self.get_object().is_finished:
+			return Response(
+				{"detail": "对局已结束，不能修改。"},
+				status=status.HTTP_409_CONFLICT
+			)
+		return super().update(request, *args, **kwargs)
+
 	@log_api_access("游戏更新")
 	@log_database_operation("Game", "update")
 	def put(self, request, *args, **kwargs):
@@ -118,10 +354,11 @@ class GameDetailView(generics.RetrieveUpdateDestroyAPIView):
 		return super().delete(request, *args, **kwargs)
 
 
-class IntersectionListCreateView(generics.ListCreateAPIView):
+class IntersectionListCreateView(CursorListMixin, MoveValidationMixin, generics.ListCreateAPIView):
 	"""棋子交叉点列表创建视图 - 提供棋子位置的列表查询和创建功能"""
 	serializer_class = IntersectionSerializer
 	permission_classes = [IsAuthenticated]  # 需要登录认证
+	pagination_class = IntersectionPagination  # 按 (game, move_number) 正序的游标分页
 
 	def get_queryset(self):
 		"""
@@ -131,21 +368,18 @@ class IntersectionListCreateView(generics.ListCreateAPIView):
 		if not self.request.user.is_authenticated:
 			return Intersection.objects.none()
 
-		# 获取用户参与的游戏
-		user_games = Game.objects.filter(
-			models.Q(player1=self.request.user) | models.Q(player2=self.request.user)
-		).distinct()
-
-		qs = Intersection.objects.filter(game__in=user_games).order_by('placed_at', 'row', 'col')
+		# 用户参与的游戏中的棋子（经由参与者索引表，无需去重）
+		qs = Intersection.objects.filter(game__participants__user=self.request.user).order_by('game_id', 'move_number')
 
 		# 如果指定了游戏ID，进一步过滤并验证权限
 		game_id = self.request.query_params.get('game')
 		if game_id:
 			# 验证用户是否有权访问该游戏
 			try:
-				game = Game.objects.get(
-					models.Q(id=game_id) & (models.Q(player1=self.request.user) | models.Q(player2=self.request.user))
-				)
+				game = Game.objects.get(id=game_id, participants__user=self.request.user)
+				if game.packed_moves:
+					# 已压缩的对局没有落子行，返回解码后的棋谱
+					return game.get_moves()
 				qs = qs.filter(game=game)
 			except Game.DoesNotExist:
 				# 如果用户无权访问该游戏，返回空查询集
@@ -155,10 +389,13 @@ class IntersectionListCreateView(generics.ListCreateAPIView):
 
 	@log_api_access("棋子交叉点列表访问")
 	@cache_result(
-		key_func=lambda self: CacheKeyManager.game_intersections(
-			self.request.query_params.get('game', 'all')
+		key_func=lambda self, request, *args, **kwargs: (
+			CacheKeyManager.game_intersections(request.query_params['game'], page=page_cache_tag(request))
+			if request.query_params.get('game')
+			else CacheKeyManager.user_intersections(request.user.id, page=page_cache_tag(request))
 		),
-		timeout=CacheTimeouts.GAME_INTERSECTIONS
+		timeout=CacheTimeouts.GAME_INTERSECTIONS,
+		vary_on_user=True  # 查询集按当前用户参与的对局过滤
 	)
 	def get(self, request, *args, **kwargs):
 		"""获取棋子交叉点列表"""
@@ -168,37 +405,18 @@ class IntersectionListCreateView(generics.ListCreateAPIView):
 	@log_database_operation("Intersection", "create")
 	@move_creation_limit()
 	def post(self, request, *args, **kwargs):
-		"""创建棋子交叉点"""
-		# 验证用户是否有权在指定游戏中放置棋子
-		game_id = request.data.get('game')
-		if game_id:
-			try:
-				game = Game.objects.get(
-					models.Q(id=game_id) & (models.Q(player1=self.request.user) | models.Q(player2=self.request.user))
-				)
-			except Game.DoesNotExist:
-				return Response(
-					{"detail": "您无权在该游戏中放置棋子。"},
-					status=status.HTTP_403_FORBIDDEN
-				)
-		else:
-			return Response(
-				{"detail": "必须指定游戏ID。"},
-				status=status.HTTP_400_BAD_REQUEST
-			)
-
-		# 创建落子并失效相关缓存
-		response = super().post(request, *args, **kwargs)
+		"""创建棋子交叉点（与验证落子使用相同的规则校验）"""
+		response = self.create_validated_move(request)
 
 		if response.status_code == status.HTTP_201_CREATED:
 			# 失效游戏相关缓存
-			invalidate_game_cache(game_id)
+			invalidate_game_cache(request.data.get('game'))
 
 		return response
 
 
-class IntersectionDetailView(generics.RetrieveUpdateDestroyAPIView):
-	"""棋子交叉点详情视图 - 提供单个棋子位置的查询、更新和删除功能"""
+class IntersectionDetailView(generics.RetrieveAPIView):
+	"""棋子交叉点详情视图 - 只读；落子只能经规则引擎创建，不提供修改和删除"""
 	queryset = Intersection.objects.all()
 	serializer_class = IntersectionSerializer
 	permission_classes = [IsAuthenticated, IsIntersectionGameParticipant]  # 需要登录认证且是游戏参与者
@@ -209,64 +427,44 @@ class IntersectionDetailView(generics.RetrieveUpdateDestroyAPIView):
 		"""获取棋子交叉点详情"""
 		return super().get(request, *args, **kwargs)
 
-	@log_api_access("棋子交叉点更新")
-	@log_database_operation("Intersection", "update")
-	def put(self, request, *args, **kwargs):
-		"""完全更新棋子交叉点"""
-		return super().put(request, *args, **kwargs)
-
-	@log_api_access("棋子交叉点部分更新")
-	@log_database_operation("Intersection", "update")
-	def patch(self, request, *args, **kwargs):
-		"""部分更新棋子交叉点"""
-		return super().patch(request, *args, **kwargs)
-
-	@log_api_access("棋子交叉点删除")
-	@log_database_operation("Intersection", "delete")
-	def delete(self, request, *args, **kwargs):
-		"""删除棋子交叉点"""
-		return super().delete(request, *args, **kwargs)
-
 
-class IncompleteGamesView(generics.ListAPIView):
+class IncompleteGamesView(CursorListMixin, generics.ListAPIView):
 	"""未终局对局列表视图 - 返回用户参与但未标记终局的对局"""
-	serializer_class = GameSerializer
+	serializer_class = GameSummarySerializer
 	permission_classes = [IsAuthenticated]  # 需要登录认证
+	pagination_class = ParticipantGamePagination
 
 	def get_queryset(self):
 		"""
-		只返回当前用户参与且未终局的对局（winner为null）
+		只返回当前用户参与且未终局的对局（winner为null或空字符串）
 		"""
 		if not self.request.user.is_authenticated:
 			return Game.objects.none()
-		return Game.objects.filter(
-			models.Q(player1=self.request.user) | models.Q(player2=self.request.user),
-			models.Q(winner__isnull=True) | models.Q(winner='')  # winner为null或空字符串表示未终局
-		).order_by('-created_at').distinct()
+		return _game_list_queryset(self.request.user, finished=False)
 
 	@log_api_access("未终局对局列表访问")
+	@conditional_get(_user_games_etag('incomplete'))
 	def get(self, request, *args, **kwargs):
 		"""获取未终局对局列表"""
 		return super().get(request, *args, **kwargs)
 
 
-class CompletedGamesView(generics.ListAPIView):
+class CompletedGamesView(CursorListMixin, generics.ListAPIView):
 	"""已完棋局列表视图 - 返回用户参与且已结束的对局"""
-	serializer_class = GameSerializer
+	serializer_class = GameSummarySerializer
 	permission_classes = [IsAuthenticated]  # 需要登录认证
+	pagination_class = ParticipantGamePagination
 
 	def get_queryset(self):
 		"""
-		只返回当前用户参与且已终局的对局（winner不为null且不为空）
+		只返回当前用户参与且已终局的对局（winner不为null且不为空），按创建时间倒序
 		"""
 		if not self.request.user.is_authenticated:
 			return Game.objects.none()
-		return Game.objects.filter(
-			models.Q(player1=self.request.user) | models.Q(player2=self.request.user),
-			models.Q(winner__isnull=False) & ~models.Q(winner='')  # winner不为null且不为空字符串表示已终局
-		).order_by('-updated_at').distinct()
+		return _game_list_queryset(self.request.user, finished=True)
 
 	@log_api_access("已完棋局列表访问")
+	@conditional_get(_user_games_etag('completed'))
 	def get(self, request, *args, **kwargs):
 		"""获取已完棋局列表"""
 		return super().get(request, *args, **kwargs)
@@ -277,29 +475,329 @@ class LatestMoveView(generics.GenericAPIView):
 	permission_classes = [IsAuthenticated, IsGameParticipant]  # 需要登录认证且是游戏参与者
 
 	@log_api_access("最新落子查询")
-	@cache_result(
-		key_func=lambda self, game_id: CacheKeyManager.latest_move(game_id),
-		timeout=CacheTimeouts.LATEST_MOVE
-	)
 	def get(self, request, *args, **kwargs):
-		"""获取指定对局中最新落子的颜色"""
+		"""获取指定对局中最新落子的颜色（按主键读取对局摘要，不查询落子记录）"""
+		game_id = self.kwargs.get('game_id')
+
+		summary = Game.objects.filter(pk=game_id).values('player1_id', 'player2_id', 'last_move_color').first()
+		if summary is None:
+			return Response(
+				{"detail": "游戏不存在。"},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		if request.user.id not in (summary['player1_id'], summary['player2_id']):
+			return Response(
+				{"detail": "您不是此游戏的参与者。"},
+				status=status.HTTP_403_FORBIDDEN
+			)
+
+		# 没有落子时返回白色，使黑棋先行
+		return Response({"color": summary['last_move_color'] or "white"})
+
+
+class MoveDeltaView(generics.GenericAPIView):
+	"""增量落子视图 - 只返回手数大于 since 的落子，使用紧凑数组格式并携带ETag"""
+	permission_classes = [IsAuthenticated]  # 需要登录认证，参与者身份由实时状态校验
+
+	@log_api_access("增量落子查询")
+	def get(self, request, *args, **kwargs):
+		"""GET ?since=<手数>：返回 {"move_number", "moves": [[手数, 行, 列, "b"|"w"], ...]}"""
+		game_id = self.kwargs.get('game_id')
+		try:
+			since = int(request.query_params.get('since', 0))
+		except ValueError:
+			return Response(
+				{"detail": "since 必须为整数。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		try:
+			state = get_live_state(game_id)
+		except IllegalMove as e:
+			return Response(
+				{"detail": f"对局记录无法通过规则校验：{e.message}"},
+				status=status.HTTP_409_CONFLICT
+			)
+		if state is None:
+			return Response(
+				{"detail": "游戏不存在。"},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		if state.color_of(request.user.id) is None:
+			return Response(
+				{"detail": "您不是此游戏的参与者。"},
+				status=status.HTTP_403_FORBIDDEN
+			)
+
+		# ETag只取决于最新手数（since 属于URL的一部分），未变化时不查询数据库
+		move_number = state.board.move_number
+		etag = f'"{game_id}-{move_number}"'
+		if etag_matches(request, etag):
+			return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+		moves = []
+		captured = []
+		if move_number > since:
+			# 只取到实时状态的手数，与用于计算提子的棋盘一致
+			rows = load_moves_after(game_id, since, until=move_number)
+			moves = [
+				[move.move_number, move.row, move.col, 'b' if move.color == 'black' else 'w']
+				for move in rows
+			]
+			captured = self._captured_since(game_id, since, state.board, rows)
+		return Response(
+			{"game": int(game_id), "since": since, "move_number": move_number, "moves": moves, "captured": captured},
+			headers={'ETag': etag}
+		)
+
+	@staticmethod
+	def _captured_since(game_id, since, board, rows):
+		"""
+		第 since 手之后被提掉的棋子（1起始坐标）：第 since 手时的棋子和之后的落子中当前已不在棋盘上的点
+
+		第 since 手的局面从最近的关键帧重放得到；客户端先按顺序放置 moves，再清除这些点。
+		"""
+		before = Board()
+		if since > 0:
+			try:
+				before, _ = position_at(game_id, since)
+			except IllegalMove:
+				pass
+		placed = 0
+		for move in rows:
+			placed |= 1 << point_index(move.row - 1, move.col - 1)
+		stones = before.stones[BLACK] | before.stones[WHITE] | placed
+		removed = stones & ~(board.stones[BLACK] | board.stones[WHITE])
+		return [[index // BOARD_SIZE + 1, index % BOARD_SIZE + 1] for index in iter_points(removed)]
+
+
+class MoveWaitView(View):
+	"""等待新落子视图（长轮询）- 异步挂起直到出现手数大于 after 的落子或超时，只返回新增落子
+
+	供无法使用WebSocket的客户端代替定时轮询。等待期间订阅对局事件，不查询数据库；
+	DRF视图不支持异步，因此这里直接使用Django异步视图并手动完成JWT认证。
+	"""
+
+	MAX_TIMEOUT = 25  # 最长等待秒数，需小于nginx的proxy_read_timeout（30秒）
+	RECHECK_INTERVAL = 5  # 兜底复查实时状态的间隔，防止错过推送事件
+
+	async def get(self, request, game_id):
+		"""GET ?after=<手数>&timeout=<秒>：返回手数大于 after 的落子"""
+		try:
+			auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+		except AuthenticationFailed as e:
+			return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+		if auth is None:
+			return JsonResponse({"detail": "身份认证信息未提供。"}, status=status.HTTP_401_UNAUTHORIZED)
+		user = auth[0]
+
+		try:
+			after = int(request.GET.get('after', 0))
+			timeout = float(request.GET.get('timeout', self.MAX_TIMEOUT))
+			if not math.isfinite(timeout):  # nan 与任何数比较都为False，会绕过下面的范围检查
+				raise ValueError('timeout must be finite')
+			timeout = min(timeout, self.MAX_TIMEOUT)
+		except ValueError:
+			return JsonResponse({"detail": "after 和 timeout 必须为数字。"}, status=status.HTTP_400_BAD_REQUEST)
+		if after < 0 or timeout < 0:
+			return JsonResponse({"detail": "after 和 timeout 不能为负数。"}, status=status.HTTP_400_BAD_REQUEST)
+
+		try:
+			state = await sync_to_async(get_live_state)(game_id)
+		except IllegalMove as e:
+			return JsonResponse(
+				{"detail": f"对局记录无法通过规则校验：{e.message}"}, status=status.HTTP_409_CONFLICT
+			)
+		if state is None:
+			return JsonResponse({"detail": "游戏不存在。"}, status=status.HTTP_404_NOT_FOUND)
+		if state.color_of(user.id) is None:
+			return JsonResponse({"detail": "您不是此游戏的参与者。"}, status=status.HTTP_403_FORBIDDEN)
+
+		move_number = state.board.move_number
+		if move_number <= after and not state.finished:
+			try:
+				move_number = await self._wait_for_move(game_id, after, timeout)
+			except IllegalMove as e:
+				# 等待期间实时状态失效后重建失败（棋谱无法通过规则校验）
+				return JsonResponse(
+					{"detail": f"对局记录无法通过规则校验：{e.message}"}, status=status.HTTP_409_CONFLICT
+				)
+
+		moves = []
+		if move_number > after:
+			moves = await sync_to_async(self._moves_after)(game_id, after)
+		return JsonResponse({
+			"game": game_id,
+			"after": after,
+			"move_number": move_number,
+			"moves": moves,
+		})
+
+	async def _wait_for_move(self, game_id, after, timeout):
+		"""订阅对局事件直到手数超过 after 或超时，返回当前手数；实时状态无法重建时抛出IllegalMove"""
+		queue = asyncio.Queue(maxsize=10)
+		hub.register(game_id, queue)
+		subscriber.ensure_started()
+		loop = asyncio.get_running_loop()
+		deadline = loop.time() + timeout
+		try:
+			while True:
+				# 注册后复查一次实时状态，覆盖注册前刚发生的落子
+				state = await sync_to_async(get_live_state)(game_id)
+				move_number = state.board.move_number if state is not None else after
+				if move_number > after or state is None or state.finished:
+					return move_number
+				remaining = deadline - loop.time()
+				if remaining <= 0:
+					return move_number
+				try:
+					await asyncio.wait_for(queue.get(), min(remaining, self.RECHECK_INTERVAL))
+				except asyncio.TimeoutError:
+					pass
+		finally:
+			hub.unregister(game_id, queue)
+
+	@staticmethod
+	def _moves_after(game_id, after):
+		"""查询手数大于 after 的落子"""
+		return IntersectionSerializer(load_moves_after(game_id, after), many=True).data
+
+
+class GameSgfView(generics.GenericAPIView):
+	"""SGF导出视图 - 以流式响应导出单局棋谱"""
+	permission_classes = [IsAuthenticated]  # 需要登录认证，参与者身份在视图中校验
+
+	@log_api_access("SGF导出")
+	def get(self, request, *args, **kwargs):
+		"""下载 game-<id>.sgf"""
 		game_id = self.kwargs.get('game_id')
+		game = Game.objects.select_related('player1', 'player2').filter(pk=game_id).first()
+		if game is None:
+			return Response(
+				{"detail": "游戏不存在。"},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		if request.user.id not in (game.player1_id, game.player2_id):
+			return Response(
+				{"detail": "您不是此游戏的参与者。"},
+				status=status.HTTP_403_FORBIDDEN
+			)
+
+		content = (text.encode('utf-8') for text in iter_game_sgf(game))
+		response = StreamingHttpResponse(
+			_streaming_content(request, content), content_type='application/x-go-sgf; charset=utf-8'
+		)
+		response['Content-Disposition'] = f'attachment; filename="game-{game.id}.sgf"'
+		return response
+
+
+class GameExportView(generics.GenericAPIView):
+	"""批量导出视图 - 把当前用户参与的对局逐局写入ZIP并以流式响应返回"""
+	permission_classes = [IsAuthenticated]  # 需要登录认证
 
-		# 获取指定游戏的最新落子
-		latest_intersection = Intersection.objects.filter(
-			game_id=game_id
-		).order_by('-placed_at').first()
-
-		# 如果没有落子，返回白色；如果有落子，返回最新落子的颜色
-		if latest_intersection:
-			color = latest_intersection.color
-			# 如果最新落子是空（理论上不应出现），返回白色
-			if color == 'empty':
-				color = 'white'
-			return Response({"color": color})
+	GAME_CHUNK_SIZE = 200  # 每批读取的对局数
+
+	@log_api_access("SGF批量导出")
+	def get(self, request, *args, **kwargs):
+		"""GET ?completed=1 只导出已终局对局，completed=0 只导出未终局对局，缺省导出全部"""
+		completed = request.query_params.get('completed')
+		if completed in ('1', 'true'):
+			finished = True
+		elif completed in ('0', 'false'):
+			finished = False
+		elif completed is None:
+			finished = None
 		else:
-			# 没有落子时返回白色
-			return Response({"color": "white"})
+			return Response(
+				{"detail": "completed 必须为 0 或 1。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		games = user_games(request.user, finished).select_related('player1', 'player2').order_by('id')
+		content = iter_sgf_zip(games.iterator(chunk_size=self.GAME_CHUNK_SIZE))
+		response = StreamingHttpResponse(_streaming_content(request, content), content_type='application/zip')
+		filename = f'games-{request.user.username}-{timezone.now():%Y%m%d}.zip'
+		response['Content-Disposition'] = f'attachment; filename="{filename}"'
+		return response
+
+
+class GameBoardView(generics.GenericAPIView):
+	"""棋盘状态视图 - 从对局实时状态缓存返回当前棋盘，不查询落子记录"""
+	permission_classes = [IsAuthenticated]  # 需要登录认证，参与者身份由实时状态校验
+
+	@log_api_access("棋盘状态查询")
+	def get(self, request, *args, **kwargs):
+		"""获取对局当前棋盘、行棋方、手数、提子数和劫点"""
+		game_id = self.kwargs.get('game_id')
+
+		try:
+			state = get_live_state(game_id)
+		except IllegalMove as e:
+			return Response(
+				{"detail": f"对局记录无法通过规则校验：{e.message}"},
+				status=status.HTTP_409_CONFLICT
+			)
+		if state is None:
+			return Response(
+				{"detail": "游戏不存在。"},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		if state.color_of(request.user.id) is None:
+			return Response(
+				{"detail": "您不是此游戏的参与者。"},
+				status=status.HTTP_403_FORBIDDEN
+			)
+
+		return Response(state.to_dict())
+
+
+class GamePositionView(generics.GenericAPIView):
+	"""复盘局面视图 - 返回第N手之后的棋盘，从最近的关键帧开始最多重放 KEYFRAME_INTERVAL-1 手"""
+	permission_classes = [IsAuthenticated]  # 需要登录认证，参与者身份在视图中校验
+
+	@log_api_access("复盘局面查询")
+	def get(self, request, *args, **kwargs):
+		"""GET ?move=N（0为空棋盘，缺省为最新一手）"""
+		game_id = self.kwargs.get('game_id')
+		game = Game.objects.filter(pk=game_id).only('id', 'player1_id', 'player2_id', 'move_count').first()
+		if game is None:
+			return Response(
+				{"detail": "游戏不存在。"},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		if request.user.id not in (game.player1_id, game.player2_id):
+			return Response(
+				{"detail": "您不是此游戏的参与者。"},
+				status=status.HTTP_403_FORBIDDEN
+			)
+
+		try:
+			move_number = int(request.query_params.get('move', game.move_count))
+		except (TypeError, ValueError):
+			return Response(
+				{"detail": "move 必须是整数。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+		if not 0 <= move_number <= game.move_count:
+			return Response(
+				{"detail": f"move 必须在 0 到 {game.move_count} 之间。"},
+				status=status.HTTP_400_BAD_REQUEST
+			)
+
+		try:
+			board, last_move = position_at(game.id, move_number)
+		except IllegalMove as e:
+			return Response(
+				{"detail": f"对局记录无法通过规则校验：{e.message}"},
+				status=status.HTTP_409_CONFLICT
+			)
+
+		return Response(board_to_dict(
+			board,
+			game.id,
+			total_moves=game.move_count,
+			last_move=[last_move.row, last_move.col, last_move.color] if last_move else None,
+		))
 
 
 class PlayerColorView(generics.GenericAPIView):
@@ -308,8 +806,8 @@ class PlayerColorView(generics.GenericAPIView):
 
 	@log_api_access("玩家角色查询")
 	@cache_result(
-		key_func=lambda self, game_id: CacheKeyManager.player_color(
-			game_id, self.request.user.id if self.request.user.is_authenticated else 0
+		key_func=lambda self, request, *args, **kwargs: CacheKeyManager.player_color(
+			kwargs.get('game_id'), request.user.id if request.user.is_authenticated else 0
 		),
 		timeout=CacheTimeouts.PLAYER_COLOR
 	)
@@ -339,50 +837,161 @@ class PlayerColorView(generics.GenericAPIView):
 		return Response({"color": color})
 
 
+class GameSocketTicketView(generics.GenericAPIView):
+	"""对局推送连接票据视图 - 签发WebSocket握手用的一次性票据，access token 不出现在URL中"""
+	permission_classes = [IsAuthenticated]  # 需要登录认证，参与者身份由实时状态校验
+	http_method_names = ['post']
+
+	@log_api_access("签发对局推送票据")
+	def post(self, request, *args, **kwargs):
+		"""POST：返回 {"ticket", "expires_in"}，票据只能用于该对局的一次握手"""
+		game_id = self.kwargs.get('game_id')
+		try:
+			state = get_live_state(game_id)
+		except IllegalMove as e:
+			return Response(
+				{"detail": f"对局记录无法通过规则校验：{e.message}"},
+				status=status.HTTP_409_CONFLICT
+			)
+		if state is None:
+			return Response(
+				{"detail": "游戏不存在。"},
+				status=status.HTTP_404_NOT_FOUND
+			)
+		if state.color_of(request.user.id) is None:
+			return Response(
+				{"detail": "您不是此游戏的参与者。"},
+				status=status.HTTP_403_FORBIDDEN
+			)
+
+		return Response({
+			"ticket": issue_ticket(state.game_id, request.user.id),
+			"expires_in": CacheTimeouts.SOCKET_TICKET,
+		})
+
+
 class EndGameView(generics.GenericAPIView):
-	"""对局终局标记视图 - 标记对局结束并设置获胜者"""
-	permission_classes = [IsAuthenticated, IsGameParticipant]  # 需要登录认证且是游戏参与者
+	"""
+	对局终局视图 - 双方在同一局面提交相同的死子后，由服务端数子，判定并保存获胜者和双方得分
+
+	每一方的提议记录在 Game.end_proposals 中；只有一方提议（或双方不一致）时不数子，
+	返回202并推送 end_proposal 事件，对方确认（提交相同的死子）后终局。
+	"""
+	permission_classes = [IsAuthenticated]  # 需要登录认证，参与者身份由实时状态校验
 	http_method_names = ['put']  # 只允许PUT请求
 
 	@log_api_access("标记对局终局")
 	@log_database_operation("Game", "end_game")
 	def put(self, request, *args, **kwargs):
-		"""标记对局结束并设置获胜者"""
+		"""
+		PUT {"dead_stones": [[row, col], ...]}（1起始坐标，每个死棋串给出任意一子即可）
+
+		获胜者和得分由服务端数子得出（中国规则，白方加贴目），请求中的 winner 不再采用。
+		对方已在当前手数提交了相同的死子时终局，否则记录本方提议并返回202。
+		"""
 		game_id = self.kwargs.get('game_id')
-		winner = request.data.get('winner')  # 从请求数据中获取获胜者
 
-		# 验证winner参数
-		if winner not in ['black', 'white', 'draw']:
-			from rest_framework.response import Response
-			from rest_framework import status
+		dead_stones = request.data.get('dead_stones') or []
+		try:
+			dead_points = [(int(row) - 1, int(col) - 1) for row, col in dead_stones]
+		except (TypeError, ValueError):
 			return Response(
-				{"detail": "无效的获胜者值。必须是 'black'、'white' 或 'draw'。"},
+				{"detail": "dead_stones 必须是 [行, 列] 坐标列表。"},
 				status=status.HTTP_400_BAD_REQUEST
 			)
 
 		try:
-			game = Game.objects.get(id=game_id)
-		except Game.DoesNotExist:
-			from rest_framework.response import Response
-			from rest_framework import status
+			state = get_live_state(game_id)
+		except IllegalMove as e:
+			return Response(
+				{"detail": f"对局记录无法通过规则校验：{e.message}"},
+				status=status.HTTP_409_CONFLICT
+			)
+		if state is None:
 			return Response(
 				{"detail": "游戏不存在。"},
 				status=status.HTTP_404_NOT_FOUND
 			)
+		if state.color_of(request.user.id) is None:
+			return Response(
+				{"detail": "您不是此游戏的参与者。"},
+				status=status.HTTP_403_FORBIDDEN
+			)
 
-		# 更新游戏的winner字段
-		game.winner = winner
-		game.save()
+		with transaction.atomic():
+			# 锁定对局行，并发终局请求依次执行，双方的未终局计数只调整一次
+			game = Game.objects.select_for_update().only(
+				'id', 'komi', 'move_count', 'winner', 'end_proposals'
+			).get(id=state.game_id)
+			if game.is_finished:
+				return Response(
+					{"detail": "对局已结束，不能重复终局。"},
+					status=status.HTTP_409_CONFLICT
+				)
+			if game.move_count != state.board.move_number:
+				drop_live_state(state.game_id)
+				return Response(
+					{"detail": "棋盘已变化，请刷新后重试。"},
+					status=status.HTTP_409_CONFLICT
+				)
+
+			black, white = state.board.stones[BLACK], state.board.stones[WHITE]
+			try:
+				dead = dead_stone_mask(black, white, dead_points)
+			except ValueError as e:
+				return Response(
+					{"detail": f"无效的死子：{e}"},
+					status=status.HTTP_400_BAD_REQUEST
+				)
+
+			# 一方不能单独把对方的活棋标为死子：对方在同一手数提交相同的死子后才数子
+			color = state.color_of(request.user.id)
+			proposal = {'move': game.move_count, 'dead': str(dead)}
+			if game.end_proposals.get(opponent(color)) != proposal:
+				proposals = {**game.end_proposals, color: proposal}
+				Game.objects.filter(pk=game.id).update(end_proposals=proposals)
+				dead_stones = [[index // BOARD_SIZE + 1, index % BOARD_SIZE + 1] for index in iter_points(dead)]
+				publish_game_event_on_commit(game.id, 'end_proposal', color=color, dead_stones=dead_stones)
+				return Response({
+					"message": "已提交死子，等待对方确认",
+					"pending": True,
+					"dead_stones": dead_stones,
+				}, status=status.HTTP_202_ACCEPTED)
+
+			score = score_position(black, white, game.komi, dead)
+
+			# 只写终局结果字段，不覆盖并发更新的对局摘要
+			game.winner = score.winner
+			game.score_black = score.black_total
+			game.score_white = score.white_total
+			game.scored_by_server = True
+			game.end_proposals = {}
+			game.save(update_fields=['winner', 'score_black', 'score_white', 'scored_by_server', 'end_proposals', 'updated_at'])
+
+			state.finished = True
+			transaction.on_commit(lambda: save_live_state(state))
+			# 与对局序列化器的 DecimalField 输出格式一致（两位小数）
+			scores = {'score_black': f'{score.black_total:.2f}', 'score_white': f'{score.white_total:.2f}'}
+			publish_game_event_on_commit(game.id, 'game_end', winner=score.winner, **scores)
 
-		from rest_framework.response import Response
 		return Response({
 			"message": "对局已标记为终局",
-			"winner": winner
+			"winner": score.winner,
+			**scores,
+			"details": {
+				"black_stones": score.black_stones,
+				"white_stones": score.white_stones,
+				"black_territory": score.black_territory,
+				"white_territory": score.white_territory,
+				"black_dead": score.black_dead,
+				"white_dead": score.white_dead,
+				"komi": str(score.komi),
+			},
 		})
 
 
-class ValidatedMoveView(generics.CreateAPIView):
-	"""验证落子视图 - 提供严格的落子验证，包括轮次检查"""
+class ValidatedMoveView(MoveValidationMixin, generics.CreateAPIView):
+	"""验证落子视图 - 提供严格的落子验证，包括轮次、提子、劫和自杀检查"""
 	serializer_class = IntersectionSerializer
 	permission_classes = [IsAuthenticated]  # 需要登录认证
 
@@ -391,84 +1000,7 @@ class ValidatedMoveView(generics.CreateAPIView):
 	@move_creation_limit()
 	def post(self, request, *args, **kwargs):
 		"""创建经过验证的落子"""
-		game_id = request.data.get('game')
-		row = request.data.get('row')
-		col = request.data.get('col')
-		color = request.data.get('color')
-
-		# 基本参数验证
-		if not all([game_id, row is not None, col is not None, color]):
-			from rest_framework.response import Response
-			from rest_framework import status
-			return Response(
-				{"detail": "必须提供游戏ID、行、列和颜色参数。"},
-				status=status.HTTP_400_BAD_REQUEST
-			)
-
-		# 验证颜色参数
-		if color not in ['black', 'white']:
-			from rest_framework.response import Response
-			from rest_framework import status
-			return Response(
-				{"detail": "颜色必须是 'black' 或 'white'。"},
-				status=status.HTTP_400_BAD_REQUEST
-			)
-
-		try:
-			game = Game.objects.get(
-				models.Q(id=game_id) & (models.Q(player1=self.request.user) | models.Q(player2=self.request.user))
-			)
-		except Game.DoesNotExist:
-			from rest_framework.response import Response
-			from rest_framework import status
-			return Response(
-				{"detail": "您无权在该游戏中落子或游戏不存在。"},
-				status=status.HTTP_403_FORBIDDEN
-			)
-
-		# 验证用户落子颜色是否匹配其玩家身份
-		user_color = self._get_user_color(request.user, game)
-		if user_color != color:
-			from rest_framework.response import Response
-			from rest_framework import status
-			return Response(
-				{"detail": f"您是{user_color}棋玩家，只能下{user_color}棋。"},
-				status=status.HTTP_400_BAD_REQUEST
-			)
-
-		# 验证是否是用户的回合
-		latest_move = Intersection.objects.filter(game_id=game_id).order_by('-placed_at').first()
-		if latest_move and latest_move.color == color:
-			from rest_framework.response import Response
-			from rest_framework import status
-			return Response(
-				{"detail": f"轮次错误：上一步已是{color}棋，请等待对手落子。"},
-				status=status.HTTP_400_BAD_REQUEST
-			)
-
-		# 验证位置是否已有棋子
-		existing_move = Intersection.objects.filter(
-			game_id=game_id, row=row, col=col
-		).first()
-		if existing_move and existing_move.color != 'empty':
-			from rest_framework.response import Response
-			from rest_framework import status
-			return Response(
-				{"detail": f"位置 ({row}, {col}) 已有棋子。"},
-				status=status.HTTP_400_BAD_REQUEST
-			)
-
-		# 所有验证通过，创建落子
-		return super().post(request, *args, **kwargs)
-
-	def _get_user_color(self, user, game):
-		"""获取用户在指定游戏中的棋子颜色"""
-		if game.player1 == user:
-			return 'black'
-		elif game.player2 == user:
-			return 'white'
-		else:
-			return None
+		return self.create_validated_move(request)
 
 
 class SetKomiView(generics.GenericAPIView):
@@ -503,30 +1035,31 @@ class SetKomiView(generics.GenericAPIView):
 				status=status.HTTP_400_BAD_REQUEST
 			)
 
-		try:
-			game = Game.objects.get(id=game_id)
-		except Game.DoesNotExist:
-			from rest_framework.response import Response
-			from rest_framework import status
-			return Response(
-				{"detail": "游戏不存在。"},
-				status=status.HTTP_404_NOT_FOUND
-			)
-
-		# 检查该游戏是否已有落子
-		intersection_count = Intersection.objects.filter(game_id=game_id).count()
+		with transaction.atomic():
+			# 锁定对局行：落子同样先锁定该行，已有落子的判断与设置贴目之间不会插入新的落子
+			try:
+				game = Game.objects.select_for_update().get(id=game_id)
+			except Game.DoesNotExist:
+				from rest_framework.response import Response
+				from rest_framework import status
+				return Response(
+					{"detail": "游戏不存在。"},
+					status=status.HTTP_404_NOT_FOUND
+				)
 
-		if intersection_count > 0:
-			from rest_framework.response import Response
-			from rest_framework import status
-			return Response(
-				{"detail": "该游戏已有落子，无法更改贴目数。"},
-				status=status.HTTP_400_BAD_REQUEST
-			)
+			# 检查该游戏是否已有落子（读取对局摘要，不统计落子记录）
+			if game.move_count > 0:
+				from rest_framework.response import Response
+				from rest_framework import status
+				return Response(
+					{"detail": "该游戏已有落子，无法更改贴目数。"},
+					status=status.HTTP_400_BAD_REQUEST
+				)
 
-		# 更新游戏的komi字段
-		game.komi = komi_value
-		game.save()
+			# 更新游戏的komi字段
+			game.komi = komi_value
+			game.save(update_fields=['komi', 'updated_at'])
+			publish_game_event_on_commit(game.id, 'komi', komi=komi_value)
 
 		from rest_framework.response import Response
 		return Response({
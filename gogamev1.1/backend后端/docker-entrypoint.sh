@@ -37,7 +37,12 @@ for i in range(30):  # 尝试30次，每次等待2秒
         time.sleep(2)
 "
 
-# 运行数据库迁移
+# 服务角色：http（默认，WSGI接口服务）或 realtime（ASGI推送服务），可由容器command传入
+SERVER_ROLE="${1:-${SERVER_ROLE:-http}}"
+export SERVER_ROLE
+
+if [ "$SERVER_ROLE" = "http" ]; then
+# 运行数据库迁移（只由接口服务执行，推送服务在其就绪后启动）
 echo "运行数据库迁移..."
 python manage.py migrate --noinput
 
@@ -57,19 +62,29 @@ if not User.objects.filter(username=username).exists():
 else:
     print(f"超级用户 {username} 已存在")
 EOF
+fi
+
+# 启动Gunicorn服务器（worker类型和线程数见 gunicorn.conf.py，按 SERVER_ROLE 区分）
+echo "启动Gunicorn服务器（角色：$SERVER_ROLE）..."
+if [ "$SERVER_ROLE" = "realtime" ]; then
+    APP_MODULE="core.asgi:application"
+else
+    APP_MODULE="core.wsgi:application"
+fi
 
-# 启动Gunicorn服务器
-echo "启动Gunicorn服务器..."
 if [ "$DEBUG" = "True" ]; then
+    if [ "$SERVER_ROLE" = "realtime" ]; then
+        echo "调试模式：使用uvicorn开发服务器（WebSocket推送与长轮询）"
+        exec uvicorn core.asgi:application --host 0.0.0.0 --port 8000 --reload
+    fi
     echo "调试模式：使用开发服务器"
     exec python manage.py runserver 0.0.0.0:8000
 else
     echo "生产模式：使用Gunicorn服务器"
-    # 使用默认配置：单进程，多线程
-    exec gunicorn core.wsgi:application \
+    exec gunicorn "$APP_MODULE" \
+        --config gunicorn.conf.py \
         --bind 0.0.0.0:8000 \
-        --workers 1 \
-        --threads 4 \
+        --workers "${GUNICORN_WORKERS:-$(nproc)}" \
         --timeout 30 \
         --keep-alive 2 \
         --max-requests 1000 \
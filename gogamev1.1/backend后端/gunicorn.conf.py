@@ -8,11 +8,20 @@ import os
 bind = "0.0.0.0:8000"
 backlog = 2048
 
+# 服务角色（由 docker-entrypoint.sh 设置）：
+#   http     - WSGI（core.wsgi），gthread多线程worker，处理全部同步DRF接口
+#   realtime - ASGI（core.asgi），uvicorn worker，只处理对局推送WebSocket和长轮询（nginx按路径转发）
+# 同步视图在ASGI下要经过每个worker唯一的线程敏感执行器串行执行，因此HTTP接口不放在ASGI服务上
+SERVER_ROLE = os.environ.get('SERVER_ROLE', 'http')
+
 # 工作进程配置
-# 默认配置：单进程，多线程
-workers = int(os.environ.get('GUNICORN_WORKERS', 1))
-threads = int(os.environ.get('GUNICORN_THREADS', 4))
-worker_class = "sync"
+# 对局推送经Redis事件总线在进程间广播，两种角色都可按CPU核数扩展工作进程
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+if SERVER_ROLE == 'realtime':
+    worker_class = "uvicorn.workers.UvicornWorker"  # 异步worker，连接在事件循环中挂起，不占用线程
+else:
+    worker_class = "gthread"
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
 worker_connections = 1000
 max_requests = 1000
 max_requests_jitter = 50
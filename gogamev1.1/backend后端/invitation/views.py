@@ -67,7 +67,8 @@ def set_server(request):
         request.user.user_server.server if hasattr(request.user, 'user_server') else 'a',
         request.GET.get('keyword', '')
     ),
-    timeout=CacheTimeouts.SEARCH_USERS
+    timeout=CacheTimeouts.SEARCH_USERS,
+    vary_on_user=True  # 搜索结果排除当前用户
 )
 def search_users(request):
     """搜索同服务区用户"""
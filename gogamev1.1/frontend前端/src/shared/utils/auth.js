@@ -143,6 +143,18 @@ export async function createValidatedMove(gameId, row, col, color) {
   }
 }
 
+// 读取游标分页列表的全部结果：响应为 { next, results }，沿 next 中的 cursor 参数逐页请求
+export async function fetchAllPages(url, params = {}) {
+  const results = []
+  let cursor = null
+  do {
+    const res = await api.get(url, { params: cursor ? { ...params, cursor } : params })
+    results.push(...res.data.results)
+    cursor = res.data.next ? new URL(res.data.next, window.location.origin).searchParams.get('cursor') : null
+  } while (cursor)
+  return results
+}
+
 // 查询玩家角色
 export async function getPlayerColor(gameId) {
   try {
@@ -237,11 +249,11 @@ export async function getLatestMoveColor(gameId) {
   }
 }
 
-// 结束对局
-export async function endGame(gameId, winner) {
+// 结束对局：服务端按当前棋盘和死子（1起始的 [row, col]）数子并判定胜负
+export async function endGame(gameId, deadStones = []) {
   try {
     const res = await api.put(`/datab/games/${gameId}/end-game/`, {
-      winner: winner
+      dead_stones: deadStones
     })
     return {
       success: true,
@@ -266,6 +278,9 @@ export async function endGame(gameId, winner) {
       } else if (status === 404) {
         errorType = 'not_found'
         errorMessage = '游戏不存在'
+      } else if (status === 409) {
+        errorType = 'conflict'
+        errorMessage = detail
       } else if (status === 401) {
         errorType = 'auth'
         errorMessage = '认证失败，请重新登录'
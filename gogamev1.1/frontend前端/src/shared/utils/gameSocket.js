@@ -0,0 +1,93 @@
+/**
+ * 对局推送 WebSocket 客户端
+ * 连接后端 /datab/ws/games/<id>/，接收落子、终局和贴目变化，取代定时轮询
+ * 断线后按指数退避自动重连，重连成功后发出 resync 事件以便调用方补齐遗漏的数据
+ *
+ * 握手前先用 access token（请求头）换取一次性票据，URL中只携带票据，token 不会进入访问日志
+ */
+import api from './auth'
+
+const API_BASE = import.meta.env.VITE_API_BASE || '/backend'
+const MAX_RETRY_DELAY = 30 * 1000 // 最长重连间隔30秒
+
+// 换取票据（token 过期时由 api 拦截器自动刷新），返回 null 表示无权订阅，不再重连
+async function buildSocketUrl(gameId) {
+  let ticket
+  try {
+    const res = await api.post(`/datab/games/${gameId}/socket-ticket/`)
+    ticket = res.data.ticket
+  } catch (error) {
+    const status = error.response?.status
+    if (status === 401 || status === 403 || status === 404) {
+      console.warn(`无法订阅对局 ${gameId} 的推送(${status})`)
+      return null
+    }
+    throw error
+  }
+  const url = new URL(API_BASE, window.location.href)
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:'
+  url.pathname = `${url.pathname.replace(/\/$/, '')}/datab/ws/games/${gameId}/`
+  url.search = `ticket=${encodeURIComponent(ticket)}`
+  return url.toString()
+}
+
+export function connectGameSocket(gameId, onEvent) {
+  let socket = null
+  let closed = false
+  let retry = 0
+  let reconnectTimer = null
+
+  function scheduleReconnect() {
+    const delay = Math.min(MAX_RETRY_DELAY, 1000 * 2 ** retry)
+    retry++
+    reconnectTimer = setTimeout(open, delay)
+  }
+
+  async function open() {
+    if (closed) return
+    const isReconnect = retry > 0
+    let url
+    try {
+      url = await buildSocketUrl(gameId)
+    } catch (error) {
+      console.warn('获取对局推送票据失败，准备重连:', error)
+      scheduleReconnect()
+      return
+    }
+    if (!url || closed) return
+    socket = new WebSocket(url)
+
+    socket.onopen = () => {
+      console.log(`对局推送已连接，游戏ID: ${gameId}`)
+      retry = 0
+      if (isReconnect) onEvent({ type: 'resync', game: gameId })
+    }
+
+    socket.onmessage = (event) => {
+      try {
+        const data = JSON.parse(event.data)
+        if (data.type !== 'ping') onEvent(data)
+      } catch (error) {
+        console.error('解析对局推送消息失败:', error)
+      }
+    }
+
+    socket.onclose = (event) => {
+      if (closed) return
+      // 票据无效或过期（4401）时同样重连，重连前会重新换取票据
+      console.log(`对局推送连接断开(${event.code})，准备重连`)
+      scheduleReconnect()
+    }
+  }
+
+  open()
+
+  return {
+    close() {
+      closed = true
+      clearTimeout(reconnectTimer)
+      if (socket) socket.close()
+      console.log(`对局推送已关闭，游戏ID: ${gameId}`)
+    }
+  }
+}
@@ -1,5 +1,5 @@
 import { defineStore } from 'pinia'
-import api, { createValidatedMove, getPlayerColor, getLatestMoveColor, endGame } from '../shared/utils/auth'
+import api, { createValidatedMove, getPlayerColor, getLatestMoveColor, endGame, fetchAllPages } from '../shared/utils/auth'
 
 export const useGameStore = defineStore('game', {
   state: () => ({
@@ -19,6 +19,7 @@ export const useGameStore = defineStore('game', {
     refreshingGames: new Set(), // 正在刷新的游戏ID集合
     // 新增：邀请ID映射管理
     gameInvitationMap: new Map(), // 游戏ID -> 邀请ID 的映射
+    moveDeltaEtags: new Map(), // 游戏ID -> 增量落子接口的ETag
   }),
 
   getters: {
@@ -75,14 +76,14 @@ export const useGameStore = defineStore('game', {
         console.log('正在加载未完成对局到内存...')
         console.log('API地址:', '/datab/games/incomplete/')
 
-        const response = await api.get('/datab/games/incomplete/')
-        this.incompleteGames = response.data
+        const games = await fetchAllPages('/datab/games/incomplete/', { page_size: 100 })
+        this.incompleteGames = games
         this.lastLoaded = new Date()
 
-        console.log(`成功加载 ${response.data.length} 个未完成对局到内存`)
-        console.log('游戏数据:', response.data)
+        console.log(`成功加载 ${games.length} 个未完成对局到内存`)
+        console.log('游戏数据:', games)
 
-        return response.data
+        return games
       } catch (error) {
         this.error = error
         console.error('加载未完成对局失败:', error)
@@ -108,14 +109,14 @@ export const useGameStore = defineStore('game', {
         console.log('正在加载已完成对局到内存...')
         console.log('API地址:', '/datab/games/completed/')
 
-        const response = await api.get('/datab/games/completed/')
-        this.completedGames = response.data
+        const games = await fetchAllPages('/datab/games/completed/', { page_size: 100 })
+        this.completedGames = games
         this.completedGamesLastLoaded = new Date()
 
-        console.log(`成功加载 ${response.data.length} 个已完成对局到内存`)
-        console.log('已完成对局数据:', response.data)
+        console.log(`成功加载 ${games.length} 个已完成对局到内存`)
+        console.log('已完成对局数据:', games)
 
-        return response.data
+        return games
       } catch (error) {
         this.error = error
         console.error('加载已完成对局失败:', error)
@@ -132,37 +133,37 @@ export const useGameStore = defineStore('game', {
       console.log(`选择对局: ${gameId}`)
     },
 
-    // 加载选中棋局的详细数据
+    // 加载选中棋局的详细数据（已加载过的棋局只拉取增量落子）
     async loadSelectedGame(gameId) {
       if (!gameId) {
         console.warn('未提供棋局ID')
         return
       }
 
+      if (this.currentGameInfo?.id === gameId && this.currentGameBoard) {
+        return this.loadMoveDelta(gameId)
+      }
+
       this.loadingGame = true
       this.error = null
 
       try {
         console.log(`正在加载棋局 ${gameId} 的详细数据...`)
 
-        // 获取棋局详情
+        // 获取棋局详情（已包含全部落子记录，无需再请求intersections接口）
         const gameResponse = await api.get(`/datab/games/${gameId}/`)
         const gameData = gameResponse.data
-
-        // 获取棋局的所有落子记录 - 使用正确的intersections端点
-        const intersectionsResponse = await api.get(`/datab/intersections/?game=${gameId}`)
-        console.log('intersections API响应:', intersectionsResponse.data)
-        const intersectionsData = intersectionsResponse.data
+        const intersectionsData = [...(gameData.intersections || [])].sort(
+          (a, b) => (a.move_number || 0) - (b.move_number || 0)
+        )
 
         // 创建19x19的空棋盘
         const board = Array(19).fill().map(() => Array(19).fill(null))
 
         // 将落子数据填充到棋盘上
         intersectionsData.forEach(intersection => {
-          console.log('处理intersection:', intersection)
           if (intersection.row >= 1 && intersection.row <= 19 && intersection.col >= 1 && intersection.col <= 19) {
             board[intersection.row - 1][intersection.col - 1] = intersection.color
-            console.log(`在位置(${intersection.row-1}, ${intersection.col-1})放置${intersection.color}子`)
           }
         })
 
@@ -173,6 +174,7 @@ export const useGameStore = defineStore('game', {
           intersections: intersectionsData
         }
         this.selectedGameId = gameId
+        this.moveDeltaEtags.delete(gameId)
 
         console.log(`成功加载棋局 ${gameId}，包含 ${intersectionsData.length} 手棋`)
         return { board, gameInfo: this.currentGameInfo }
@@ -187,6 +189,47 @@ export const useGameStore = defineStore('game', {
       }
     },
 
+    // 拉取增量落子：只获取本地最新手数之后的落子，未变化时服务端返回304
+    async loadMoveDelta(gameId) {
+      const intersections = this.currentGameInfo.intersections || []
+      const since = intersections.reduce((max, i) => Math.max(max, i.move_number || 0), 0)
+      const etag = this.moveDeltaEtags.get(gameId)
+
+      try {
+        const response = await api.get(`/datab/games/${gameId}/moves/`, {
+          params: { since },
+          headers: etag ? { 'If-None-Match': etag } : {},
+          validateStatus: (code) => code === 200 || code === 304
+        })
+        if (response.headers.etag) {
+          this.moveDeltaEtags.set(gameId, response.headers.etag)
+        }
+        if (response.status === 304) {
+          return { board: this.currentGameBoard, gameInfo: this.currentGameInfo }
+        }
+
+        // 紧凑格式：[手数, 行, 列, "b"|"w"]
+        response.data.moves.forEach(([moveNumber, row, col, c]) => {
+          if (intersections.some(i => i.move_number === moveNumber)) return
+          const color = c === 'b' ? 'black' : 'white'
+          intersections.push({ game: gameId, row, col, color, move_number: moveNumber })
+          this.currentGameBoard[row - 1][col - 1] = color
+        })
+        // 移除 since 之后被提掉的棋子（与推送落子事件的 captured 处理一致）
+        ;(response.data.captured || []).forEach(([row, col]) => {
+          this.currentGameBoard[row - 1][col - 1] = null
+        })
+        this.currentGameInfo.intersections = intersections
+
+        console.log(`棋局 ${gameId} 增量更新 ${response.data.moves.length} 手棋，当前第 ${response.data.move_number} 手`)
+        return { board: this.currentGameBoard, gameInfo: this.currentGameInfo }
+      } catch (error) {
+        this.error = error
+        console.error(`增量加载棋局 ${gameId} 失败:`, error)
+        throw error
+      }
+    },
+
     // 添加新对局到缓存
     addGame(game) {
       this.incompleteGames.unshift(game)
@@ -391,13 +434,20 @@ export const useGameStore = defineStore('game', {
               row: row,
               col: col,
               color: color,
-              placed_at: result.data.placed_at
+              placed_at: result.data.placed_at,
+              move_number: result.data.move_number
             }
 
             if (!this.currentGameInfo.intersections) {
               this.currentGameInfo.intersections = []
             }
-            this.currentGameInfo.intersections.push(newIntersection)
+            // 推送消息可能先于接口响应到达，按手数去重
+            const exists = this.currentGameInfo.intersections.some(
+              i => i.move_number && i.move_number === newIntersection.move_number
+            )
+            if (!exists) {
+              this.currentGameInfo.intersections.push(newIntersection)
+            }
           }
 
           return {
@@ -421,6 +471,75 @@ export const useGameStore = defineStore('game', {
       }
     },
 
+    // 处理对局推送消息（WebSocket）
+    async applyGameEvent(gameId, event) {
+      switch (event.type) {
+        case 'move': {
+          const move = event.move
+          const cached = this.gameInfoCache.get(gameId)
+          if (cached) {
+            this.gameInfoCache.set(gameId, { ...cached, latestMoveColor: move.color, lastRefresh: new Date().toISOString() })
+          }
+          if (this.selectedGameId !== gameId) break
+
+          if (this.currentGameBoard) {
+            this.currentGameBoard[move.row - 1][move.col - 1] = move.color
+            // 移除被提掉的棋子
+            ;(move.captured || []).forEach(([row, col]) => {
+              this.currentGameBoard[row - 1][col - 1] = null
+            })
+          }
+          if (this.currentGameInfo) {
+            if (!this.currentGameInfo.intersections) {
+              this.currentGameInfo.intersections = []
+            }
+            const exists = this.currentGameInfo.intersections.some(i => i.move_number === move.move_number)
+            if (!exists) {
+              this.currentGameInfo.intersections.push({
+                game: gameId,
+                row: move.row,
+                col: move.col,
+                color: move.color,
+                move_number: move.move_number
+              })
+            }
+          }
+          console.log(`收到推送落子: 游戏${gameId}, 第${move.move_number}手`)
+          break
+        }
+        case 'game_end':
+          this.updateGame(gameId, { winner: event.winner })
+          if (this.currentGameInfo && this.selectedGameId === gameId) {
+            this.currentGameInfo = { ...this.currentGameInfo, winner: event.winner }
+          }
+          break
+        case 'end_proposal':
+          // 一方提交了死子，另一方提交相同的死子后服务端才数子终局
+          if (this.currentGameInfo && this.selectedGameId === gameId) {
+            this.currentGameInfo = {
+              ...this.currentGameInfo,
+              end_proposal: { color: event.color, dead_stones: event.dead_stones }
+            }
+          }
+          break
+        case 'komi':
+          this.updateGame(gameId, { komi: event.komi })
+          if (this.currentGameInfo && this.selectedGameId === gameId) {
+            this.currentGameInfo = { ...this.currentGameInfo, komi: event.komi }
+          }
+          break
+        case 'resync':
+          // 断线重连后重新拉取，补齐断线期间遗漏的消息
+          await this.refreshGameInfo(gameId)
+          if (this.selectedGameId === gameId) {
+            await this.loadSelectedGame(gameId)
+          }
+          break
+        default:
+          break
+      }
+    },
+
     // 计算围棋得分（中国规则）
     calculateGoScore(board, komi = 3.75) {
       if (!board || board.length === 0) {
@@ -533,12 +652,12 @@ export const useGameStore = defineStore('game', {
       this.error = null
 
       try {
-        const response = await api.get('/datab/games/incomplete/')
-        this.incompleteGames = response.data
+        const games = await fetchAllPages('/datab/games/incomplete/', { page_size: 100 })
+        this.incompleteGames = games
         this.lastLoaded = new Date()
 
-        console.log(`强制刷新完成，加载了 ${response.data.length} 个未完成对局`)
-        return response.data
+        console.log(`强制刷新完成，加载了 ${games.length} 个未完成对局`)
+        return games
       } catch (error) {
         this.error = error
         console.error('强制刷新未完成对局失败:', error)
@@ -555,12 +674,12 @@ export const useGameStore = defineStore('game', {
       this.error = null
 
       try {
-        const response = await api.get('/datab/games/completed/')
-        this.completedGames = response.data
+        const games = await fetchAllPages('/datab/games/completed/', { page_size: 100 })
+        this.completedGames = games
         this.completedGamesLastLoaded = new Date()
 
-        console.log(`强制刷新完成，加载了 ${response.data.length} 个已完成对局`)
-        return response.data
+        console.log(`强制刷新完成，加载了 ${games.length} 个已完成对局`)
+        return games
       } catch (error) {
         this.error = error
         console.error('强制刷新已完成对局失败:', error)
@@ -570,48 +689,39 @@ export const useGameStore = defineStore('game', {
       }
     },
 
-    // 结束对局
-    async endGame(gameId) {
+    // 结束对局：死子坐标为1起始的 [row, col]，胜负和得分以服务端数子结果为准
+    async endGame(gameId, deadStones = []) {
       try {
         console.log(`正在结束对局: ${gameId}`)
 
-        // 获取当前游戏状态
-        let board = this.currentGameBoard
-        if (!board || this.selectedGameId !== gameId) {
-          // 如果当前没有加载棋盘，先加载
-          await this.loadSelectedGame(gameId)
-          board = this.currentGameBoard
-        }
+        // 调用API结束对局
+        const result = await endGame(gameId, deadStones)
 
-        if (!board) {
-          throw new Error('无法获取游戏棋盘状态')
+        if (result.success && result.data.pending) {
+          // 对方尚未提交相同的死子，对局未结束
+          console.log('已提交死子，等待对方确认:', result.data)
+          return {
+            success: true,
+            data: { gameId, pending: true, deadStones: result.data.dead_stones }
+          }
         }
 
-        // 计算得分
-        const gameInfo = this.currentGameInfo
-        const komi = parseFloat(gameInfo?.komi || 3.75)
-        const scoreResult = this.calculateGoScore(board, komi)
-
-        console.log('计算得分结果:', scoreResult)
-
-        // 调用API结束对局
-        const result = await endGame(gameId, scoreResult.winner)
-
         if (result.success) {
           console.log('对局结束成功:', result.data)
+          const { winner, score_black: blackScore, score_white: whiteScore, details } = result.data
 
           // 更新本地状态
           this.updateGame(gameId, {
-            winner: scoreResult.winner,
-            score_black: scoreResult.blackScore,
-            score_white: scoreResult.whiteScore
+            winner,
+            score_black: blackScore,
+            score_white: whiteScore
           })
 
           // 更新当前游戏信息
           if (this.currentGameInfo && this.selectedGameId === gameId) {
-            this.currentGameInfo.winner = scoreResult.winner
-            this.currentGameInfo.score_black = scoreResult.blackScore
-            this.currentGameInfo.score_white = scoreResult.whiteScore
+            this.currentGameInfo.winner = winner
+            this.currentGameInfo.score_black = blackScore
+            this.currentGameInfo.score_white = whiteScore
           }
 
           // 重新加载游戏列表以同步数据库状态
@@ -632,10 +742,10 @@ export const useGameStore = defineStore('game', {
             success: true,
             data: {
               gameId,
-              winner: scoreResult.winner,
-              blackScore: scoreResult.blackScore,
-              whiteScore: scoreResult.whiteScore,
-              details: scoreResult.details
+              winner,
+              blackScore,
+              whiteScore,
+              details
             }
           }
         } else {